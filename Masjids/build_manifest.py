@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Content-hash build manifest shared by generate.py, gen_pwa.py and update_landing.py.
+
+Each generated file is recorded with a key (hash of everything it was built
+from: data.json content, template hash, generator version) and the hash of
+the bytes that were written. On the next run an output is skipped when its
+key is unchanged and the file on disk still matches what was written, so
+rebuilding after a one-mosque correction only touches that mosque's files.
+"""
+import hashlib, json, os
+
+MASJIDS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(MASJIDS_DIR)
+MANIFEST_PATH = os.path.join(MASJIDS_DIR, '.build_manifest.json')
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def sha256_file(path):
+    with open(path, 'rb') as f:
+        return sha256_bytes(f.read())
+
+def inputs_key(*parts):
+    """Hash an ordered list of inputs (bytes, str, or JSON-serializable values)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode('utf-8')
+        else:
+            data = json.dumps(part, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        # Length prefix so ('ab', 'c') and ('a', 'bc') hash differently
+        h.update(len(data).to_bytes(8, 'big'))
+        h.update(data)
+    return h.hexdigest()
+
+def _rel(path):
+    return os.path.relpath(os.path.abspath(path), REPO_ROOT).replace(os.sep, '/')
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def is_fresh(manifest, output_path, key):
+    """True if output_path was last built from `key` and has not been modified since."""
+    entry = manifest.get(_rel(output_path))
+    if not entry or entry.get('key') != key or not os.path.exists(output_path):
+        return False
+    return sha256_file(output_path) == entry.get('output')
+
+def record(manifest, output_path, key):
+    """Record that output_path (already on disk) was built from `key`."""
+    manifest[_rel(output_path)] = {'key': key, 'output': sha256_file(output_path)}
+
+WRITE_BUFFER = 1 << 16
+
+def _text_digest(path):
+    """sha256 of a text file as read in text mode (newlines normalized), in bounded memory."""
+    h = hashlib.sha256()
+    with open(path, 'r', encoding='utf-8') as f:
+        for chunk in iter(lambda: f.read(WRITE_BUFFER), ''):
+            h.update(chunk.encode('utf-8'))
+    return h.hexdigest()
+
+def stream_to_temp(output_path, chunks):
+    """Stream str chunks through a buffered writer to a temp file next to output_path.
+
+    Returns (temp_path, text digest). Memory stays bounded by the write buffer; the
+    temp file is removed if the chunks raise part-way.
+    """
+    directory, filename = os.path.split(os.path.abspath(output_path))
+    tmp = os.path.join(directory, f'.{filename}.tmp')
+    h = hashlib.sha256()
+    try:
+        with open(tmp, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            for chunk in chunks:
+                h.update(chunk.encode('utf-8'))
+                f.write(chunk)
+    except BaseException:
+        discard_temp(tmp)
+        raise
+    return tmp, h.hexdigest()
+
+def discard_temp(tmp):
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+def commit_temp(output_path, tmp, digest):
+    """Atomically rename a streamed temp file over output_path. Returns True if written.
+
+    If the text equals what is already on disk the temp file is discarded instead,
+    which keeps file mtimes and Git status untouched.
+    """
+    if os.path.exists(output_path) and _text_digest(output_path) == digest:
+        discard_temp(tmp)
+        return False
+    os.replace(tmp, output_path)
+    return True
+
+def write_chunks_if_changed(output_path, chunks):
+    """Stream chunks to output_path via a temp file and atomic rename. Returns True if written.
+
+    A crash mid-write leaves the previous file intact.
+    """
+    return commit_temp(output_path, *stream_to_temp(output_path, chunks))
+
+def write_text_if_changed(output_path, content):
+    """Write content (str) unless the file already holds exactly that text. Returns True if written."""
+    return write_chunks_if_changed(output_path, (content,))
+
+def write_if_changed(manifest, output_path, key, content, force=False):
+    """Write content (str) to output_path unless the manifest says it is up to date.
+
+    Returns True if the file was written.
+    """
+    if not force and is_fresh(manifest, output_path, key):
+        return False
+    written = write_text_if_changed(output_path, content)
+    record(manifest, output_path, key)
+    return written
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Split the abubakar template into a shared app.css/app.js bundle plus a thin per-mosque shell.
+
+The bundle is identical for every mosque, so it is written once under a
+content-hashed name (app.<hash>.css / app.<hash>.js) and can be cached forever.
+Everything mosque-specific in the template's CSS/JS is parameterized:
+  - palette colors      -> CSS variables --c0..--c9 / MOSQUE.colors[0..9]
+  - localStorage prefix -> MOSQUE.prefix
+  - share text name/URL -> MOSQUE.name / MOSQUE.url
+  - timetableData       -> stays in the shell (inline literal or timetable.json loader)
+The shell keeps the page markup and gets two new slots for generate.py:
+MOSQUE_CONFIG_MARKER (the MOSQUE object) and TIMETABLE_READY_MARKER.
+"""
+import hashlib, os, re
+from palette import TEMPLATE_COLORS, TEMPLATE_COLOR_RE
+
+BUNDLE_URL = '../assets/'
+MOSQUE_CONFIG_MARKER = '/*MOSQUE_CONFIG*/'
+TIMETABLE_READY_MARKER = '/*TIMETABLE_READY*/'
+
+TIMETABLE_START = 'const timetableData = ['
+TIMETABLE_END = '\n        ];'
+DOM_READY = "document.addEventListener('DOMContentLoaded', () => {"
+
+# Template-specific text in the page JS -> expression reading the MOSQUE config
+JS_SUBSTITUTIONS = [
+    ("'abubakar-", "MOSQUE.prefix + '-"),
+    ("Masjid Abu Bakar", "' + MOSQUE.name + '"),
+    ("https://waqt.uk/abubakar/'", "' + MOSQUE.url"),
+    (DOM_READY, "timetableReady.then(() => {"),
+]
+# Anything still matching after substitution would leak Abu Bakar's details into every mosque
+LEAK_RE = re.compile(r'abubakar|Abu Bakar|ABU BAKAR|' + TEMPLATE_COLOR_RE.pattern)
+
+BLOCK_RE = re.compile(r'<(style|script)>(.*?)</\1>', re.DOTALL)
+
+def _hashed_name(stem, ext, content):
+    return f"{stem}.{hashlib.sha256(content.encode('utf-8')).hexdigest()[:10]}.{ext}"
+
+def _css_vars(css):
+    return TEMPLATE_COLOR_RE.sub(lambda m: f'var(--c{TEMPLATE_COLORS.index(m.group(0))})', css)
+
+def _js_params(js):
+    js = re.sub(r"'(%s)'" % TEMPLATE_COLOR_RE.pattern,
+                lambda m: f'MOSQUE.colors[{TEMPLATE_COLORS.index(m.group(1))}]', js)
+    for old, new in JS_SUBSTITUTIONS:
+        js = js.replace(old, new)
+    return js
+
+def split_template(html):
+    """Return (shell_html, {filename: content}) for the bundle layout.
+
+    Raises ValueError if the template's CSS/JS holds mosque-specific text that
+    cannot be parameterized (it would otherwise be baked into the shared bundle).
+    """
+    blocks = list(BLOCK_RE.finditer(html))
+    styles = [m for m in blocks if m.group(1) == 'style']
+    scripts = [m for m in blocks if m.group(1) == 'script']
+    if len(styles) != 1 or TIMETABLE_START not in scripts[0].group(2):
+        raise ValueError('Template layout not recognised: expected one <style> and the timetable in the first <script>')
+
+    css = _css_vars(styles[0].group(2))
+
+    main = scripts[0].group(2)
+    tt_start = main.index(TIMETABLE_START)
+    tt_end = main.index(TIMETABLE_END, tt_start) + len(TIMETABLE_END)
+    timetable_block = main[tt_start:tt_end]
+    js_parts = [main[:tt_start] + main[tt_end:]] + [m.group(2) for m in scripts[1:]]
+    js = '\n;\n'.join(_js_params(part) for part in js_parts)
+
+    leaks = sorted(set(LEAK_RE.findall(css + js)))
+    if leaks:
+        raise ValueError(f'Mosque-specific text left in bundle: {leaks}')
+
+    css_name = _hashed_name('app', 'css', css)
+    js_name = _hashed_name('app', 'js', js)
+
+    # Palette variables stay in the shell as template colors, so the normal color slots fill them
+    root_vars = ';'.join(f'--c{i}:{c}' for i, c in enumerate(TEMPLATE_COLORS))
+    replacements = {
+        styles[0].span(): (f'<style>:root{{{root_vars}}}</style>\n'
+                           f'    <link rel="stylesheet" href="{BUNDLE_URL}{css_name}">'),
+        scripts[0].span(): ('<script>\n'
+                            f'        const MOSQUE = {MOSQUE_CONFIG_MARKER};\n'
+                            f'        {timetable_block}{TIMETABLE_READY_MARKER}\n'
+                            '    </script>\n'
+                            f'    <script src="{BUNDLE_URL}{js_name}"></script>'),
+    }
+    for m in scripts[1:]:
+        replacements[m.span()] = ''
+
+    shell = []
+    pos = 0
+    for (start, end), text in sorted(replacements.items()):
+        shell.append(html[pos:start])
+        shell.append(text)
+        pos = end
+    shell.append(html[pos:])
+    return ''.join(shell), {css_name: css, js_name: js}
+
+def write_bundle(assets, out_dir):
+    """Write bundle files that do not exist yet (names are content hashes). Returns written paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for filename, content in assets.items():
+        path = os.path.join(out_dir, filename)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            written.append(path)
+    return written
@@ -1,60 +1,25 @@
 #!/usr/bin/env python3
-"""Generate PWA assets for batch mosques: manifest.json, sw.js, og-image.svg, poster.html, qr-code.svg"""
+"""Generate PWA assets for batch mosques: manifest.json, sw.js, og-image.svg, poster.html, qr-code.svg
+
+Outputs whose inputs are unchanged since the last run are skipped (see build_manifest.py);
+pass --force to regenerate everything.
+"""
 import json, glob, os, sys
 import qrcode
 import qrcode.image.svg
+import build_manifest
+from palette import DEFAULT_COLOR1, DEFAULT_COLOR2, mosque_icon_data_uri
 sys.stdout.reconfigure(encoding='utf-8')
 
-ROOT = 'G:/My Drive/Work/Prayer-times'
+# PRAYER_TIMES_ROOT points the script at another tree (e.g. scripts/bench_build.py fixtures)
+ROOT = os.environ.get('PRAYER_TIMES_ROOT', 'G:/My Drive/Work/Prayer-times')
 MASJIDS_DIR = os.path.join(ROOT, 'Masjids')
 EXISTING_ADDRESSES = {'807 Great Horton Road'}
 EXISTING_PREFIXES = {'shahjalal','quba','almahad','tawakkulia','salahadin','abubakar','iyma','JamiaMasjid','taqwa'}
-
-# Mosque silhouette SVG icon (path-based, renders on all platforms including iOS)
-# White mosque on colored rounded-rect background
-def mosque_icon_svg(color_hex):
-    """Returns a data URI SVG of a mosque silhouette on a colored background."""
-    c = color_hex.replace('#', '%23')
-    return (
-        "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'>"
-        f"<rect fill='{c}' width='100' height='100' rx='20'/>"
-        # Dome
-        "<path d='M30 55 Q50 20 70 55 Z' fill='white' opacity='0.95'/>"
-        # Minaret left
-        "<rect x='22' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
-        "<polygon points='22,35 25,25 28,35' fill='white' opacity='0.9'/>"
-        # Minaret right
-        "<rect x='72' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
-        "<polygon points='72,35 75,25 78,35' fill='white' opacity='0.9'/>"
-        # Base/wall
-        "<rect x='30' y='55' width='40' height='20' fill='white' opacity='0.9'/>"
-        # Door
-        "<path d='M44 75 L44 62 Q50 56 56 62 L56 75 Z' fill='" + c.replace('%23', '#') + "' opacity='0.8'/>"
-        # Crescent on dome
-        "<circle cx='50' cy='28' r='5' fill='white'/>"
-        "<circle cx='52' cy='27' r='4' fill='" + c.replace('%23', '#') + "'/>"
-        "</svg>"
-    )
-
-def mosque_icon_data_uri(color_hex):
-    """Returns a data:image/svg+xml URI for use in manifest and link tags."""
-    c_uri = color_hex.replace('#', '%23')
-    # Build raw SVG for manifest (using %23 for #)
-    svg = (
-        "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'>"
-        f"<rect fill='{c_uri}' width='100' height='100' rx='20'/>"
-        f"<path d='M30 55 Q50 20 70 55 Z' fill='white' opacity='0.95'/>"
-        f"<rect x='22' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
-        f"<polygon points='22,35 25,25 28,35' fill='white' opacity='0.9'/>"
-        f"<rect x='72' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
-        f"<polygon points='72,35 75,25 78,35' fill='white' opacity='0.9'/>"
-        f"<rect x='30' y='55' width='40' height='20' fill='white' opacity='0.9'/>"
-        f"<path d='M44 75 L44 62 Q50 56 56 62 L56 75 Z' fill='{c_uri}' opacity='0.8'/>"
-        f"<circle cx='50' cy='28' r='5' fill='white'/>"
-        f"<circle cx='52' cy='27' r='4' fill='{c_uri}'/>"
-        "</svg>"
-    )
-    return f"data:image/svg+xml,{svg}"
+# Bump whenever any of the generated assets below change shape
+GENERATOR_VERSION = 'gen_pwa-1'
+PWA_OUTPUTS = ['manifest.json', 'sw.js', 'og-image.svg', 'qr-code.svg', 'poster.html']
+FORCE = '--force' in sys.argv
 
 def generate_qr_svg(url):
     """Generate QR code as SVG string using qrcode library."""
@@ -69,9 +34,16 @@ def generate_qr_svg(url):
     img.save(buf)
     return buf.getvalue().decode('utf-8')
 
+def write_output(target_dir, filename, key, content):
+    """Write one asset (skipping identical content) and record it in the build manifest."""
+    return build_manifest.write_if_changed(build, os.path.join(target_dir, filename), key, content, force=True)
+
 
 data_files = sorted(glob.glob(os.path.join(MASJIDS_DIR, '*', 'data.json')))
 count = 0
+skipped = 0
+written = 0
+build = build_manifest.load_manifest()
 
 for df in data_files:
     d = json.load(open(df, encoding='utf-8'))
@@ -80,8 +52,8 @@ for df in data_files:
     address = d.get('address', '')
     short_name = d.get('short_name', name)
     phone = d.get('phone', '')
-    COLOR1 = d.get('color1', '#4a148c')
-    COLOR2 = d.get('color2', '#7b1fa2')
+    COLOR1 = d.get('color1', DEFAULT_COLOR1)
+    COLOR2 = d.get('color2', DEFAULT_COLOR2)
 
     if prefix in EXISTING_PREFIXES or any(ea in address for ea in EXISTING_ADDRESSES):
         continue
@@ -90,6 +62,18 @@ for df in data_files:
     if not os.path.isdir(target_dir):
         continue
 
+    # Pages built with generate.py --timetable-mode json fetch a separate timetable.json,
+    # which the service worker precaches as its own entry
+    has_timetable_asset = os.path.exists(os.path.join(target_dir, 'timetable.json'))
+
+    # PWA assets only use mosque metadata, so timetable edits never touch them
+    key = build_manifest.inputs_key({k: v for k, v in d.items() if k != 'timetable'},
+                                    has_timetable_asset, GENERATOR_VERSION)
+    if not FORCE and all(build_manifest.is_fresh(build, os.path.join(target_dir, out), key)
+                         for out in PWA_OUTPUTS):
+        skipped += 1
+        continue
+
     icon_uri = mosque_icon_data_uri(COLOR1)
 
     # manifest.json
@@ -107,8 +91,7 @@ for df in data_files:
             "type": "image/svg+xml"
         }]
     }
-    with open(os.path.join(target_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
-        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    written += write_output(target_dir, 'manifest.json', key, json.dumps(manifest, indent=2, ensure_ascii=False))
 
     # sw.js
     sw_lines = [
@@ -117,6 +100,7 @@ for df in data_files:
         f"  '/{prefix}/',",
         f"  '/{prefix}/index.html',",
         f"  '/{prefix}/manifest.json',",
+    ] + ([f"  '/{prefix}/timetable.json',"] if has_timetable_asset else []) + [
         f"  'https://cdn.jsdelivr.net/npm/granim@2.0.0/dist/granim.min.js'",
         f"];",
         "",
@@ -148,8 +132,7 @@ for df in data_files:
         "  );",
         "});",
     ]
-    with open(os.path.join(target_dir, 'sw.js'), 'w', encoding='utf-8') as f:
-        f.write('\n'.join(sw_lines))
+    written += write_output(target_dir, 'sw.js', key, '\n'.join(sw_lines))
 
     # og-image.svg
     name_upper = name.upper().replace('&', '&amp;')
@@ -172,14 +155,12 @@ for df in data_files:
         '  <text x="600" y="540" text-anchor="middle" font-family="Segoe UI, sans-serif" font-size="24" fill="white" opacity="0.8" font-style="italic">Prayer Timetable with Live Countdown</text>',
         '</svg>',
     ]
-    with open(os.path.join(target_dir, 'og-image.svg'), 'w', encoding='utf-8') as f:
-        f.write('\n'.join(og_lines))
+    written += write_output(target_dir, 'og-image.svg', key, '\n'.join(og_lines))
 
     # qr-code.svg
     qr_url = f'https://waqt.uk/{prefix}/'
     qr_svg = generate_qr_svg(qr_url)
-    with open(os.path.join(target_dir, 'qr-code.svg'), 'w', encoding='utf-8') as f:
-        f.write(qr_svg)
+    written += write_output(target_dir, 'qr-code.svg', key, qr_svg)
 
     # poster.html (with embedded QR code)
     phone_line = f'<div class="contact">Tel: {phone}</div>' if phone else ''
@@ -257,10 +238,10 @@ for df in data_files:
         '</body>',
         '</html>',
     ]
-    with open(os.path.join(target_dir, 'poster.html'), 'w', encoding='utf-8') as f:
-        f.write('\n'.join(poster_lines))
+    written += write_output(target_dir, 'poster.html', key, '\n'.join(poster_lines))
 
     count += 1
     print(f'  {prefix}/')
 
-print(f'\nDone: {count} mosques x 5 files = {count*5} files generated')
+build_manifest.save_manifest(build)
+print(f'\nDone: {count} mosques rebuilt ({written} files changed), {skipped} unchanged skipped')
@@ -1,78 +1,238 @@
 #!/usr/bin/env python3
-"""Generate mosque timetable HTML pages from JSON data files."""
-import json, re, os, glob
+"""Generate mosque timetable HTML pages from JSON data files.
+
+Usage: python generate.py [--jobs N] [--summary build_summary.json] [--force]
+                           [--timetable-mode inline|json] [--compare-timetable-modes]
+                           [--bundle] [--compare-bundle]
+"""
+import json, re, os, glob, sys, time, argparse, traceback, gzip
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from collections.abc import Iterator
+import build_manifest
+from bundle import split_template, write_bundle, MOSQUE_CONFIG_MARKER, TIMETABLE_READY_MARKER
+from palette import TEMPLATE_COLORS, color_map
+from timetable_model import Timetable, ROW_FIELDS
 
 TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'abubakar', 'index.html')
 MASJIDS_DIR = os.path.dirname(__file__)
+# Shared app.<hash>.css / app.<hash>.js live next to chat.js, referenced from pages as ../assets/
+ASSETS_DIR = os.path.join(build_manifest.REPO_ROOT, 'assets')
+# Bump whenever rendering logic changes so every page is rebuilt once
+GENERATOR_VERSION = 'generate-5'
+# Modules whose source is part of every page key: editing any of them rebuilds every page
+GENERATOR_SOURCES = [os.path.join(MASJIDS_DIR, name) for name in
+                     ('generate.py', 'palette.py', 'bundle.py', 'timetable_model.py')]
+
+# Order of fields in each timetable row (page JS object keys and timetable.json columns)
+TIMETABLE_FIELDS = ROW_FIELDS
+# inline: timetableData is a JS literal in index.html (default)
+# json:   timetableData is fetched from a separate, independently cached timetable.json
+TIMETABLE_MODES = ('inline', 'json')
+TIMETABLE_ASSET = 'timetable.json'
+
+# === PRECOMPUTED SCHEDULE ===
+# Besides the 12-hour strings, each row carries its times resolved to minutes since
+# midnight (mins, null when blank) and the day's countdown transitions sorted by time
+# (events: [[minute, field], ...]), so the page can binary-search the schedule each
+# tick instead of re-parsing strings. See TimetableRow.schedule().
+SCHEDULE_FIELDS = ['mins', 'events']
+
+# === TEMPLATE COMPILATION ===
+# The template is parsed once into a flat render plan: a list of
+# (section, literal, slot) tuples. Rendering a mosque is then a single join
+# over the plan, instead of ~30 full-document replace passes per page.
+# section is None for always-rendered chunks, or the name of an optional
+# block (phone link, receiver, donation) that is dropped when its value is empty.
+
+# Literal template text -> slot name
+TEXT_SLOTS = {
+    "Masjid Abu Bakar - Ramadhan 1447 Timetable": 'title',
+    "Ramadan 1447 prayer timetable for Masjid Abu Bakar, Bradford": 'description',
+    "Masjid Abu Bakar - Ramadan 1447 Prayer Timetable": 'og_title',
+    "Masjid Abu Bakar, Bradford - Sehri, Iftar & prayer times with live countdown": 'og_description',
+    "Abu Bakar Times": 'app_title',
+    "https://waqt.uk/abubakar/": 'url',
+    "MASJID ABU BAKAR": 'heading',
+    "38 Steadman Terrace, Bradford, BD3 9NB": 'address',
+    "tel:01274668343": 'tel',
+    "01274 668343": 'phone_display',
+    "'abubakar-": 'storage_prefix',
+    "454.40625": 'receiver_freq',
+    "document.addEventListener('DOMContentLoaded', () => {": 'dom_ready',
+    '<strong>Cheques/Direct Debits:</strong>\n            Yorkshire Bank | Account No: <strong>18330977</strong> |\n            Sort Code: <strong>05-03-23</strong>': 'donation_info',
+}
+TEXT_SLOTS.update({color: f'color:{color}' for color in TEMPLATE_COLORS})
+# Only present in the bundle shell (see bundle.py)
+TEXT_SLOTS.update({MOSQUE_CONFIG_MARKER: 'mosque_config', TIMETABLE_READY_MARKER: 'timetable_ready'})
+# Longest first so no literal can shadow a longer one that contains it
+SLOT_RE = re.compile('|'.join(re.escape(lit) for lit in sorted(TEXT_SLOTS, key=len, reverse=True)))
+
+# Optional blocks: section name -> regex matching the whole block in the template
+SECTION_PATTERNS = {
+    'phone': r'<a href="tel:01274668343".*?</a>',
+    'receiver': r'<div style="background: #2c2c6c.*?</div>',
+    'donation': r'<div style="background: #1a1a1a; color: white.*?</div>',
+}
 
-# Template (abubakar) purple palette — replaced with mosque-specific colors
-TEMPLATE_COLORS = [
-    '#4a148c',  # primary dark   (30 uses)
-    '#7b1fa2',  # primary medium (12 uses)
-    '#6a1b9a',  # mid dark       ( 2 uses)
-    '#311b92',  # deep dark      ( 2 uses)
-    '#ce93d8',  # light secondary(16 uses)
-    '#e8d5f5',  # very light     ( 9 uses)
-    '#f3e5f5',  # palest tint    ( 4 uses)
-    '#ba68c8',  # medium-light   ( 1 use)
-    '#ab47bc',  # medium         ( 2 uses)
-    '#e040fb',  # bright accent  ( 2 uses)
-]
-
-def hex_to_rgb(h):
-    h = h.lstrip('#')
-    return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-
-def rgb_to_hex(r, g, b):
-    return '#{:02x}{:02x}{:02x}'.format(int(round(r)), int(round(g)), int(round(b)))
-
-def blend(h1, h2, t):
-    r1, g1, b1 = hex_to_rgb(h1)
-    r2, g2, b2 = hex_to_rgb(h2)
-    return rgb_to_hex(r1*(1-t)+r2*t, g1*(1-t)+g2*t, b1*(1-t)+b2*t)
-
-def lighten(h, amount):
-    return blend(h, '#ffffff', amount)
-
-def darken(h, amount):
-    return blend(h, '#000000', amount)
-
-def build_palette(c1, c2):
-    """Return list of (old_color, new_color) for TEMPLATE_COLORS, in order."""
-    return [
-        (TEMPLATE_COLORS[0], c1),                      # primary dark
-        (TEMPLATE_COLORS[1], c2),                      # primary medium
-        (TEMPLATE_COLORS[2], blend(c1, c2, 0.4)),      # mid dark
-        (TEMPLATE_COLORS[3], darken(c1, 0.15)),        # deep dark
-        (TEMPLATE_COLORS[4], lighten(c2, 0.55)),       # light secondary
-        (TEMPLATE_COLORS[5], lighten(c1, 0.78)),       # very light primary
-        (TEMPLATE_COLORS[6], lighten(c1, 0.88)),       # palest tint
-        (TEMPLATE_COLORS[7], lighten(c2, 0.38)),       # medium-light secondary
-        (TEMPLATE_COLORS[8], lighten(c2, 0.22)),       # medium secondary
-        (TEMPLATE_COLORS[9], c2),                      # bright accent → use c2
-    ]
-
-def apply_colors(html, c1, c2):
-    for old, new in build_palette(c1, c2):
-        html = html.replace(old, new)
-    return html
-
-def generate(config_path):
-    with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+_plan_cache = {}
+
+def find_timetable_span(html):
+    """Span of the timetableData block (line markers, not regex, to avoid matching nested brackets)."""
+    start_marker = 'const timetableData = ['
+    end_marker = '\n        ];'
+    start_idx = html.index(start_marker)
+    end_idx = html.index(end_marker, start_idx) + len(end_marker)
+    return start_idx, end_idx
+
+def find_footer_span(html):
+    """Span of the .footer div, found by counting nested divs to its matching close."""
+    footer_start = html.index('<div class="footer">')
+    depth = 0
+    for m in re.finditer(r'<div|</div>', html[footer_start:]):
+        depth += 1 if m.group(0) == '<div' else -1
+        if depth == 0:
+            return footer_start, footer_start + m.end()
+    raise ValueError('Unterminated footer div in template')
+
+def tokenize(text, section, plan):
+    """Split text into literal chunks and TEXT_SLOTS slots, appending to plan."""
+    pos = 0
+    for m in SLOT_RE.finditer(text):
+        if m.start() > pos:
+            plan.append((section, text[pos:m.start()], None))
+        plan.append((section, None, TEXT_SLOTS[m.group(0)]))
+        pos = m.end()
+    if pos < len(text):
+        plan.append((section, text[pos:], None))
+
+def compile_template(html):
+    """Compile template HTML into a render plan (see TEMPLATE COMPILATION above)."""
+    spans = [(*find_timetable_span(html), None, 'timetable'),
+             (*find_footer_span(html), None, 'footer')]
+    for section, pat in SECTION_PATTERNS.items():
+        m = re.search(pat, html, flags=re.DOTALL)
+        if m:
+            spans.append((m.start(), m.end(), section, None))
+    spans.sort()
+
+    plan = []
+    pos = 0
+    for start, end, section, slot in spans:
+        if start < pos:
+            raise ValueError(f'Overlapping template regions at offset {start}')
+        tokenize(html[pos:start], None, plan)
+        if slot:
+            plan.append((None, None, slot))
+        else:
+            tokenize(html[start:end], section, plan)
+        pos = end
+    tokenize(html[pos:], None, plan)
+    return plan
+
+def read_template(template_path=TEMPLATE_PATH, bundle=False):
+    """Returns (page html, {bundle filename: content}). With bundle, the page is the thin shell."""
+    with open(template_path, 'r', encoding='utf-8') as f:
         html = f.read()
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    return split_template(html) if bundle else (html, {})
+
+def load_plan(template_path=TEMPLATE_PATH, bundle=False):
+    """Read and compile the template (or its bundle shell) once per process."""
+    if (template_path, bundle) not in _plan_cache:
+        _plan_cache[(template_path, bundle)] = compile_template(read_template(template_path, bundle)[0])
+    return _plan_cache[(template_path, bundle)]
 
+def iter_render(plan, values, sections):
+    """Yield a plan's chunks in order: literals and slot values, skipping disabled sections.
+
+    A slot value is either a str or an iterator of str chunks (e.g. the timetable rows).
+    """
+    for section, literal, slot in plan:
+        if section is not None and section not in sections:
+            continue
+        if slot is None:
+            yield literal
+            continue
+        value = values[slot]
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, Iterator):
+            yield from value
+        else:
+            raise TypeError(f"slot {slot!r}: expected str, {type(value).__name__} found")
+
+def render(plan, values, sections):
+    """Render a plan to a single string."""
+    return ''.join(iter_render(plan, values, sections))
+
+def iter_timetable_js(timetable):
+    """Yield the timetableData literal one row at a time."""
+    yield "const timetableData = ["
+    for row in timetable:
+        yield f"\n            {row.to_js()},"
+    yield "\n        ];"
+
+def build_timetable_js(timetable):
+    return ''.join(iter_timetable_js(timetable))
+
+def iter_timetable_json(timetable):
+    """Compact columnar timetable.json: field names once, then one array per day."""
+    rows = (list(row.to_dict().values()) + list(row.schedule()) for row in timetable)
+    yield '{"fields":' + json.dumps(TIMETABLE_FIELDS + SCHEDULE_FIELDS, separators=(',', ':')) + ',"rows":['
+    for i, row in enumerate(rows):
+        yield (',' if i else '') + json.dumps(row, separators=(',', ':'), ensure_ascii=False)
+    yield ']}'
+
+def build_timetable_json(timetable):
+    return ''.join(iter_timetable_json(timetable))
+
+def build_timetable_loader():
+    """JS that replaces the inline literal in json mode.
+
+    timetableData stays a const array (filled in place) so the rest of the page
+    script is unchanged; the DOMContentLoaded init waits on timetableReady instead.
+    """
+    return (
+        "const timetableData = [];\n"
+        "        const timetableReady = Promise.all([\n"
+        f"            fetch('{TIMETABLE_ASSET}').then(r => r.json()).then(t => {{\n"
+        "                t.rows.forEach(r => timetableData.push(Object.fromEntries(t.fields.map((f, i) => [f, r[i]]))));\n"
+        "            }),\n"
+        "            new Promise(resolve => document.addEventListener('DOMContentLoaded', resolve))\n"
+        "        ]);"
+    )
+
+def build_mosque_config(prefix, name, url, colors):
+    """MOSQUE object read by the shared app.js (bundle layout only)."""
+    config = json.dumps({'prefix': prefix, 'name': name, 'url': url,
+                         'colors': [colors[c] for c in TEMPLATE_COLORS]}, ensure_ascii=False)
+    return config.replace('</', '<\\/')
+
+def build_footer_html(notes, eid_info, fitrana):
+    parts = ['<div class="footer">\n',
+             '            <div class="footer-section contact-box" style="flex: 1 1 100%;">\n',
+             f'                <em>{notes}</em>\n',
+             '            </div>\n']
+    if eid_info:
+        parts += ['            <div class="footer-section eid-info">\n',
+                  f'                <strong>Eid Salah</strong><br>{eid_info}\n',
+                  '            </div>\n']
+    if fitrana:
+        parts += ['            <div class="footer-section fitrana-box">\n',
+                  f'                <strong>Sadaqatul Fitr</strong><br>{fitrana}\n',
+                  '            </div>\n']
+    parts.append('        </div>')
+    return ''.join(parts)
+
+def render_page_chunks(config, folder, plan, timetable_mode='inline'):
+    """Render one mosque lazily. Returns {filename: iterator of str chunks} for every output file."""
     name = config["name"]
-    folder = os.path.dirname(config_path)
     prefix = config.get("prefix", re.sub(r'[^a-z0-9]', '', name.lower()))
     address = config["address"]
 
     # === THEME COLORS ===
     color1 = config.get("color1", "#4a148c")
     color2 = config.get("color2", "#7b1fa2")
-    if color1 != "#4a148c" or color2 != "#7b1fa2":
-        html = apply_colors(html, color1, color2)
     short_name = config.get("short_name", name.split(" ")[-1] if len(name.split()) > 2 else name)
     phone = config.get("phone", "")
     phone_display = config.get("phone_display", phone)
@@ -82,124 +242,296 @@ def generate(config_path):
     donation_info = config.get("donation_info", "")
     website = config.get("website", "")
     receiver_freq = config.get("receiver_freq", "")
-    timetable = config["timetable"]
-
-    # === META / TITLE ===
-    html = html.replace("Masjid Abu Bakar - Ramadhan 1447 Timetable", f"{name} - Ramadhan 1447 Timetable")
-    html = html.replace("Ramadan 1447 prayer timetable for Masjid Abu Bakar, Bradford", f"Ramadan 1447 prayer timetable for {name}, Bradford")
-    html = html.replace("Masjid Abu Bakar - Ramadan 1447 Prayer Timetable", f"{name} - Ramadan 1447 Prayer Timetable")
-    html = html.replace("Masjid Abu Bakar, Bradford - Sehri, Iftar & prayer times with live countdown", f"{name}, Bradford - Sehri, Iftar & prayer times with live countdown")
-    html = html.replace("Abu Bakar Times", f"{short_name} Times")
-
-    # === URLS ===
-    html = html.replace("https://waqt.uk/abubakar/", f"https://waqt.uk/{os.path.basename(folder)}/")
-
-    # === HEADER CONTENT ===
-    html = html.replace("MASJID ABU BAKAR", name.upper())
-    html = html.replace("38 Steadman Terrace, Bradford, BD3 9NB", address)
-
-    # === CONTACT INFO ===
-    if phone:
-        html = html.replace("tel:01274668343", f"tel:{phone.replace(' ', '')}")
-        html = html.replace("01274 668343", phone_display)
-    else:
-        # Remove phone link entirely
-        html = re.sub(r'<a href="tel:01274668343".*?</a>', '', html, flags=re.DOTALL)
+    timetable = Timetable.from_dicts(config["timetable"])
+    url = f"https://waqt.uk/{os.path.basename(folder)}/"
+    colors = color_map(color1, color2)
 
-    # === LOCALSTORAGE PREFIX ===
-    html = html.replace("'abubakar-", f"'{prefix}-")
+    values = {
+        # === META / TITLE ===
+        'title': f"{name} - Ramadhan 1447 Timetable",
+        'description': f"Ramadan 1447 prayer timetable for {name}, Bradford",
+        'og_title': f"{name} - Ramadan 1447 Prayer Timetable",
+        'og_description': f"{name}, Bradford - Sehri, Iftar & prayer times with live countdown",
+        'app_title': f"{short_name} Times",
+        # === URLS ===
+        'url': url,
+        # === HEADER CONTENT ===
+        'heading': name.upper(),
+        'address': address,
+        # === CONTACT INFO ===
+        'tel': f"tel:{phone.replace(' ', '')}",
+        'phone_display': phone_display,
+        # === LOCALSTORAGE PREFIX ===
+        'storage_prefix': f"'{prefix}-",
+        # === FOOTER ===
+        'footer': build_footer_html(notes, eid_info, fitrana),
+        'receiver_freq': receiver_freq,
+        'donation_info': donation_info,
+        # === BUNDLE SHELL ===
+        'mosque_config': build_mosque_config(prefix, name, url, colors),
+    }
+    values.update({f'color:{old}': new for old, new in colors.items()})
 
     # === TIMETABLE DATA ===
-    timetable_js = "const timetableData = [\n"
-    for row in timetable:
-        timetable_js += "            { "
-        timetable_js += f'date: [{row["date"][0]}, {row["date"][1]}, {row["date"][2]}], '
-        timetable_js += f'day: "{row["day"]}", no: {row["no"]}, '
-        timetable_js += f'sehri: "{row["sehri"]}", fajr: "{row["fajr"]}", '
-        timetable_js += f'sunrise: "{row["sunrise"]}", zuhr: "{row["zuhr"]}", '
-        timetable_js += f'asr: "{row["asr"]}", isha: "{row["isha"]}", '
-        timetable_js += f'jFajr: "{row["jFajr"]}", jZuhr: "{row["jZuhr"]}", '
-        timetable_js += f'jAsr: "{row["jAsr"]}", maghrib: "{row["maghrib"]}", '
-        timetable_js += f'jIsha: "{row["jIsha"]}"'
-        timetable_js += " },\n"
-    timetable_js += "        ]"
-    # Find the full timetableData block using line markers (not regex, to avoid matching nested brackets)
-    start_marker = 'const timetableData = ['
-    end_marker = '\n        ];'
-    start_idx = html.index(start_marker)
-    end_idx = html.index(end_marker, start_idx) + len(end_marker)
-    html = html[:start_idx] + timetable_js + ';' + html[end_idx:]
-
-    # === FOOTER ===
-    # Replace footer content
-    footer_html = '<div class="footer">\n'
-    footer_html += f'            <div class="footer-section contact-box" style="flex: 1 1 100%;">\n'
-    footer_html += f'                <em>{notes}</em>\n'
-    footer_html += '            </div>\n'
-    if eid_info:
-        footer_html += f'            <div class="footer-section eid-info">\n'
-        footer_html += f'                <strong>Eid Salah</strong><br>{eid_info}\n'
-        footer_html += '            </div>\n'
-    if fitrana:
-        footer_html += f'            <div class="footer-section fitrana-box">\n'
-        footer_html += f'                <strong>Sadaqatul Fitr</strong><br>{fitrana}\n'
-        footer_html += '            </div>\n'
-    footer_html += '        </div>'
-    # Replace only the .footer div (from <div class="footer"> to its matching </div>\n        </div>)
-    footer_start = html.index('<div class="footer">')
-    # The footer section ends with </div>\n        </div> (inner section + outer footer)
-    # Count nested divs to find the matching close
-    depth = 0
-    i = footer_start
-    while i < len(html):
-        if html[i:i+4] == '<div':
-            depth += 1
-        elif html[i:i+6] == '</div>':
-            depth -= 1
-            if depth == 0:
-                footer_end = i + 6
-                break
-        i += 1
-    html = html[:footer_start] + footer_html + html[footer_end:]
-
-    # Actually, simpler: just replace the footer section only
-    # The above regex is fragile. Let me use a marker approach instead.
-    # For now, just replace the specific Abu Bakar footer text
-    html = html.replace(
-        "<em>Maghrib Salah to start 10 minutes after Iftar</em>",
-        f"<em>{notes}</em>"
-    )
-
-    # Replace radio receiver section
-    if not receiver_freq:
-        html = re.sub(r'<div style="background: #2c2c6c.*?</div>', '', html, flags=re.DOTALL)
+    outputs = {}
+    if timetable_mode == 'json':
+        values['timetable'] = build_timetable_loader()
+        values['dom_ready'] = "timetableReady.then(() => {"
+        values['timetable_ready'] = ""
+        outputs[TIMETABLE_ASSET] = iter_timetable_json(timetable)
     else:
-        html = html.replace("454.40625", receiver_freq)
+        values['timetable'] = iter_timetable_js(timetable)
+        values['dom_ready'] = "document.addEventListener('DOMContentLoaded', () => {"
+        # The bundle's app.js always starts on timetableReady
+        values['timetable_ready'] = ("\n        const timetableReady = "
+                                     "new Promise(resolve => document.addEventListener('DOMContentLoaded', resolve));")
 
-    # Replace donation section
-    if not donation_info:
-        html = re.sub(r'<div style="background: #1a1a1a; color: white.*?</div>', '', html, flags=re.DOTALL)
-    else:
-        html = html.replace(
-            '<strong>Cheques/Direct Debits:</strong>\n            Yorkshire Bank | Account No: <strong>18330977</strong> |\n            Sort Code: <strong>05-03-23</strong>',
-            donation_info
-        )
+    # Optional blocks are dropped entirely when their value is empty
+    sections = {section for section, enabled in (('phone', phone),
+                                                 ('receiver', receiver_freq),
+                                                 ('donation', donation_info)) if enabled}
+    outputs['index.html'] = iter_render(plan, values, sections)
+    return outputs
 
-    # Write output
-    out_path = os.path.join(folder, 'index.html')
-    with open(out_path, 'w', encoding='utf-8') as f:
-        f.write(html)
-    print(f"Generated: {out_path}")
+def render_page(config, folder, plan, timetable_mode='inline'):
+    """Render one mosque. Returns {filename: content} for every output file of the page."""
+    return {filename: ''.join(chunks)
+            for filename, chunks in render_page_chunks(config, folder, plan, timetable_mode).items()}
 
-def main():
-    data_files = glob.glob(os.path.join(MASJIDS_DIR, '*', 'data.json'))
-    print(f"Found {len(data_files)} data files")
-    for df in sorted(data_files):
+def output_names(timetable_mode='inline'):
+    return ['index.html', TIMETABLE_ASSET] if timetable_mode == 'json' else ['index.html']
+
+def generate(config_path, plan=None, timetable_mode='inline'):
+    if plan is None:
+        plan = load_plan()
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    folder = os.path.dirname(config_path)
+    outputs = render_page_chunks(config, folder, plan, timetable_mode)
+
+    # Stream every output to a temp file first, then rename them all into place, so a
+    # failure part-way through a page leaves all of its previous files intact
+    staged = []
+    try:
+        for filename, chunks in outputs.items():
+            out_path = os.path.join(folder, filename)
+            staged.append((out_path, *build_manifest.stream_to_temp(out_path, chunks)))
+    except BaseException:
+        for _, tmp, _ in staged:
+            build_manifest.discard_temp(tmp)
+        raise
+
+    out_paths = []
+    for out_path, tmp, digest in staged:
+        # Identical content is left untouched
+        if build_manifest.commit_temp(out_path, tmp, digest):
+            print(f"Generated: {out_path}")
+        else:
+            print(f"Unchanged: {out_path}")
+        out_paths.append(out_path)
+    return out_paths
+
+def compare_timetable_modes(data_files, plan):
+    """Compare page weight of inline vs json timetable mode for every mosque (raw and gzip bytes).
+
+    "Correction" is what a returning visitor re-downloads after a timetable-only fix:
+    the whole page in inline mode, only timetable.json in json mode.
+    """
+    def gz(text):
+        return len(gzip.compress(text.encode('utf-8'), 6))
+
+    totals = dict.fromkeys(['inline', 'inline_gz', 'json', 'json_gz', 'fix_inline_gz', 'fix_json_gz'], 0)
+    print(f"{'mosque':40} {'inline':>9} {'inline.gz':>9} {'json':>9} {'json.gz':>9} {'fix old':>8} {'fix new':>8}")
+    for df in data_files:
+        with open(df, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        folder = os.path.dirname(df)
         try:
-            generate(df)
+            inline = render_page(config, folder, plan, 'inline')['index.html']
+            split = render_page(config, folder, plan, 'json')
         except Exception as e:
-            print(f"ERROR generating {df}: {e}")
+            print(f"{os.path.basename(folder)[:40]:40} ERROR {e}")
+            continue
+        row = {
+            'inline': len(inline.encode('utf-8')),
+            'inline_gz': gz(inline),
+            'json': sum(len(c.encode('utf-8')) for c in split.values()),
+            'json_gz': sum(gz(c) for c in split.values()),
+            'fix_inline_gz': gz(inline),
+            'fix_json_gz': gz(split[TIMETABLE_ASSET]),
+        }
+        for k, v in row.items():
+            totals[k] += v
+        print(f"{os.path.basename(folder)[:40]:40} {row['inline']:>9} {row['inline_gz']:>9} {row['json']:>9} "
+              f"{row['json_gz']:>9} {row['fix_inline_gz']:>8} {row['fix_json_gz']:>8}")
+    print(f"{'TOTAL':40} {totals['inline']:>9} {totals['inline_gz']:>9} {totals['json']:>9} "
+          f"{totals['json_gz']:>9} {totals['fix_inline_gz']:>8} {totals['fix_json_gz']:>8}")
+    return totals
+
+def compare_bundle(data_files, timetable_mode='inline'):
+    """Compare full pages against bundle shells (gzip bytes).
+
+    First visit = shell + app.css + app.js; every further mosque page = shell only,
+    since the content-hashed bundle is already cached.
+    """
+    def gz(text):
+        return len(gzip.compress(text.encode('utf-8'), 6))
+
+    full_plan, shell_plan = load_plan(), load_plan(bundle=True)
+    bundle_gz = sum(gz(c) for c in read_template(bundle=True)[1].values())
+    totals = {'pages': 0, 'full_gz': 0, 'shell_gz': 0}
+    print(f"{'mosque':40} {'full.gz':>9} {'shell.gz':>9}")
+    for df in data_files:
+        with open(df, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        folder = os.path.dirname(df)
+        try:
+            full = gz(render_page(config, folder, full_plan, timetable_mode)['index.html'])
+            shell = gz(render_page(config, folder, shell_plan, timetable_mode)['index.html'])
+        except Exception as e:
+            print(f"{os.path.basename(folder)[:40]:40} ERROR {e}")
+            continue
+        totals['pages'] += 1
+        totals['full_gz'] += full
+        totals['shell_gz'] += shell
+        print(f"{os.path.basename(folder)[:40]:40} {full:>9} {shell:>9}")
+    pages = totals['pages'] or 1
+    print(f"{'TOTAL':40} {totals['full_gz']:>9} {totals['shell_gz']:>9}   (bundle.gz {bundle_gz}, once)")
+    print(f"Average page: {totals['full_gz'] // pages} -> {totals['shell_gz'] // pages} bytes gz "
+          f"(first visit {totals['shell_gz'] // pages + bundle_gz})")
+    totals['bundle_gz'] = bundle_gz
+    return totals
+
+# === PARALLEL BUILD ===
+# Worker processes receive the compiled plan once through the pool initializer
+# instead of re-reading and re-compiling the template per page.
+_worker_plan = None
+
+def _init_worker(plan):
+    global _worker_plan
+    _worker_plan = plan
+
+def build_page(config_path, plan=None, timetable_mode='inline'):
+    """Generate one page and return a result record (never raises)."""
+    started = time.perf_counter()
+    result = {'data_file': config_path, 'outputs': [], 'ok': False, 'seconds': 0.0, 'error': None}
+    try:
+        result['outputs'] = generate(config_path, plan or _worker_plan, timetable_mode)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+def build_all(data_files, jobs=1, plan=None, timetable_mode='inline', bundle=False):
+    """Build every data file, serially or across a process pool. Returns result records in input order."""
+    if plan is None:
+        plan = load_plan(bundle=bundle)
+    if jobs <= 1 or len(data_files) <= 1:
+        return [build_page(df, plan, timetable_mode) for df in data_files]
+    chunksize = max(1, len(data_files) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(plan,)) as pool:
+        return list(pool.map(partial(build_page, timetable_mode=timetable_mode), data_files, chunksize=chunksize))
+
+def sources_hash():
+    """Hash of the GENERATOR_SOURCES module sources."""
+    return build_manifest.inputs_key(*(build_manifest.sha256_file(path) for path in GENERATOR_SOURCES))
+
+def page_key(config_path, template_hash, timetable_mode='inline', bundle=False, code_hash=''):
+    """Manifest key for a page: data.json bytes + template hash + generator version and
+    sources + output layout."""
+    with open(config_path, 'rb') as f:
+        return build_manifest.inputs_key(f.read(), template_hash, GENERATOR_VERSION, code_hash,
+                                         timetable_mode, bundle)
+
+def summarize(results, wall_seconds, jobs, skipped=()):
+    """Structured build summary: counts, timings and per-page errors."""
+    page_seconds = [r['seconds'] for r in results]
+    return {
+        'jobs': jobs,
+        'pages': len(results),
+        'skipped': len(skipped),
+        'ok': sum(1 for r in results if r['ok']),
+        'failed': sum(1 for r in results if not r['ok']),
+        'wall_seconds': round(wall_seconds, 3),
+        'cpu_seconds': round(sum(page_seconds), 3),
+        'slowest': sorted(({'data_file': r['data_file'], 'seconds': r['seconds']} for r in results),
+                          key=lambda r: -r['seconds'])[:5],
+        'errors': [{'data_file': r['data_file'], 'error': r['error'], 'traceback': r.get('traceback')}
+                   for r in results if not r['ok']],
+        'pages_detail': [{'data_file': r['data_file'], 'outputs': r['outputs'], 'ok': r['ok'],
+                          'seconds': r['seconds']} for r in results],
+    }
+
+def print_summary(summary):
+    print(f"\nBuilt {summary['ok']}/{summary['pages']} pages with {summary['jobs']} job(s) "
+          f"in {summary['wall_seconds']}s (page time total {summary['cpu_seconds']}s), "
+          f"{summary['skipped']} unchanged skipped")
+    for r in summary['slowest']:
+        print(f"  slow: {r['seconds']:.4f}s {r['data_file']}")
+    for e in summary['errors']:
+        print(f"  ERROR generating {e['data_file']}: {e['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='worker processes (0 = one per CPU core)')
+    parser.add_argument('--summary', help='write the structured build summary to this JSON file')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every page even if the build manifest says it is up to date')
+    parser.add_argument('--timetable-mode', choices=TIMETABLE_MODES, default='inline',
+                        help='inline the timetable in index.html, or emit it as a separate timetable.json')
+    parser.add_argument('--compare-timetable-modes', action='store_true',
+                        help='report inline vs json page weight for all mosques and exit without writing')
+    parser.add_argument('--bundle', action='store_true',
+                        help='emit thin per-mosque pages sharing a content-hashed assets/app.<hash>.css/.js')
+    parser.add_argument('--compare-bundle', action='store_true',
+                        help='report full page vs bundle shell weight for all mosques and exit without writing')
+    args = parser.parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    mode = args.timetable_mode
+
+    data_files = sorted(glob.glob(os.path.join(MASJIDS_DIR, '*', 'data.json')))
+    print(f"Found {len(data_files)} data files")
+    if args.compare_timetable_modes:
+        compare_timetable_modes(data_files, load_plan())
+        return 0
+    if args.compare_bundle:
+        compare_bundle(data_files, mode)
+        return 0
+    started = time.perf_counter()
+
+    if args.bundle:
+        for path in write_bundle(read_template(bundle=True)[1], ASSETS_DIR):
+            print(f"Bundle: {path}")
+
+    # === INCREMENTAL BUILD ===
+    manifest = build_manifest.load_manifest()
+    template_hash = build_manifest.sha256_file(TEMPLATE_PATH)
+    code_hash = sources_hash()
+    keys = {df: page_key(df, template_hash, mode, args.bundle, code_hash) for df in data_files}
+    stale = [df for df in data_files if args.force or not all(
+        build_manifest.is_fresh(manifest, os.path.join(os.path.dirname(df), name), keys[df])
+        for name in output_names(mode))]
+    stale_set = set(stale)
+    skipped = [df for df in data_files if df not in stale_set]
+
+    results = build_all(stale, jobs, timetable_mode=mode, bundle=args.bundle)
+    for r in results:
+        if r['ok']:
+            for out_path in r['outputs']:
+                build_manifest.record(manifest, out_path, keys[r['data_file']])
+    build_manifest.save_manifest(manifest)
+
+    summary = summarize(results, time.perf_counter() - started, jobs, skipped)
+    print_summary(summary)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to: {args.summary}")
     print("Done!")
+    return 1 if summary['failed'] else 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
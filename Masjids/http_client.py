@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Pooled keep-alive HTTP client for the pipeline scripts (stdlib http.client, no curl).
+
+One Pool is shared by every thread: each request borrows an idle connection to its
+host (or opens one), and hands it back afterwards so the next request to that host
+skips the TCP/TLS handshake. Request bodies stay in memory.
+
+    pool = Pool()
+    reply = pool.post_json("https://api.example.com/v1/x", {"a": 1}, headers={...}, timeout=30)
+"""
+import http.client, json, socket, threading, time
+from urllib.parse import urlsplit
+
+USER_AGENT = "Prayer-times/1.0"
+
+class HTTPError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+class RequestCancelled(Exception):
+    pass
+
+# A reused keep-alive connection the server has since closed fails with one of these
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                BrokenPipeError, ConnectionResetError)
+
+class _NoDelay:
+    """http.client sends headers and body in separate writes; without TCP_NODELAY the
+    body waits ~40ms on Nagle + delayed ACK on every request of a keep-alive connection."""
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+class HTTPConnection(_NoDelay, http.client.HTTPConnection):
+    pass
+
+class HTTPSConnection(_NoDelay, http.client.HTTPSConnection):
+    pass
+
+class Pool:
+    """Keep-alive connections per (scheme, host, port); thread-safe."""
+
+    def __init__(self, max_idle_per_host=4, timeout=30):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "connections": 0, "reused": 0}
+
+    def _checkout(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats["reused"] += 1
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.stats["connections"] += 1
+        scheme, host, port = key
+        cls = HTTPSConnection if scheme == "https" else HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=None, cancel=None):
+        """Send a request; returns (status, response headers, body bytes).
+
+        timeout bounds the whole request (a deadline watcher runs alongside it, so a reply
+        trickling in byte by byte is cut off too); cancel is an optional threading.Event
+        that aborts it from another thread. Raises TimeoutError or RequestCancelled.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        with self._lock:
+            self.stats["requests"] += 1
+
+        for attempt in range(2):
+            conn, reused = self._checkout(key, timeout)
+            watcher = None
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                watcher = _Watcher(conn.sock, timeout, cancel)
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if watcher:
+                    watcher.stop()
+                    watcher.raise_fired()
+                if reused and attempt == 0 and isinstance(e, STALE_ERRORS):
+                    continue  # server dropped the idle connection; retry on a fresh one
+                raise
+            watcher.stop()
+            if response.will_close or watcher.fired:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return response.status, response.headers, data
+
+    def request_json(self, method, url, payload=None, headers=None, timeout=None, cancel=None):
+        """JSON in, JSON out. Raises HTTPError for non-2xx replies."""
+        body = None
+        headers = dict(headers or {})
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        status, _, data = self.request(method, url, body, headers, timeout, cancel)
+        text = data.decode("utf-8", "replace")
+        if not 200 <= status < 300:
+            raise HTTPError(status, text)
+        return json.loads(text) if text else None
+
+    def post_json(self, url, payload, headers=None, timeout=None, cancel=None):
+        return self.request_json("POST", url, payload, headers, timeout, cancel)
+
+    def get_json(self, url, headers=None, timeout=None, cancel=None):
+        return self.request_json("GET", url, None, headers, timeout, cancel)
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+class _Watcher:
+    """Aborts a blocked request when cancel is set or the overall deadline passes,
+    by shutting down the connection's socket from a helper thread. It holds the socket
+    itself: http.client drops conn.sock once a will-close response has started."""
+
+    def __init__(self, sock, timeout, cancel):
+        self.sock = sock
+        self.deadline = time.monotonic() + timeout
+        self.cancel = cancel
+        self.fired = None
+        self._done = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while not self._done.wait(0.05):
+            if self.cancel is not None and self.cancel.is_set():
+                self.fired = "cancelled"
+            elif time.monotonic() > self.deadline:
+                self.fired = "timeout"
+            else:
+                continue
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return
+
+    def stop(self):
+        self._done.set()
+
+    def raise_fired(self):
+        """Re-raise a failure the watcher caused as RequestCancelled / TimeoutError."""
+        if self.fired == "cancelled":
+            raise RequestCancelled()
+        if self.fired == "timeout":
+            raise TimeoutError("request timed out")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Mosque colour palette engine shared by the site generators.
+
+Derives the full template palette from a mosque's (color1, color2) pair,
+memoized per pair. generate.py's render plan and bundle.py substitute the colours.
+"""
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
+# Template (abubakar) purple palette — replaced with mosque-specific colors
+TEMPLATE_COLORS = [
+    '#4a148c',  # primary dark   (30 uses)
+    '#7b1fa2',  # primary medium (12 uses)
+    '#6a1b9a',  # mid dark       ( 2 uses)
+    '#311b92',  # deep dark      ( 2 uses)
+    '#ce93d8',  # light secondary(16 uses)
+    '#e8d5f5',  # very light     ( 9 uses)
+    '#f3e5f5',  # palest tint    ( 4 uses)
+    '#ba68c8',  # medium-light   ( 1 use)
+    '#ab47bc',  # medium         ( 2 uses)
+    '#e040fb',  # bright accent  ( 2 uses)
+]
+DEFAULT_COLOR1, DEFAULT_COLOR2 = TEMPLATE_COLORS[0], TEMPLATE_COLORS[1]
+
+HEX_COLOR = r'#[0-9a-fA-F]{6}'
+TEMPLATE_COLOR_RE = re.compile('|'.join(re.escape(c) for c in TEMPLATE_COLORS))
+
+# Mosque silhouette SVG icon (path-based, renders on all platforms including iOS)
+# White mosque on colored rounded-rect background; {c} is the URL-encoded color (%23xxxxxx)
+MOSQUE_ICON = (
+    "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'>"
+    "<rect fill='{c}' width='100' height='100' rx='20'/>"
+    "<path d='M30 55 Q50 20 70 55 Z' fill='white' opacity='0.95'/>"
+    "<rect x='22' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
+    "<polygon points='22,35 25,25 28,35' fill='white' opacity='0.9'/>"
+    "<rect x='72' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
+    "<polygon points='72,35 75,25 78,35' fill='white' opacity='0.9'/>"
+    "<rect x='30' y='55' width='40' height='20' fill='white' opacity='0.9'/>"
+    "<path d='M44 75 L44 62 Q50 56 56 62 L56 75 Z' fill='{c}' opacity='0.8'/>"
+    "<circle cx='50' cy='28' r='5' fill='white'/>"
+    "<circle cx='52' cy='27' r='4' fill='{c}'/>"
+    "</svg>"
+)
+
+@lru_cache(maxsize=None)
+def hex_to_rgb(h):
+    h = h.lstrip('#')
+    return tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+
+def rgb_to_hex(r, g, b):
+    return '#{:02x}{:02x}{:02x}'.format(int(round(r)), int(round(g)), int(round(b)))
+
+def blend(h1, h2, t):
+    r1, g1, b1 = hex_to_rgb(h1)
+    r2, g2, b2 = hex_to_rgb(h2)
+    return rgb_to_hex(r1*(1-t)+r2*t, g1*(1-t)+g2*t, b1*(1-t)+b2*t)
+
+def lighten(h, amount):
+    return blend(h, '#ffffff', amount)
+
+def darken(h, amount):
+    return blend(h, '#000000', amount)
+
+@lru_cache(maxsize=1024)
+def build_palette(c1, c2):
+    """Return tuple of (old_color, new_color) for TEMPLATE_COLORS, in order. Cached per (c1, c2)."""
+    return (
+        (TEMPLATE_COLORS[0], c1),                      # primary dark
+        (TEMPLATE_COLORS[1], c2),                      # primary medium
+        (TEMPLATE_COLORS[2], blend(c1, c2, 0.4)),      # mid dark
+        (TEMPLATE_COLORS[3], darken(c1, 0.15)),        # deep dark
+        (TEMPLATE_COLORS[4], lighten(c2, 0.55)),       # light secondary
+        (TEMPLATE_COLORS[5], lighten(c1, 0.78)),       # very light primary
+        (TEMPLATE_COLORS[6], lighten(c1, 0.88)),       # palest tint
+        (TEMPLATE_COLORS[7], lighten(c2, 0.38)),       # medium-light secondary
+        (TEMPLATE_COLORS[8], lighten(c2, 0.22)),       # medium secondary
+        (TEMPLATE_COLORS[9], c2),                      # bright accent → use c2
+    )
+
+@lru_cache(maxsize=1024)
+def color_map(c1, c2):
+    """Read-only mapping of template color -> mosque color (shared between calls, so not a
+    dict). The default pair maps every color to itself."""
+    if (c1, c2) == (DEFAULT_COLOR1, DEFAULT_COLOR2):
+        return MappingProxyType({c: c for c in TEMPLATE_COLORS})
+    return MappingProxyType(dict(build_palette(c1, c2)))
+
+def url_color(color_hex):
+    """'#4a148c' -> '%234a148c' for use inside data: URIs."""
+    return color_hex.replace('#', '%23')
+
+def mosque_icon_svg(color_hex):
+    """Mosque silhouette SVG (for data: URIs) on a background of color_hex ('#xxxxxx' or '%23xxxxxx')."""
+    return MOSQUE_ICON.format(c=url_color(color_hex))
+
+def mosque_icon_data_uri(color_hex):
+    """Returns a data:image/svg+xml URI for use in manifest and link tags."""
+    return f"data:image/svg+xml,{mosque_icon_svg(color_hex)}"
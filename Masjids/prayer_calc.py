@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Calculate prayer begin times for directory mosques that have no timetable.
+
+Fajr/Sunrise/Zuhr/Asr/Maghrib/Isha are computed as (mosques x days) NumPy arrays
+for every mosque in directory_clean.json over a date range (default: a whole
+year), then written as one data.json per mosque. Jamaah times are left blank - only
+the mosque knows those. Each row's "no" is its day of Ramadan 1447, null on other days
+(the pages then show no Ramadan day or progress).
+
+    python prayer_calc.py --year 2026
+    python prayer_calc.py --start 2026-02-18 --days 30 --convention Karachi --asr standard
+
+Output goes to calculated/ (not committed) for checking. To build pages for them, write
+into the Masjids folder itself, where generate.py picks up every <folder>/data.json:
+
+    python prayer_calc.py --out . && python generate.py
+"""
+import argparse, json, os, re, time
+from datetime import date as dt_date, timedelta
+
+import numpy as np
+
+import solar
+from build_manifest import write_text_if_changed
+from timetable_model import ROW_FIELDS, SEHRI_MARGIN, to_12h
+
+OUTPUT_DIR = os.path.join(solar.MASJIDS_DIR, 'calculated')
+RAMADAN_START = dt_date(2026, 2, 18)   # 1 Ramadan 1447, day 1 of the hand-made timetables
+RAMADAN_DAYS = 30
+
+# Twilight angles below the horizon; isha_minutes = fixed interval after Maghrib
+CONVENTIONS = {
+    'MWL': {'fajr': 18, 'isha': 17},          # Muslim World League
+    'ISNA': {'fajr': 15, 'isha': 15},         # Islamic Society of North America
+    'Egypt': {'fajr': 19.5, 'isha': 17.5},    # Egyptian General Authority of Survey
+    'Karachi': {'fajr': 18, 'isha': 18},      # University of Islamic Sciences, Karachi
+    'UmmAlQura': {'fajr': 18.5, 'isha_minutes': 90},
+}
+# Asr when an object's shadow is this many times its length (plus the noon shadow)
+ASR_FACTORS = {'standard': 1, 'hanafi': 2}
+# In UK summers the sun never gets 18 degrees below the horizon, so Fajr/Isha are
+# capped at a fraction of the night: angle/60 of it, a seventh, or half.
+HIGH_LAT_RULES = ['angle', 'seventh', 'middle', 'none']
+PRAYER_FIELDS = ['sehri', 'fajr', 'sunrise', 'zuhr', 'asr', 'maghrib', 'isha']
+
+# Grid cache: mosques in the same cell share the times calculated at the cell centre.
+# Every time moves 4 minutes per degree of longitude; across UK latitudes no time moves
+# more than ~15 minutes per degree of latitude (Fajr/Isha under the angle and seventh
+# rules - the 'middle'/'none' rules can jump faster near the end of summer twilight).
+LON_MINUTES_PER_DEGREE = 4
+LAT_MINUTES_PER_DEGREE = 15
+DEFAULT_TOLERANCE = 1.0   # minutes
+# (settings, (lat cell, lon cell), year) -> (PRAYER_FIELDS x 366 minutes by day of year, filled mask)
+_cell_cache = {}
+_cell_stats = {'lookups': 0, 'computed': 0}
+
+# Minute of the day -> 'H:MM'; index -1 (a blank time) -> ''
+CLOCK = [to_12h(m) for m in range(1440)] + ['']
+
+def _night_portion(night, angle, high_lat):
+    if high_lat == 'angle':
+        return night * angle / 60
+    return night * (1 / 7 if high_lat == 'seventh' else 1 / 2)
+
+def prayer_times(locations, dates, convention='MWL', asr='hanafi', high_lat='angle', tz=solar.LOCAL_TZ):
+    """Begin times for every location on every date.
+
+    Returns a dict of (len(locations), len(dates)) float arrays of local minutes
+    since midnight, NaN where a time does not occur (only with high_lat='none'):
+    sehri, fajr, sunrise, zuhr, asr, maghrib, isha.
+    """
+    conv = CONVENTIONS[convention]
+    grid = solar.SunGrid(locations, dates, tz)
+    noon = grid.noon
+    half_day = grid.half_day()
+    sunrise, sunset = noon - half_day, noon + half_day
+    fajr = noon - grid.half_day(('altitude', -conv['fajr']))
+    if 'isha_minutes' in conv:
+        isha = sunset + conv['isha_minutes']
+    else:
+        isha = noon + grid.half_day(('altitude', -conv['isha']))
+
+    if high_lat != 'none':
+        night = 1440 - (sunset - sunrise)
+        earliest = sunrise - _night_portion(night, conv['fajr'], high_lat)
+        fajr = np.where(np.isnan(fajr) | (fajr < earliest), earliest, fajr)
+        if 'isha_minutes' not in conv:
+            latest = sunset + _night_portion(night, conv['isha'], high_lat)
+            isha = np.where(np.isnan(isha) | (isha > latest), latest, isha)
+
+    return {
+        'sehri': fajr - SEHRI_MARGIN,
+        'fajr': fajr,
+        'sunrise': sunrise,
+        'zuhr': noon,
+        'asr': noon + grid.half_day(('asr', ASR_FACTORS[asr])),
+        'maghrib': sunset,
+        'isha': isha,
+    }
+
+def grid_cells(locations, tolerance):
+    """(cell per location as an (n, 2) int array, cell centres) for a grid fine enough that
+    times at a cell's centre are within tolerance minutes of anywhere in the cell."""
+    coords = np.asarray(locations, dtype=float).reshape(-1, 2)
+    steps = np.array([tolerance / LAT_MINUTES_PER_DEGREE, tolerance / LON_MINUTES_PER_DEGREE])
+    cells = np.floor(coords / steps).astype(np.int64)
+    return cells, (cells + 0.5) * steps
+
+def cached_prayer_times(locations, dates, convention='MWL', asr='hanafi', high_lat='angle',
+                        tolerance=DEFAULT_TOLERANCE, tz=solar.LOCAL_TZ):
+    """prayer_times() computed once per (grid cell, date) and shared by every location in the cell.
+
+    Results are cached across calls; cell_cache_stats() reports the hit rate.
+    tolerance <= 0 calculates every location exactly.
+    """
+    if tolerance <= 0:
+        return prayer_times(locations, dates, convention, asr, high_lat, tz)
+    settings = (convention, asr, high_lat, tolerance, str(tz))
+    cells, centres = grid_cells(locations, tolerance)
+    unique, first, cell_index = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    cell_keys = [tuple(cell) for cell in unique.tolist()]
+    # Date columns of each year, and where they sit in that year's cached block
+    years = np.array([d.year for d in dates], dtype=np.int64)
+    day_of_year = np.array([d.timetuple().tm_yday - 1 for d in dates], dtype=np.int64)
+    by_year = []
+    for year in np.unique(years).tolist():
+        cols = np.flatnonzero(years == year)
+        by_year.append((year, cols, day_of_year[cols]))
+
+    def blocks(i):
+        for year, cols, days in by_year:
+            key = (settings, cell_keys[i], year)
+            if key not in _cell_cache:
+                _cell_cache[key] = (np.empty((len(PRAYER_FIELDS), 366)), np.zeros(366, dtype=bool))
+            yield cols, days, _cell_cache[key]
+
+    values = np.empty((len(PRAYER_FIELDS), len(cell_keys), len(dates)))
+    filled = np.zeros((len(cell_keys), len(dates)), dtype=bool)
+    for i in range(len(cell_keys)):
+        for cols, days, (block, known) in blocks(i):
+            values[:, i, cols] = block[:, days]
+            filled[i, cols] = known[days]
+    rows, cols = np.nonzero(~filled)
+    if len(rows):
+        need_cells, need_dates = np.unique(rows), np.unique(cols)
+        fresh = prayer_times(centres[first[need_cells]], [dates[j] for j in need_dates],
+                             convention, asr, high_lat, tz)
+        # Position of each missing (cell, date) inside the freshly computed block
+        fresh_rows, fresh_cols = np.searchsorted(need_cells, rows), np.searchsorted(need_dates, cols)
+        for k, field in enumerate(PRAYER_FIELDS):
+            values[k, rows, cols] = fresh[field][fresh_rows, fresh_cols]
+        for i in need_cells.tolist():
+            for cols_i, days, (block, known) in blocks(i):
+                block[:, days] = values[:, i, cols_i]
+                known[days] = True
+
+    _cell_stats['lookups'] += len(cells) * len(dates)
+    _cell_stats['computed'] += len(rows)
+    cell_index = cell_index.ravel()
+    return {field: values[k][cell_index] for k, field in enumerate(PRAYER_FIELDS)}
+
+def cell_cache_stats():
+    """Lookups (location-days), computed cell-days, hit rate and cache size (cell-days held)."""
+    lookups, computed = _cell_stats['lookups'], _cell_stats['computed']
+    entries = sum(int(known.sum()) for _, known in _cell_cache.values())
+    return {'lookups': lookups, 'computed': computed, 'entries': entries,
+            'hit_rate': 1 - computed / lookups if lookups else 0.0}
+
+def _clock_minutes(values):
+    """Float minutes -> int minute of the day, -1 for NaN."""
+    return np.where(np.isnan(values), -1, np.rint(np.nan_to_num(values)) % 1440).astype(int)
+
+def ramadan_day(d):
+    """1-based day of Ramadan for a date, or None outside it."""
+    no = (d - RAMADAN_START).days + 1
+    return no if 1 <= no <= RAMADAN_DAYS else None
+
+def timetable_rows(times, dates):
+    """Yield one data.json timetable (list of row dicts) per location, in ROW_FIELDS order.
+    "no" is the day of Ramadan, None outside it."""
+    columns = {field: _clock_minutes(values) for field, values in times.items()}
+    day_info = [([d.year, d.month, d.day], d.strftime('%a'), ramadan_day(d)) for d in dates]
+    for i in range(len(columns['fajr'])):
+        text = {field: [CLOCK[m] for m in values[i].tolist()] for field, values in columns.items()}
+        rows = []
+        for j, (date, day, no) in enumerate(day_info):
+            row = {'date': date, 'day': day, 'no': no}
+            for field in ROW_FIELDS[3:]:
+                row[field] = text[field][j] if field in text else ''
+            rows.append(row)
+        yield rows
+
+def mosque_prefixes(mosques):
+    """Unique folder/localStorage prefix per mosque: its slug, else name + postcode."""
+    prefixes, seen = [], set()
+    for mosque in mosques:
+        # Names repeat across towns ("Masjid Bilal"), so the postcode keeps most prefixes unique
+        prefix = mosque.get('slug') or re.sub(r'[^a-z0-9]', '', (mosque['name'] + mosque.get('postcode', '')).lower())
+        base, n = prefix, 2
+        while prefix in seen:
+            prefix, n = f'{base}{n}', n + 1
+        seen.add(prefix)
+        prefixes.append(prefix)
+    return prefixes
+
+def mosque_config(mosque, prefix, timetable, note):
+    config = {
+        'name': mosque['name'],
+        'address': ', '.join(p for p in (mosque.get('address'), mosque.get('city'), mosque.get('postcode')) if p),
+        'phone': mosque.get('phone', ''),
+        'website': mosque.get('website', ''),
+        'notes': note,
+        'prefix': prefix,
+    }
+    for key in ('color1', 'color2'):
+        if mosque.get(key):
+            config[key] = mosque[key]
+    config['timetable'] = timetable
+    return config
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--year', type=int, default=dt_date.today().year, help='calculate this whole year')
+    parser.add_argument('--start', type=dt_date.fromisoformat, help='first date (YYYY-MM-DD) instead of --year')
+    parser.add_argument('--days', type=int, default=30, help='number of days from --start')
+    parser.add_argument('--convention', choices=sorted(CONVENTIONS), default='MWL')
+    parser.add_argument('--asr', choices=sorted(ASR_FACTORS), default='hanafi')
+    parser.add_argument('--high-lat', choices=HIGH_LAT_RULES, default='angle')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='share times across mosques within this many minutes (0 = calculate each exactly)')
+    parser.add_argument('--all', action='store_true', help='include mosques that already have a timetable')
+    parser.add_argument('--out', default=OUTPUT_DIR,
+                        help='write <out>/<prefix>/data.json (--out . to build pages with generate.py)')
+    args = parser.parse_args()
+
+    if args.start:
+        dates = [args.start + timedelta(days=i) for i in range(args.days)]
+    else:
+        first = dt_date(args.year, 1, 1)
+        dates = [first + timedelta(days=i) for i in range((dt_date(args.year + 1, 1, 1) - first).days)]
+
+    with open(solar.DIRECTORY_FILE, encoding='utf-8') as f:
+        mosques = [m for m in json.load(f)['mosques']
+                   if m.get('lat') is not None and m.get('lon') is not None
+                   and (args.all or not m.get('has_timetable'))]
+
+    started = time.perf_counter()
+    times = cached_prayer_times([(m['lat'], m['lon']) for m in mosques], dates,
+                                args.convention, args.asr, args.high_lat, args.tolerance)
+    print(f"Calculated {len(mosques)} mosques x {len(dates)} days in {time.perf_counter() - started:.2f}s "
+          f"({args.convention}, {args.asr} Asr, {args.high_lat} high-latitude rule)")
+    if args.tolerance > 0:
+        stats = cell_cache_stats()
+        print(f"Grid cache ({args.tolerance:g} min tolerance): {stats['computed']} cell-days computed "
+              f"for {stats['lookups']} mosque-days, hit rate {stats['hit_rate']:.1%}")
+
+    note = (f"Calculated begin times ({args.convention}, {args.asr.title()} Asr) - "
+            "contact the masjid for jamaah times")
+    started = time.perf_counter()
+    written = 0
+    for mosque, prefix, timetable in zip(mosques, mosque_prefixes(mosques), timetable_rows(times, dates)):
+        folder = os.path.join(args.out, prefix)
+        os.makedirs(folder, exist_ok=True)
+        content = json.dumps(mosque_config(mosque, prefix, timetable, note), indent=2, ensure_ascii=False)
+        written += write_text_if_changed(os.path.join(folder, 'data.json'), content)
+    print(f"Wrote {written} data.json files ({len(mosques) - written} unchanged) to {args.out} "
+          f"in {time.perf_counter() - started:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Vectorized sunrise / solar noon / sunset for many mosques and dates at once.
+
+NOAA solar-position approximation (accurate to about a minute at UK latitudes).
+Times come back as local clock minutes since midnight (Europe/London by default,
+so BST is applied per date), NaN where the sun does not rise or set.
+
+The expensive part - the hour angle at which the sun reaches a given altitude -
+depends only on latitude and date, so it is cached per (altitude, latitude
+rounded to LAT_PRECISION, date); longitude just shifts the result by 4 minutes
+per degree. A batch over thousands of mosques therefore computes each distinct
+latitude band once.
+"""
+import json, os
+from datetime import date as dt_date, datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+MASJIDS_DIR = os.path.dirname(os.path.abspath(__file__))
+DIRECTORY_FILE = os.path.join(os.path.dirname(MASJIDS_DIR), 'directory_clean.json')
+
+LOCAL_TZ = ZoneInfo('Europe/London')
+SUNRISE_ZENITH = 90.833       # refraction + solar disc radius
+LAT_PRECISION = 2             # decimal places of the cache key (~1 km)
+BRADFORD = (53.795, -1.759)   # fallback when a mosque has no coordinates
+
+_half_day_cache = {}          # (kind, rounded lat, date ordinal) -> hour angle in minutes
+
+def _date_terms(ordinals):
+    """Equation of time (minutes) and declination (radians) at noon UTC for each date."""
+    doy = np.array([dt_date.fromordinal(o).timetuple().tm_yday for o in ordinals], dtype=float)
+    g = 2 * np.pi / 365 * (doy - 1)
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(g) - 0.032077 * np.sin(g)
+                       - 0.014615 * np.cos(2 * g) - 0.040849 * np.sin(2 * g))
+    decl = (0.006918 - 0.399912 * np.cos(g) + 0.070257 * np.sin(g) - 0.006758 * np.cos(2 * g)
+            + 0.000907 * np.sin(2 * g) - 0.002697 * np.cos(3 * g) + 0.00148 * np.sin(3 * g))
+    return eqtime, decl
+
+def _hour_angle(kind, lat, decl):
+    """Hour angle (minutes from solar noon) at which the sun reaches the altitude given by kind:
+    ('altitude', degrees) or ('asr', shadow factor). NaN if it never does that day."""
+    if kind[0] == 'asr':
+        # Shadow length = factor + shadow at noon
+        altitude = np.arctan(1 / (kind[1] + np.tan(np.abs(lat - decl))))
+    else:
+        altitude = np.radians(kind[1])
+    cos_ha = (np.sin(altitude) - np.sin(lat) * np.sin(decl)) / (np.cos(lat) * np.cos(decl))
+    with np.errstate(invalid='ignore'):
+        return 4 * np.degrees(np.arccos(cos_ha))   # NaN: polar day/night, or twilight all night
+
+class SunGrid:
+    """Solar terms for a (locations x dates) grid; half_day() gives cached hour angles."""
+    __slots__ = ('lat_keys', 'lat_index', 'ordinals', 'decl', 'noon')
+
+    def __init__(self, locations, dates, tz=LOCAL_TZ):
+        self.ordinals = [d.toordinal() for d in dates]
+        coords = np.asarray(locations, dtype=float).reshape(-1, 2)
+        lat_keys, lat_index = np.unique(np.round(coords[:, 0], LAT_PRECISION), return_inverse=True)
+        self.lat_keys, self.lat_index = lat_keys.tolist(), lat_index.ravel()
+        eqtime, self.decl = _date_terms(self.ordinals)
+        # Local solar noon, minutes since local midnight
+        self.noon = 720 - 4 * coords[:, 1:2] - eqtime + utc_offsets(dates, tz)
+
+    def half_day(self, kind=('altitude', 90 - SUNRISE_ZENITH)):
+        """(locations, dates) minutes between solar noon and the sun crossing kind's altitude."""
+        lat_keys, ordinals = self.lat_keys, self.ordinals
+        out = np.empty((len(lat_keys), len(ordinals)))
+        missing = []
+        for i, lat in enumerate(lat_keys):
+            for j, o in enumerate(ordinals):
+                value = _half_day_cache.get((kind, lat, o))
+                if value is None:
+                    missing.append((i, j))
+                else:
+                    out[i, j] = value
+        if missing:
+            rows, cols = np.array(missing).T
+            ha = _hour_angle(kind, np.radians(np.asarray(lat_keys)[rows]), self.decl[cols])
+            out[rows, cols] = ha
+            for i, j, value in zip(rows.tolist(), cols.tolist(), ha.tolist()):
+                _half_day_cache[(kind, lat_keys[i], ordinals[j])] = value
+        return out[self.lat_index]
+
+def utc_offsets(dates, tz=LOCAL_TZ):
+    """UTC offset in minutes of tz at noon on each date."""
+    return np.array([tz.utcoffset(datetime(d.year, d.month, d.day, 12)).total_seconds() / 60
+                     for d in dates])
+
+def sun_times(locations, dates, tz=LOCAL_TZ):
+    """Sunrise, solar noon and sunset for every location on every date.
+
+    locations: sequence of (lat, lon); dates: sequence of datetime.date.
+    Returns a dict of (len(locations), len(dates)) float arrays of local minutes
+    since midnight: {'sunrise', 'noon', 'sunset'}.
+    """
+    grid = SunGrid(locations, dates, tz)
+    half_day = grid.half_day()
+    return {'sunrise': grid.noon - half_day, 'noon': grid.noon, 'sunset': grid.noon + half_day}
+
+def cache_info():
+    return {'entries': len(_half_day_cache)}
+
+def load_locations(path=DIRECTORY_FILE):
+    """slug -> (lat, lon) for directory entries that have coordinates."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            mosques = json.load(f)['mosques']
+    except (OSError, ValueError, KeyError):
+        return {}
+    return {m['slug']: (m['lat'], m['lon']) for m in mosques
+            if m.get('slug') and m.get('lat') is not None and m.get('lon') is not None}
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Batch validation of timetable submissions (AI extractions, data.json files).
+
+Every timetable in a batch is parsed once into integer-minute columns (one row per
+day, TIME_FIELDS order) and all checks run as NumPy operations over the whole batch:
+
+  format    time that is not H:MM (error)
+  missing   blank begin time for fajr/zuhr/asr/maghrib/isha (error)
+  order     sehri <= fajr < sunrise < zuhr < asr < maghrib < isha broken (error)
+  jamaah    jamaah before its begin time, or jFajr after sunrise (error)
+  drift     begin time moving more than MAX_DAILY_DRIFT minutes from the previous day
+            (MAX_STEP_DRIFT for STEPPED_FIELDS), after allowing for clock changes (warning)
+  date      missing/invalid date or a gap in the dates (error)
+  no        day number not 1, 2, 3, ... (error)
+  day       day name does not match the date (warning)
+  length    not MIN_DAYS..MAX_DAYS days; name  missing mosque name (structure)
+
+The score is the share of days without errors (warnings count half a day), less
+STRUCTURE_PENALTY per structural problem.
+
+    python Masjids/timetable_checks.py test_output_*.json Masjids/*/data.json
+"""
+import argparse, glob, json, os, sys, time
+from datetime import date as dt_date
+
+import numpy as np
+
+import solar
+from timetable_model import TIME_FIELDS, TIME_INDEX, TimetableRow, normalize_time, to_12h
+
+MIN_DAYS, MAX_DAYS = 28, 30
+MAX_DAILY_DRIFT = 6            # minutes; astronomical times move at most ~4/day in the UK
+# Isha is usually published in blocks (same time for a week, then 10-15 minutes on)
+STEPPED_FIELDS = ['isha']
+MAX_STEP_DRIFT = 15
+STRUCTURE_PENALTY = 10
+REQUIRED_FIELDS = ['fajr', 'zuhr', 'asr', 'maghrib', 'isha']
+BEGIN_FIELDS = ['sehri', 'fajr', 'sunrise', 'zuhr', 'asr', 'maghrib', 'isha']
+# (earlier, later, allow equal)
+ORDER_PAIRS = [('sehri', 'fajr', True), ('fajr', 'sunrise', False), ('sunrise', 'zuhr', False),
+               ('zuhr', 'asr', False), ('asr', 'maghrib', False), ('maghrib', 'isha', False)]
+JAMAAH_PAIRS = [('fajr', 'jFajr', True), ('jFajr', 'sunrise', False), ('zuhr', 'jZuhr', True),
+                ('asr', 'jAsr', True), ('isha', 'jIsha', True)]
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+class Issue:
+    """One validation problem. day is 1-based (None for whole-timetable problems)."""
+    __slots__ = ('code', 'severity', 'day', 'field', 'message')
+
+    def __init__(self, code, message, day=None, field=None, severity='error'):
+        self.code = code
+        self.severity = severity
+        self.day = day
+        self.field = field
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f'Issue({self.code!r}, {self.message!r})'
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def normalize_timetable(timetable):
+    """Normalize time strings in place ("05:30", "5.30", "5:30 PM" -> "5:30")."""
+    for d in timetable:
+        if isinstance(d, dict):
+            for field in TIME_FIELDS:
+                if isinstance(d.get(field), str):
+                    d[field] = normalize_time(d[field])
+
+def _load(submissions, issues):
+    """Parse every row of every submission. Returns (owner, position, times, ordinals, day names)."""
+    owner, position, times, ordinals, days = [], [], [], [], []
+    for s, data in enumerate(submissions):
+        for i, d in enumerate(data.get('timetable') or []):
+            if not isinstance(d, dict):
+                issues[s].append(Issue('format', f'Day {i + 1}: not an object', i + 1))
+                d = {}
+            row_errors = []
+            row = TimetableRow.from_dict(d, require_all=False, errors=row_errors)
+            for message in row_errors:
+                code = 'date' if message == 'invalid date' else 'format'
+                field = message[4:].split('=')[0] if message.startswith('bad ') else None
+                issues[s].append(Issue(code, f'Day {i + 1}: {message}', i + 1, field))
+            try:
+                ordinal = dt_date(*row.date).toordinal() if row.date else -1
+            except (TypeError, ValueError):
+                issues[s].append(Issue('date', f'Day {i + 1}: invalid date {list(row.date)}', i + 1))
+                ordinal = -1
+            owner.append(s)
+            position.append(i + 1 if row.no == i + 1 else -1)
+            times.append(row.times)
+            ordinals.append(ordinal)
+            days.append(str(row.day or '')[:3].title())
+    n = len(owner)
+    return (np.array(owner, dtype=np.int64), np.array(position, dtype=np.int64),
+            np.array(times, dtype=np.int64).reshape(n, len(TIME_FIELDS)),
+            np.array(ordinals, dtype=np.int64), days)
+
+def _offsets(ordinals):
+    """UTC offset (minutes) on each valid date, so drift checks ignore clock changes."""
+    valid = ordinals > 0
+    unique = np.unique(ordinals[valid])
+    offsets = np.zeros(len(ordinals))
+    if len(unique):
+        table = solar.utc_offsets([dt_date.fromordinal(o) for o in unique.tolist()])
+        offsets[valid] = table[np.searchsorted(unique, ordinals[valid])]
+    return offsets
+
+def validate_batch(submissions):
+    """Validate many extractions at once. Returns [(score, [Issue, ...]), ...] in input order.
+
+    Time strings are normalized in place first (see normalize_timetable).
+    """
+    issues = [[] for _ in submissions]
+    valid = []
+    for s, data in enumerate(submissions):
+        if not isinstance(data, dict):
+            issues[s].append(Issue('format', 'Failed to parse JSON', severity='structure'))
+            continue
+        if not data.get('name'):
+            issues[s].append(Issue('name', 'Missing mosque name', severity='structure'))
+        tt = data.get('timetable', [])
+        if not isinstance(tt, list):
+            issues[s].append(Issue('format', 'Missing or invalid timetable array', severity='structure'))
+            continue
+        if not MIN_DAYS <= len(tt) <= MAX_DAYS:
+            issues[s].append(Issue('length', f'{len(tt)} days (expected {MIN_DAYS}-{MAX_DAYS})',
+                                   severity='structure'))
+        normalize_timetable(tt)
+        valid.append(s)
+
+    batch = [submissions[s] for s in valid]
+    batch_issues = [issues[s] for s in valid]
+    owner, position, times, ordinals, days = _load(batch, batch_issues)
+    col = {field: times[:, TIME_INDEX[field]] for field in TIME_FIELDS}
+    present = {field: values >= 0 for field, values in col.items()}
+    day_no = np.zeros(len(owner), dtype=np.int64)
+    if len(owner):
+        # 1-based row number within its submission
+        starts = np.r_[0, np.flatnonzero(np.diff(owner)) + 1]
+        day_no = np.arange(len(owner)) - np.repeat(starts, np.diff(np.r_[starts, len(owner)])) + 1
+
+    def report(mask, code, message, field=None, severity='error'):
+        for r in np.flatnonzero(mask).tolist():
+            batch_issues[owner[r]].append(Issue(code, f'Day {day_no[r]}: {message(r)}', int(day_no[r]),
+                                                field, severity))
+
+    for field in REQUIRED_FIELDS:
+        report(~present[field], 'missing', lambda r, f=field: f'missing {f}', field)
+    for checks, code in ((ORDER_PAIRS, 'order'), (JAMAAH_PAIRS, 'jamaah')):
+        for a, b, allow_equal in checks:
+            both = present[a] & present[b]
+            bad = both & ((col[a] > col[b]) if allow_equal else (col[a] >= col[b]))
+            report(bad, code, lambda r, a=a, b=b: f'{a} {to_12h(col[a][r])} not before {b} {to_12h(col[b][r])}', b)
+    report(position < 0, 'no', lambda r: 'wrong no')
+
+    # Day-over-day checks compare each row with the previous row of the same submission
+    same = np.r_[False, owner[1:] == owner[:-1]]
+    prev = np.maximum(np.arange(len(owner)) - 1, 0)
+    dated = ordinals > 0
+    gap = same & dated & dated[prev] & (ordinals - ordinals[prev] != 1)
+    report(gap, 'date', lambda r: f'date not the day after day {day_no[r] - 1}')
+    consecutive = same & dated & dated[prev] & ~gap
+    clock_change = _offsets(ordinals) - _offsets(ordinals)[prev]
+    for field in BEGIN_FIELDS:
+        limit = MAX_STEP_DRIFT if field in STEPPED_FIELDS else MAX_DAILY_DRIFT
+        step = col[field] - col[field][prev] - clock_change
+        drift = consecutive & present[field] & present[field][prev] & (np.abs(step) > limit)
+        report(drift, 'drift', lambda r, f=field, step=step: f'{f} moved {int(step[r]):+d} min from previous day',
+               field, 'warning')
+    weekday = np.where(dated, (ordinals - 1) % 7, -1)
+    wrong_day = np.array([w >= 0 and day != DAY_NAMES[w] for w, day in zip(weekday.tolist(), days)], dtype=bool)
+    report(wrong_day, 'day', lambda r: f'day {days[r] or "(blank)"} is not {DAY_NAMES[weekday[r]]}',
+           severity='warning')
+
+    rows = np.bincount(owner, minlength=len(batch))
+    results = [(0, issue_list) for issue_list in issues]
+    for k, s in enumerate(valid):
+        issue_list = issues[s]
+        issue_list.sort(key=lambda i: i.day or 0)
+        error_days = {i.day for i in issue_list if i.severity == 'error' and i.day}
+        warning_days = {i.day for i in issue_list if i.severity == 'warning' and i.day} - error_days
+        structure = sum(i.severity == 'structure' for i in issue_list)
+        clean = rows[k] - len(error_days) - 0.5 * len(warning_days)
+        score = 100 * clean / rows[k] if rows[k] else 0
+        results[s] = (max(0, round(score) - STRUCTURE_PENALTY * structure), issue_list)
+    return results
+
+def validate(data):
+    """validate_batch() for a single extraction: (score 0-100, [Issue, ...])."""
+    return validate_batch([data])[0]
+
+def _expand(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, '**', '*.json'), recursive=True))
+        else:
+            yield from sorted(glob.glob(path)) or [path]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='JSON files (or folders of them) with a timetable array')
+    parser.add_argument('--issues', type=int, default=3, help='issues to show per file')
+    parser.add_argument('--json', help='write every result (score and issues) to this JSON file')
+    args = parser.parse_args()
+
+    files, submissions = [], []
+    for path in _expand(args.paths):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  SKIP {path}: {e}")
+            continue
+        if isinstance(data, dict) and 'timetable' in data:
+            files.append(path)
+            submissions.append(data)
+
+    started = time.perf_counter()
+    results = validate_batch(submissions)
+    elapsed = time.perf_counter() - started
+
+    for path, (score, issue_list) in zip(files, results):
+        counts = {}
+        for issue in issue_list:
+            counts[issue.code] = counts.get(issue.code, 0) + 1
+        summary = ', '.join(f'{n} {code}' for code, n in sorted(counts.items())) or 'ok'
+        print(f"{score:3d}  {path}  ({summary})")
+        for issue in issue_list[:args.issues]:
+            print(f"       - {issue}")
+
+    rows = sum(len(data.get('timetable') or []) for data in submissions if isinstance(data.get('timetable'), list))
+    print(f"\nValidated {len(submissions)} timetables ({rows} days) in {elapsed:.3f}s")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([{'file': path, 'score': score, 'issues': [i.to_dict() for i in issue_list]}
+                       for path, (score, issue_list) in zip(files, results)], f, indent=2)
+        print(f"Results written to: {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
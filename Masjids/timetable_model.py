@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Typed timetable row model and time normalizer shared by update_from_text.py, generate.py
+and test_submission.py.
+
+A row is parsed and validated once; its times are stored as integer minutes since
+midnight (24h) in a compact array, -1 for a blank time. data.json keeps 12-hour
+strings without AM/PM, so the 24h value is implied by the field (see to_minutes).
+"""
+import re
+from array import array
+from datetime import date as dt_date
+from functools import lru_cache
+
+# Order of fields in each timetable row (data.json, page JS object keys, timetable.json columns)
+ROW_FIELDS = ['date', 'day', 'no', 'sehri', 'fajr', 'sunrise', 'zuhr', 'asr', 'isha',
+              'jFajr', 'jZuhr', 'jAsr', 'maghrib', 'jIsha']
+# Storage order of the times array (also the key order of the page's precomputed mins)
+TIME_FIELDS = ['sehri', 'fajr', 'jFajr', 'sunrise', 'zuhr', 'jZuhr', 'asr', 'jAsr',
+               'maghrib', 'isha', 'jIsha']
+TIME_INDEX = {field: i for i, field in enumerate(TIME_FIELDS)}
+MIDDAY_FIELDS = {'zuhr', 'jZuhr'}           # 12:xx stays, 1:xx -> 13:xx
+EVENING_FIELDS = {'asr', 'jAsr', 'maghrib', 'isha', 'jIsha'}
+# Times the page countdown switches on (labels live in the page JS)
+COUNTDOWN_EVENTS = ['sehri', 'jFajr', 'zuhr', 'jZuhr', 'asr', 'jAsr', 'maghrib', 'isha', 'jIsha']
+
+TIME_RE = re.compile(r'(\d{1,2}):(\d{2})')
+BLANK = -1
+# Sehri ends this many minutes before Fajr when a timetable (parsed or calculated) lacks it
+SEHRI_MARGIN = 10
+
+# Inputs repeat endlessly across rows and mosques ("1:00", "12:20"), so parses are memoized
+@lru_cache(maxsize=4096)
+def to_minutes(field, time_str):
+    """'5:42' -> minutes since midnight, with AM/PM implied by the field. None if blank.
+
+    Raises ValueError if time_str is not H:MM / HH:MM.
+    """
+    if time_str is None or time_str == '':
+        return None
+    m = TIME_RE.fullmatch(str(time_str))
+    if not m:
+        raise ValueError(f'bad {field}={time_str}')
+    h, mins = int(m.group(1)), int(m.group(2))
+    if h < 12 and (field in EVENING_FIELDS or (field in MIDDAY_FIELDS and h < 11)):
+        h += 12
+    return h * 60 + mins
+
+# === normalize_time ===
+# Raw clock strings from text dumps and extractions ("05:39", "5.39", "5:39 PM", "17:39")
+# -> data.json's 12-hour "H:MM". The plain H:MM / HH:MM / H.MM / HH.MM forms (every hour
+# 0-23) are precomputed into a table on first use; anything else (AM/PM suffixes, quotes,
+# odd spacing) goes through a bounded LRU memo.
+NORMALIZE_CACHE_SIZE = 2048
+_normalize_table = {}
+_table_hits = 0
+
+def _normalize(t):
+    """Uncached normalization: dots to colons, strip leading zeros, 24h to 12h, strip quotes."""
+    t = str(t).strip().strip('"').strip("'")
+    # Handle AM/PM suffixes
+    is_pm = 'pm' in t.lower()
+    t = re.sub(r'\s*(AM|PM|am|pm)\s*', '', t).strip()
+    t = t.replace('.', ':')
+    # Strip leading zeros from hours: "05:39" -> "5:39"
+    if ':' in t and t[0] == '0' and len(t.split(':')[0]) == 2:
+        t = t.lstrip('0') or '0'
+        if ':' not in t:
+            t = '0:' + t  # edge case
+    # Handle case where it's just a number
+    if ':' not in t:
+        return t
+    # Convert PM times to 24h then back to 12h
+    parts = t.split(':')
+    if len(parts) == 2:
+        h = int(parts[0])
+        # If explicitly PM and hour < 12, add 12 first
+        if is_pm and h < 12:
+            h += 12
+        # Convert 24-hour to 12-hour format (website uses 12h)
+        if h >= 13:
+            t = f"{h - 12}:{parts[1]}"
+        elif h == 0:
+            t = f"12:{parts[1]}"
+        else:
+            t = f"{h}:{parts[1]}"
+    return t
+
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize)
+
+def _build_normalize_table():
+    for h in range(24):
+        for m in range(60):
+            for hours in {str(h), f'{h:02d}'}:
+                for sep in ':.':
+                    key = f'{hours}{sep}{m:02d}'
+                    try:
+                        _normalize_table[key] = _normalize(key)
+                    except ValueError:
+                        pass  # e.g. "00:05" -- left to raise from normalize_time as before
+
+def normalize_time(t):
+    """Normalize a clock string to data.json's 12-hour 'H:MM' ('' for blank/quoted-empty)."""
+    global _table_hits
+    if not t or t == '""' or t == "''":
+        return ""
+    if not _normalize_table:
+        _build_normalize_table()
+    if not isinstance(t, str):
+        t = str(t)
+    result = _normalize_table.get(t)
+    if result is not None:
+        _table_hits += 1
+        return result
+    return _normalize_cached(t)
+
+def normalize_stats():
+    """Hit/miss counters for normalize_time (table = precomputed plain forms)."""
+    info = _normalize_cached.cache_info()
+    return {'table_hits': _table_hits, 'cache_hits': info.hits, 'misses': info.misses,
+            'cache_size': info.currsize, 'cache_maxsize': info.maxsize, 'table_size': len(_normalize_table)}
+
+def to_12h(minutes):
+    """Minutes since midnight -> data.json's 12-hour 'H:MM' (no AM/PM). '' if blank."""
+    if minutes is None or minutes == BLANK:
+        return ''
+    h, m = divmod(minutes, 60)
+    return f'{h - 12 if h > 12 else h or 12}:{m:02d}'
+
+class TimetableRow:
+    """One day: date (y, m, d), day name, Ramadan day number and the TIME_FIELDS times."""
+    __slots__ = ('date', 'day', 'no', 'times')
+
+    def __init__(self, date, day='', no=0, times=None):
+        self.date = tuple(date)
+        self.day = day or dt_date(*self.date).strftime('%a')
+        self.no = no
+        self.times = times if times is not None else array('h', [BLANK] * len(TIME_FIELDS))
+
+    def __getitem__(self, field):
+        """Time as minutes since midnight, or None if blank."""
+        value = self.times[TIME_INDEX[field]]
+        return None if value == BLANK else value
+
+    def __setitem__(self, field, minutes):
+        self.times[TIME_INDEX[field]] = BLANK if minutes is None else minutes
+
+    def text(self, field):
+        """Time in data.json's 12-hour string form."""
+        return to_12h(self.times[TIME_INDEX[field]])
+
+    def set_text(self, field, time_str):
+        if time_str is not None and not isinstance(time_str, str):
+            time_str = str(time_str)  # to_minutes is memoized, so keep keys hashable
+        self[field] = to_minutes(field, time_str)
+
+    @classmethod
+    def from_dict(cls, d, require_all=True, errors=None, label=''):
+        """Parse a data.json-style row dict.
+
+        With an errors list, problems are appended as "<label>: <problem>" messages and
+        the offending time left blank; otherwise the first problem raises ValueError.
+        A missing time field, day name or day number is only a problem when require_all
+        is set. no may be null: a day outside Ramadan (calculated year timetables).
+        """
+        def problem(message):
+            if errors is None:
+                raise ValueError(f'{label}: {message}' if label else message)
+            errors.append(f'{label}: {message}' if label else message)
+
+        date = d.get('date')
+        if not isinstance(date, (list, tuple)) or len(date) != 3:
+            problem('invalid date')
+            date = None
+        row = cls.__new__(cls)
+        row.date = tuple(date) if date else None
+        row.day, row.no = '', None
+        for field, kind in (('day', str), ('no', (int, type(None)))):
+            if field not in d:
+                if require_all:
+                    problem(f'missing {field}')
+            elif isinstance(d[field], kind) and not isinstance(d[field], bool):
+                setattr(row, field, d[field])
+            else:
+                problem(f'bad {field}={d[field]!r}')
+        row.times = array('h', [BLANK] * len(TIME_FIELDS))
+        for field in TIME_FIELDS:
+            if field not in d:
+                if require_all:
+                    problem(f'missing {field}')
+                continue
+            try:
+                row.set_text(field, d[field])
+            except ValueError as e:
+                problem(str(e))
+        return row
+
+    def to_dict(self):
+        """data.json row, fields in ROW_FIELDS order."""
+        d = {'date': list(self.date), 'day': self.day, 'no': self.no}
+        for field in ROW_FIELDS[3:]:
+            d[field] = self.text(field)
+        return d
+
+    def schedule(self):
+        """(mins, events) precomputed for the page: every time, and the countdown
+        transitions as [minute, field] sorted by time."""
+        mins = {field: self[field] for field in TIME_FIELDS}
+        events = sorted(([mins[field], field] for field in COUNTDOWN_EVENTS if mins[field] is not None),
+                        key=lambda e: e[0])
+        return mins, events
+
+    def to_js(self):
+        """Page JS object literal for timetableData (12-hour strings plus the schedule)."""
+        mins, events = self.schedule()
+        y, m, d = self.date
+        times = ', '.join(f'{field}: "{self.text(field)}"' for field in ROW_FIELDS[3:])
+        mins_js = ', '.join(f'{field}: {"null" if v is None else v}' for field, v in mins.items())
+        events_js = ', '.join(f'[{minute}, "{field}"]' for minute, field in events)
+        return (f'{{ date: [{y}, {m}, {d}], day: "{self.day}", no: {"null" if self.no is None else self.no}, {times}, '
+                f'mins: {{{mins_js}}}, events: [{events_js}] }}')
+
+class Timetable:
+    """Ordered list of TimetableRow."""
+    __slots__ = ('rows',)
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    @classmethod
+    def from_dicts(cls, dicts, require_all=True, errors=None):
+        """Parse data.json rows; see TimetableRow.from_dict for error handling. Labels are 'Day N'."""
+        return cls(TimetableRow.from_dict(d, require_all, errors, f'Day {i + 1}')
+                   for i, d in enumerate(dicts))
+
+    def to_dicts(self):
+        return [row.to_dict() for row in self.rows]
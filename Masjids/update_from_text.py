@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """Parse the authoritative text file and update all data.json files."""
-import re, json, os
+import re, json, math, os, time
+from datetime import date as dt_date
+from timetable_model import Timetable, TimetableRow, SEHRI_MARGIN, to_minutes, normalize_time, normalize_stats
+import solar
 
 TEXT_FILE = os.path.join(os.path.dirname(__file__), '1. Masjid_text.txt')
 MASJIDS_DIR = os.path.dirname(__file__)
@@ -67,40 +70,6 @@ FOLDER_MAP = {
     "Baitul Ilm": "Baitul Ilm",
 }
 
-def normalize_time(t):
-    """Normalize time string: dots to colons, strip leading zeros, 24h to 12h, strip quotes."""
-    if not t or t == '""' or t == "''":
-        return ""
-    t = str(t).strip().strip('"').strip("'")
-    # Handle AM/PM suffixes
-    is_pm = 'pm' in t.lower()
-    is_am = 'am' in t.lower()
-    t = re.sub(r'\s*(AM|PM|am|pm)\s*', '', t).strip()
-    t = t.replace('.', ':')
-    # Strip leading zeros from hours: "05:39" -> "5:39"
-    if ':' in t and t[0] == '0' and len(t.split(':')[0]) == 2:
-        t = t.lstrip('0') or '0'
-        if ':' not in t:
-            t = '0:' + t  # edge case
-    # Handle case where it's just a number
-    if ':' not in t:
-        return t
-    # Convert PM times to 24h then back to 12h
-    parts = t.split(':')
-    if len(parts) == 2:
-        h = int(parts[0])
-        # If explicitly PM and hour < 12, add 12 first
-        if is_pm and h < 12:
-            h += 12
-        # Convert 24-hour to 12-hour format (website uses 12h)
-        if h >= 13:
-            t = f"{h - 12}:{parts[1]}"
-        elif h == 0:
-            t = f"12:{parts[1]}"
-        else:
-            t = f"{h}:{parts[1]}"
-    return t
-
 def find_folder(section_title):
     """Find the matching folder for a section title."""
     for key, folder in FOLDER_MAP.items():
@@ -108,131 +77,129 @@ def find_folder(section_title):
             return folder
     return None
 
+# Field name variants across mosques -> standard names
+FIELD_ALIASES = {alias: field for field, aliases in {
+    'sehri': ('sehri', 'sehr', 'sahoor', 'suhoor'),
+    'fajr': ('fajr', 'fajrb', 'bfajr', 'fajrbegin', 'fajr_begin'),
+    'zuhr': ('zuhr', 'zuhrb', 'bzuhr', 'dhuhr', 'zohr'),
+    'asr': ('asr', 'asrb', 'basr'),
+    'isha': ('isha', 'ishab', 'bisha', 'esha'),
+    'sunrise': ('sunrise',),
+    'maghrib': ('maghrib', 'iftar', 'iftaar'),
+    'jFajr': ('jfajr', 'fajrj', 'jamaatfajr'),
+    'jZuhr': ('jzuhr', 'zuhrj', 'jamaatzuhr'),
+    'jAsr': ('jasr', 'asrj', 'jamaatasr'),
+    'jIsha': ('jisha', 'ishaj', 'jamaatisha'),
+    # Some mosques list jMaghrib separately; used as maghrib if that is not set
+    'jMaghrib': ('jmaghrib', 'maghribj', 'jamaatmaghrib'),
+}.items() for alias in aliases}
+
+# One token per object brace or "key: value" pair; the whole array is scanned once
+ROW_TOKEN_RE = re.compile(r'''
+    (?P<open>\{) | (?P<close>\}) |
+    "?(?P<key>\w+)"?\s*:\s*
+    (?: \[\s*(?P<y>\d+)\s*,\s*(?P<m>\d+)\s*,\s*(?P<d>\d+)\s*\]     # date: [y, m, d]
+      | "(?P<text>[^"]*)"                                         # time or day name
+      | (?P<num>\d+) )                                            # no
+''', re.VERBOSE)
+
 def parse_timetable_rows(js_text):
-    """Parse JavaScript array of timetable objects into Python list."""
+    """Parse JavaScript array of timetable objects into a Timetable in a single pass."""
     rows = []
-    # Match each { ... } object
-    pattern = r'\{([^}]+)\}'
-    for match in re.finditer(pattern, js_text):
-        obj_str = match.group(1)
-        row = {}
-
-        # Extract date array
-        date_match = re.search(r'date:\s*\[(\d+),\s*(\d+),\s*(\d+)\]', obj_str)
-        if date_match:
-            row['date'] = [int(date_match.group(1)), int(date_match.group(2)), int(date_match.group(3))]
-
-        # Extract day
-        day_match = re.search(r'day:\s*"(\w+)"', obj_str)
-        if day_match:
-            row['day'] = day_match.group(1)
-
-        # Extract no
-        no_match = re.search(r'no:\s*(\d+)', obj_str)
-        if no_match:
-            row['no'] = int(no_match.group(1))
-
-        # Extract ALL time fields (various naming conventions across mosques)
-        all_fields = re.findall(r'(\w+):\s*"([^"]*)"', obj_str)
-        for fname, fval in all_fields:
-            val = normalize_time(fval)
-            if not val:
+    aliases = FIELD_ALIASES
+    in_obj = False
+    # Fields of the object being read
+    date, day, no, times = None, '', 0, {}
+    for tok in ROW_TOKEN_RE.finditer(js_text):
+        kind = tok.lastgroup
+        if kind == 'text':
+            if not in_obj:
                 continue
-            # Map field name variants to standard names
-            fl = fname.lower()
-            if fl in ('sehri', 'sehr', 'sahoor', 'suhoor'):
-                row.setdefault('sehri', val)
-            elif fl in ('fajr', 'fajrb', 'bfajr', 'fajrbegin', 'fajr_begin'):
-                row.setdefault('fajr', val)
-            elif fl in ('zuhr', 'zuhrb', 'bzuhr', 'dhuhr', 'zohr'):
-                row.setdefault('zuhr', val)
-            elif fl in ('asr', 'asrb', 'basr'):
-                row.setdefault('asr', val)
-            elif fl in ('isha', 'ishab', 'bisha', 'esha'):
-                row.setdefault('isha', val)
-            elif fl == 'sunrise':
-                row.setdefault('sunrise', val)
-            elif fl in ('maghrib', 'iftar', 'iftaar'):
-                row.setdefault('maghrib', val)
-            elif fl in ('jfajr', 'fajrj', 'jamaatfajr'):
-                row.setdefault('jFajr', val)
-            elif fl in ('jzuhr', 'zuhrj', 'jamaatzuhr'):
-                row.setdefault('jZuhr', val)
-            elif fl in ('jasr', 'asrj', 'jamaatasr'):
-                row.setdefault('jAsr', val)
-            elif fl in ('jisha', 'ishaj', 'jamaatisha'):
-                row.setdefault('jIsha', val)
-            elif fl in ('jmaghrib', 'maghribj', 'jamaatmaghrib'):
-                # Some mosques list jMaghrib separately; use as maghrib if not set
-                row.setdefault('jMaghrib', val)
-
-        if row.get('date'):
-            # Derive day from date if missing
-            if 'day' not in row or not row['day']:
-                from datetime import date as dt_date
-                d = dt_date(row['date'][0], row['date'][1], row['date'][2])
-                row['day'] = d.strftime('%a')
-            rows.append(row)
-
-    return rows
-
-def ensure_all_fields(rows):
-    """Ensure each row has all required fields, using defaults if missing."""
-    sunrise_defaults = {
-        1:"7:22", 2:"7:20", 3:"7:17", 4:"7:15", 5:"7:13", 6:"7:11", 7:"7:09",
-        8:"7:06", 9:"7:04", 10:"7:02", 11:"7:00", 12:"6:55", 13:"6:53", 14:"6:50",
-        15:"6:48", 16:"6:45", 17:"6:43", 18:"6:41", 19:"6:38", 20:"6:36", 21:"6:34",
-        22:"6:31", 23:"6:29", 24:"6:26", 25:"6:24", 26:"6:21", 27:"6:19", 28:"6:17",
-        29:"6:14", 30:"6:12"
-    }
-    required = ['date', 'day', 'no', 'sehri', 'fajr', 'sunrise', 'zuhr', 'asr',
-                'isha', 'jFajr', 'jZuhr', 'jAsr', 'maghrib', 'jIsha']
-
+            key, text = tok.group('key', 'text')
+            field = aliases.get(key.lower())
+            if field:
+                if field not in times:
+                    val = normalize_time(text)
+                    if val:
+                        times[field] = val
+            elif key == 'day':
+                day = text if text.isalnum() else ''
+        elif kind == 'open':
+            in_obj = True
+            date, day, no, times = None, '', 0, {}
+        elif kind == 'close':
+            if in_obj and date:
+                rows.append(build_row(date, day, no, times))
+            in_obj = False
+        elif not in_obj:
+            continue
+        elif kind == 'd':
+            if date is None and tok.group('key') == 'date':
+                date = [int(v) for v in tok.group('y', 'm', 'd')]
+        elif tok.group('key') == 'no':
+            no = int(tok.group('num'))
+    return Timetable(rows)
+
+def build_row(date, day, no, times):
+    """TimetableRow from one tokenized object (day derived from date if missing)."""
+    row = TimetableRow(date, day, no)
+    if 'jMaghrib' in times:
+        times.setdefault('maghrib', times.pop('jMaghrib'))
+    for field, val in times.items():
+        try:
+            row.set_text(field, val)
+        except ValueError as e:
+            print(f"  WARN {row.date}: ignoring {e}")
+    return row
+
+def ensure_all_fields(rows, location=solar.BRADFORD):
+    """Ensure each row has all required times, using defaults if missing.
+
+    Missing sunrise times are calculated for the mosque's (lat, lon); a row whose date
+    is impossible (e.g. 30/2) is reported and gets the old 7:00 default instead.
+    """
+    dates = []
     for row in rows:
-        no = row.get('no', 0)
-        if 'sunrise' not in row or not row['sunrise']:
-            row['sunrise'] = sunrise_defaults.get(no, "7:00")
-
-        # Use jMaghrib as maghrib if maghrib missing
-        if ('maghrib' not in row or not row['maghrib']) and row.get('jMaghrib'):
-            row['maghrib'] = row['jMaghrib']
+        try:
+            dates.append(dt_date(*row.date))
+        except ValueError:
+            print(f"  WARN {row.date}: not a valid date, sunrise not calculated")
+            dates.append(None)
+    valid = [d for d in dates if d is not None]
+    calculated = iter(solar.sun_times([location], valid)['sunrise'][0] if valid else [])
+    sunrise = [next(calculated) if d is not None else math.nan for d in dates]
+
+    def fill(row, field, *fallbacks):
+        """Set a blank time from the first available fallback: another field or an 'H:MM' default."""
+        if row[field] is not None:
+            return
+        for fallback in fallbacks:
+            minutes = to_minutes(field, fallback) if ':' in fallback else row[fallback]
+            if minutes is not None:
+                row[field] = minutes
+                return
+
+    for row, minutes in zip(rows, sunrise):
+        if row['sunrise'] is None and not math.isnan(minutes):
+            row['sunrise'] = round(minutes)
+        fill(row, 'sunrise', '7:00')
 
         # Derive beginning times from jamaah times if missing
-        if 'fajr' not in row or not row['fajr']:
-            row['fajr'] = row.get('jFajr', '5:30')
-        if 'sehri' not in row or not row['sehri']:
-            # Sehri ~10 min before fajr
-            fajr = row.get('fajr', '')
-            if fajr and ':' in fajr:
-                h, m = int(fajr.split(':')[0]), int(fajr.split(':')[1])
-                m -= 10
-                if m < 0: m += 60; h -= 1
-                row['sehri'] = f"{h}:{m:02d}"
-            else:
-                row['sehri'] = '5:30'
-        if 'zuhr' not in row or not row['zuhr']:
-            row['zuhr'] = '12:20'
-        if 'asr' not in row or not row['asr']:
-            row['asr'] = row.get('jAsr', '3:30')
+        fill(row, 'fajr', 'jFajr', '5:30')
+        if row['sehri'] is None:
+            row['sehri'] = row['fajr'] - SEHRI_MARGIN
+        fill(row, 'zuhr', '12:20')
+        fill(row, 'asr', 'jAsr', '3:30')
 
         # Derive isha from jIsha or maghrib
-        if 'isha' not in row or not row['isha']:
-            row['isha'] = row.get('jIsha', '7:30')
-        if 'maghrib' not in row or not row['maghrib']:
-            row['maghrib'] = '5:30'
+        fill(row, 'isha', 'jIsha', '7:30')
+        fill(row, 'maghrib', '5:30')
 
         # Derive jamaah times from beginning times if missing
-        if 'jFajr' not in row or not row['jFajr']:
-            row['jFajr'] = row.get('fajr', '')
-        if 'jZuhr' not in row or not row['jZuhr']:
-            row['jZuhr'] = '1:00'
-        if 'jAsr' not in row or not row['jAsr']:
-            row['jAsr'] = row.get('asr', '')
-        if 'jIsha' not in row or not row['jIsha']:
-            row['jIsha'] = row.get('isha', '')
-
-        # Clean up temp field
-        row.pop('jMaghrib', None)
+        fill(row, 'jFajr', 'fajr')
+        fill(row, 'jZuhr', '1:00')
+        fill(row, 'jAsr', 'asr')
+        fill(row, 'jIsha', 'isha')
 
     return rows
 
@@ -260,105 +227,136 @@ def parse_mosque_info(info_text):
 
     return info
 
-def main():
-    with open(TEXT_FILE, 'r', encoding='utf-8') as f:
-        text = f.read()
-
-    # Split into sections by numbered headers like "1. Masjid Name" or "15. Salahaddin"
-    # Pattern: start of line, number, dot, space, then the name
-    sections = re.split(r'\n(?=\d+\.\s+)', text)
+# Sections start at a line like "1. Masjid Name" or "15. Salahaddin"
+SECTION_START_RE = re.compile(r'\d+\.\s')
+SECTION_HEADER_RE = re.compile(r'(\d+)\.\s+(.+?)(?:\n|$)')
+ARRAY_RE = re.compile(r'const\s+\w+\s*=\s*\[.*?\];', re.DOTALL)
+
+def iter_sections(lines):
+    """Yield (info_text, js_text) for each numbered section, reading lines one at a time.
+
+    info_text is the section from its header up to the first 'const '; js_text is the
+    'const x = [...];' array, or None if the section has none. Only the current
+    section's info lines and array are held; text after the array is dropped.
+    """
+    info, js, js_done = [], None, False
+
+    def finish():
+        js_match = ARRAY_RE.search(''.join(js)) if js_done else None
+        return ''.join(info), js_match.group(0) if js_match else None
+
+    for line in lines:
+        if SECTION_START_RE.match(line):
+            if info:
+                yield finish()
+            info, js, js_done = [], None, False
+        if js is None:
+            pos = line.find('const ')
+            if pos == -1:
+                info.append(line)
+                continue
+            info.append(line[:pos])
+            js, line = [], line[pos:]
+        if not js_done:
+            js.append(line)
+            js_done = '];' in line
+    if info:
+        yield finish()
 
+def main():
     updated = 0
     skipped = 0
+    parsed_rows = 0
+    parse_seconds = 0.0
     salahadin_data = None
+    locations = solar.load_locations()
 
-    for section in sections:
-        if not section.strip():
-            continue
-
-        # Get section header
-        header_match = re.match(r'(\d+)\.\s+(.+?)(?:\n|$)', section)
-        if not header_match:
-            continue
-
-        section_num = int(header_match.group(1))
-        section_title = header_match.group(2).strip()
-
-        # Find the JavaScript array
-        js_match = re.search(r'const\s+\w+\s*=\s*\[(.*?)\];', section, re.DOTALL)
-        if not js_match:
-            print(f"  SKIP #{section_num} {section_title} - no timetable data")
-            skipped += 1
-            continue
-
-        rows = parse_timetable_rows(js_match.group(0))
-        if len(rows) != 30:
-            print(f"  WARN #{section_num} {section_title} - got {len(rows)} rows (expected 30)")
-            if len(rows) < 25:
+    # Each section's data.json is written before the next section is read
+    with open(TEXT_FILE, 'r', encoding='utf-8') as text_file:
+        for info_text, js_text in iter_sections(text_file):
+            header_match = SECTION_HEADER_RE.match(info_text)
+            if not header_match:
                 continue
 
-        rows = ensure_all_fields(rows)
+            section_num = int(header_match.group(1))
+            section_title = header_match.group(2).strip()
 
-        # Find the matching folder
-        folder = find_folder(section_title)
+            if js_text is None:
+                print(f"  SKIP #{section_num} {section_title} - no timetable data")
+                skipped += 1
+                continue
 
-        if folder is None:
-            print(f"  SKIP #{section_num} {section_title} - already on website")
-            skipped += 1
-            continue
+            started = time.perf_counter()
+            rows = parse_timetable_rows(js_text)
+            parse_seconds += time.perf_counter() - started
+            parsed_rows += len(rows)
+            if len(rows) != 30:
+                print(f"  WARN #{section_num} {section_title} - got {len(rows)} rows (expected 30)")
+                if len(rows) < 25:
+                    continue
+
+            # Find the matching folder
+            folder = find_folder(section_title)
+
+            if folder is None:
+                print(f"  SKIP #{section_num} {section_title} - already on website")
+                skipped += 1
+                continue
 
-        # Extract mosque info
-        info_text = section[:section.find('const ')] if 'const ' in section else section
-        info = parse_mosque_info(info_text)
+            # Extract mosque info
+            info = parse_mosque_info(info_text)
 
-        if folder == "SALAHADIN_WEBSITE":
-            # Special handling for Salahadin - save for later
-            salahadin_data = {'rows': rows, 'info': info, 'section_title': section_title}
-            print(f"  SAVED #{section_num} {section_title} - for Salahadin website update")
-            continue
+            if folder == "SALAHADIN_WEBSITE":
+                # Special handling for Salahadin - save for later
+                rows = ensure_all_fields(rows, locations.get('Salahadin', solar.BRADFORD))
+                salahadin_data = {'rows': rows, 'info': info, 'section_title': section_title}
+                print(f"  SAVED #{section_num} {section_title} - for Salahadin website update")
+                continue
 
-        folder_path = os.path.join(MASJIDS_DIR, folder)
-        data_path = os.path.join(folder_path, 'data.json')
+            folder_path = os.path.join(MASJIDS_DIR, folder)
+            data_path = os.path.join(folder_path, 'data.json')
 
-        if not os.path.isdir(folder_path):
-            print(f"  WARN #{section_num} {section_title} - folder not found: {folder}")
-            continue
+            if not os.path.isdir(folder_path):
+                print(f"  WARN #{section_num} {section_title} - folder not found: {folder}")
+                continue
 
-        # Load existing data.json if it exists (to preserve non-timetable fields)
-        existing = {}
-        if os.path.exists(data_path):
-            with open(data_path, 'r', encoding='utf-8') as f:
-                existing = json.load(f)
-
-        # Update with correct data from text file
-        if info.get('name'):
-            existing['name'] = info['name']
-        if info.get('address'):
-            existing['address'] = info['address']
-        if info.get('phone'):
-            existing['phone'] = info['phone']
-            existing['phone_display'] = info['phone']
-        if info.get('eid_info'):
-            existing['eid_info'] = info['eid_info']
-        if info.get('fitrana'):
-            existing['fitrana'] = info['fitrana']
-        if info.get('donations'):
-            existing['donation_info'] = info['donations']
-        if info.get('note'):
-            existing['notes'] = info['note']
-        if info.get('receiver'):
-            existing['receiver_freq'] = info['receiver']
-        if info.get('website'):
-            existing['website'] = info['website']
-
-        # Replace timetable with authoritative data
-        existing['timetable'] = rows
-
-        with open(data_path, 'w', encoding='utf-8') as f:
-            json.dump(existing, f, indent=2, ensure_ascii=False)
-
-        print(f"  UPDATED #{section_num} {section_title} -> {folder} ({len(rows)} rows)")
-        updated += 1
+            # Load existing data.json if it exists (to preserve non-timetable fields)
+            existing = {}
+            if os.path.exists(data_path):
+                with open(data_path, 'r', encoding='utf-8') as f:
+                    existing = json.load(f)
+
+            rows = ensure_all_fields(rows, locations.get(existing.get('prefix'), solar.BRADFORD))
+
+            # Update with correct data from text file
+            if info.get('name'):
+                existing['name'] = info['name']
+            if info.get('address'):
+                existing['address'] = info['address']
+            if info.get('phone'):
+                existing['phone'] = info['phone']
+                existing['phone_display'] = info['phone']
+            if info.get('eid_info'):
+                existing['eid_info'] = info['eid_info']
+            if info.get('fitrana'):
+                existing['fitrana'] = info['fitrana']
+            if info.get('donations'):
+                existing['donation_info'] = info['donations']
+            if info.get('note'):
+                existing['notes'] = info['note']
+            if info.get('receiver'):
+                existing['receiver_freq'] = info['receiver']
+            if info.get('website'):
+                existing['website'] = info['website']
+
+            # Replace timetable with authoritative data
+            existing['timetable'] = rows.to_dicts()
+
+            with open(data_path, 'w', encoding='utf-8') as f:
+                json.dump(existing, f, indent=2, ensure_ascii=False)
+
+            print(f"  UPDATED #{section_num} {section_title} -> {folder} ({len(rows)} rows)")
+            updated += 1
 
     # Handle Salahadin
     if salahadin_data:
@@ -366,11 +364,16 @@ def main():
         with open(sal_path, 'w', encoding='utf-8') as f:
             json.dump({
                 'info': salahadin_data['info'],
-                'timetable': salahadin_data['rows']
+                'timetable': salahadin_data['rows'].to_dicts()
             }, f, indent=2, ensure_ascii=False)
         print(f"\n  Salahadin data saved to {sal_path}")
 
-    print(f"\nDone! Updated: {updated}, Skipped: {skipped}")
+    rate = parsed_rows / parse_seconds if parse_seconds else 0
+    print(f"\nParsed {parsed_rows} rows in {parse_seconds:.3f}s ({rate:,.0f} rows/s)")
+    stats = normalize_stats()
+    print(f"normalize_time: {stats['table_hits']} table hits, {stats['cache_hits']} cache hits, "
+          f"{stats['misses']} misses (cache {stats['cache_size']}/{stats['cache_maxsize']})")
+    print(f"Done! Updated: {updated}, Skipped: {skipped}")
 
 if __name__ == '__main__':
     main()
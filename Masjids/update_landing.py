@@ -1,18 +1,22 @@
 #!/usr/bin/env python3
-"""Update landing page card colors to match each mosque's theme color."""
+"""Update landing page card colors to match each mosque's theme color.
+
+Skipped entirely when no mosque colour changed since the last run (see build_manifest.py);
+pass --force to re-apply anyway.
+"""
 import json, glob, os, sys
+import build_manifest
+from palette import HEX_COLOR
 sys.stdout.reconfigure(encoding='utf-8')
 
-ROOT = 'G:/My Drive/Work/Prayer-times'
+# PRAYER_TIMES_ROOT points the script at another tree (e.g. scripts/bench_build.py fixtures)
+ROOT = os.environ.get('PRAYER_TIMES_ROOT', 'G:/My Drive/Work/Prayer-times')
 landing = os.path.join(ROOT, 'index.html')
 SKIP = {'masjidtaqwa'}
-
-with open(landing, encoding='utf-8') as f:
-    html = f.read()
+GENERATOR_VERSION = 'update_landing-1'
 
 data_files = sorted(glob.glob(os.path.join(ROOT, 'Masjids', '*', 'data.json')))
-updated = 0
-
+cards = []
 for df in data_files:
     d = json.load(open(df, encoding='utf-8'))
     prefix = d.get('prefix', '')
@@ -20,12 +24,24 @@ for df in data_files:
     c2 = d.get('color2', '')
     if not prefix or not c1 or prefix in SKIP:
         continue
+    cards.append((prefix, c1, c2))
 
+build = build_manifest.load_manifest()
+key = build_manifest.inputs_key(cards, GENERATOR_VERSION)
+if '--force' not in sys.argv and build_manifest.is_fresh(build, landing, key):
+    print('Landing page card colors unchanged, skipping')
+    sys.exit(0)
+
+with open(landing, encoding='utf-8') as f:
+    html = f.read()
+
+updated = 0
+for prefix, c1, c2 in cards:
     # Find the card for this prefix and update its gradient
     # Card format: href="{prefix}/" ... background: linear-gradient(to bottom, #XXXXXX, #XXXXXX)
     import re
     # Match the card's color div for this specific mosque
-    pattern = rf'(<a href="{re.escape(prefix)}/"[^>]*>.*?<div class="card-colour" style="background: linear-gradient\(to bottom, )#[0-9a-fA-F]{{6}}(, )#[0-9a-fA-F]{{6}}(\);)'
+    pattern = rf'(<a href="{re.escape(prefix)}/"[^>]*>.*?<div class="card-colour" style="background: linear-gradient\(to bottom, ){HEX_COLOR}(, ){HEX_COLOR}(\);)'
     replacement = rf'\g<1>{c1}\g<2>{c2}\g<3>'
     new_html = re.sub(pattern, replacement, html, flags=re.DOTALL)
     if new_html != html:
@@ -34,6 +50,7 @@ for df in data_files:
     else:
         print(f'  WARNING: card not found for {prefix}')
 
-with open(landing, 'w', encoding='utf-8') as f:
-    f.write(html)
+build_manifest.write_text_if_changed(landing, html)
+build_manifest.record(build, landing, key)
+build_manifest.save_manifest(build)
 print(f'Updated {updated} card colors in index.html')
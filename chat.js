@@ -225,11 +225,23 @@
         var fetches = others.map(function (m) {
             var url = (isLanding ? '' : '../') + m.folder + '/index.html';
             return fetch(url).then(function (r) { return r.text(); }).then(function (html) {
-                var match = html.match(/const\s+timetableData\s*=\s*(\[[\s\S]*?\]);\s*\n/);
+                // Inline rows only; json-mode pages carry an empty `const timetableData = [];` placeholder
+                var match = html.match(/const\s+timetableData\s*=\s*(\[\s*\{[\s\S]*?\]);\s*\n/);
                 if (match) {
                     var data = new Function('return ' + match[1])();
                     return formatRow(m.name, getTodayRow(data));
                 }
+                // Pages generated with a separate timetable.json ({fields, rows})
+                if (html.indexOf('timetableReady') !== -1) {
+                    return fetch(url.replace(/index\.html$/, 'timetable.json')).then(function (r) { return r.json(); }).then(function (t) {
+                        var data = t.rows.map(function (row) {
+                            var obj = {};
+                            t.fields.forEach(function (f, i) { obj[f] = row[i]; });
+                            return obj;
+                        });
+                        return formatRow(m.name, getTodayRow(data));
+                    });
+                }
                 return null;
             }).catch(function () { return null; });
         });
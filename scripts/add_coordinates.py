@@ -5,37 +5,18 @@ Coordinates enable Google Maps directions even when address is missing.
 """
 
 import json
-import time
-import urllib.request
 from pathlib import Path
 
+import postcode_cache
+
 PROJECT_DIR = Path(__file__).parent.parent
 INPUT_FILE = PROJECT_DIR / "directory_clean.json"
 OUTPUT_FILE = PROJECT_DIR / "directory_clean.json"  # overwrite in place
 
 def bulk_postcode_lookup(postcodes):
-    """Lookup lat/lon for up to 100 postcodes via Postcodes.io."""
-    results = {}
-    data = json.dumps({"postcodes": postcodes}).encode()
-    req = urllib.request.Request(
-        "https://api.postcodes.io/postcodes",
-        data=data,
-        headers={"Content-Type": "application/json"},
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            body = json.loads(resp.read())
-            if body.get("result"):
-                for item in body["result"]:
-                    if item.get("result"):
-                        r = item["result"]
-                        results[item["query"]] = {
-                            "lat": r["latitude"],
-                            "lon": r["longitude"],
-                        }
-    except Exception as e:
-        print(f"  Warning: batch lookup failed: {e}")
-    return results
+    """Lookup lat/lon for postcodes via Postcodes.io, through the shared postcode cache."""
+    results = postcode_cache.shared().lookup(postcodes)
+    return {query: {"lat": r["lat"], "lon": r["lon"]} for query, r in results.items() if r}
 
 
 def main():
@@ -50,15 +31,9 @@ def main():
     unique_postcodes = list(set(m["postcode"] for m in need_coords))
     print(f"Unique postcodes to look up: {len(unique_postcodes)}")
 
-    # Bulk lookup (100 per request)
-    all_results = {}
-    for i in range(0, len(unique_postcodes), 100):
-        batch = unique_postcodes[i:i+100]
-        print(f"  Batch {i//100 + 1}: {len(batch)} postcodes...", end=" ", flush=True)
-        results = bulk_postcode_lookup(batch)
-        all_results.update(results)
-        print(f"{len(results)} resolved")
-        time.sleep(0.5)
+    # Bulk lookup (cached postcodes first, the rest 100 per request)
+    all_results = bulk_postcode_lookup(unique_postcodes)
+    print(f"  {len(all_results)} resolved ({postcode_cache.shared().stats})")
 
     # Apply coordinates
     added = 0
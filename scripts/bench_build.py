@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Build-time benchmark for the static site generators.
+
+Builds synthetic fixture trees of N mosques (cloned from the real Masjids/*/data.json
+files), runs each generator stage in a fresh process and records wall time, peak RSS
+and bytes written. Results go to a JSON file that can be compared across commits:
+
+    python scripts/bench_build.py --sizes 10 100 1000 10000 --out bench_results.json
+    python scripts/bench_build.py --sizes 100 --compare bench_results.json
+
+The patch_*.py stages work on fixed page lists (the 10 original mosques), so their
+cost does not grow with N; they are timed once per fixture all the same.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+PROJECT_DIR = SCRIPT_DIR.parent
+MASJIDS_DIR = PROJECT_DIR / "Masjids"
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+# Original hand-crafted pages the patch_*.py scripts operate on
+ORIGINALS = ['shahjalal', 'quba', 'Almahad', 'Tawakkulia', 'Salahadin',
+             'abubakar', 'iyma', 'JamiaMasjid', 'taqwa', 'ibrahim']
+PATCH_SCRIPTS = ['patch_icons_poster.py', 'patch_jamaah.py', 'patch_manifests.py',
+                 'patch_nav_tour.py', 'patch_timetables.py']
+TIMETABLE_FIELDS = ['date', 'day', 'no', 'sehri', 'fajr', 'sunrise', 'zuhr', 'asr', 'isha',
+                    'jFajr', 'jZuhr', 'jAsr', 'maghrib', 'jIsha']
+
+# Stage name -> command (relative to the fixture root). "generate (no-op)" re-runs
+# generate.py right after a full build, measuring the incremental-build fast path.
+STAGES = [
+    ("generate", ["Masjids/generate.py", "--force"]),
+    ("generate (no-op)", ["Masjids/generate.py"]),
+    ("gen_pwa", ["Masjids/gen_pwa.py", "--force"]),
+    ("update_landing", ["Masjids/update_landing.py", "--force"]),
+] + [(script[:-3], [f"scripts/{script}"]) for script in PATCH_SCRIPTS]
+
+# A regression is flagged when a stage gets this much slower/bigger than the baseline
+REGRESSION_THRESHOLD = 0.20
+
+
+# --- Fixtures ---
+
+def load_seeds():
+    """Real data.json configs usable as templates for synthetic mosques."""
+    seeds = []
+    for path in sorted(MASJIDS_DIR.glob("*/data.json")):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        timetable = config.get("timetable") or []
+        if not timetable or not all(field in row for row in timetable for field in TIMETABLE_FIELDS):
+            continue
+        if not isinstance(config.get("donation_info", ""), str):
+            continue
+        seeds.append(config)
+    return seeds
+
+
+def build_fixture(root, count, seeds):
+    """Create a self-contained tree: generator scripts, template, landing page, N mosques."""
+    (root / "Masjids").mkdir(parents=True)
+    for script in MASJIDS_DIR.glob("*.py"):
+        shutil.copy2(script, root / "Masjids" / script.name)
+    (root / "scripts").mkdir()
+    for script in PATCH_SCRIPTS:
+        shutil.copy2(SCRIPT_DIR / script, root / "scripts" / script)
+    shutil.copy2(PROJECT_DIR / "index.html", root / "index.html")
+    for folder in ORIGINALS:
+        if (PROJECT_DIR / folder).is_dir():
+            shutil.copytree(PROJECT_DIR / folder, root / folder)
+
+    for i in range(count):
+        config = dict(seeds[i % len(seeds)])
+        prefix = f"bench{i:05d}"
+        config["prefix"] = prefix
+        config["name"] = f"{config['name']} {i}"
+        folder = root / "Masjids" / prefix
+        folder.mkdir()
+        with open(folder / "data.json", "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2, ensure_ascii=False)
+        # gen_pwa.py only writes into deployed mosque folders that already exist
+        (root / prefix).mkdir()
+
+
+def snapshot(root):
+    """path -> (size, mtime_ns) for every file under root."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            files[path] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+# --- Measurement ---
+
+def run_stage(root, command):
+    """Run one stage in a fresh interpreter.
+
+    Returns (returncode, seconds, peak RSS in KiB or None, stderr tail).
+    """
+    env = dict(os.environ, PRAYER_TIMES_ROOT=str(root), PYTHONIOENCODING="utf-8")
+    with tempfile.TemporaryFile() as err:
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable] + command, cwd=root, env=env,
+                                stdout=subprocess.DEVNULL, stderr=err)
+        if hasattr(os, "wait4"):
+            # wait4 gives this child's own rusage (RUSAGE_CHILDREN would be a running max)
+            _, status, usage = os.wait4(proc.pid, 0)
+            seconds = time.perf_counter() - started
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            peak_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else:
+            proc.wait()
+            seconds = time.perf_counter() - started
+            peak_kb = None
+        err.seek(0)
+        stderr_tail = err.read().decode("utf-8", "replace").strip().splitlines()[-5:]
+    return proc.returncode, seconds, peak_kb, stderr_tail
+
+
+def bench_size(count, seeds, keep=False):
+    results = []
+    root = Path(tempfile.mkdtemp(prefix=f"bench{count}_"))
+    try:
+        print(f"\n=== {count} mosques ({root}) ===")
+        build_fixture(root, count, seeds)
+        for stage, command in STAGES:
+            before = snapshot(root)
+            returncode, seconds, peak_kb, stderr_tail = run_stage(root, command)
+            after = snapshot(root)
+            changed = [path for path, stat in after.items() if before.get(path) != stat]
+            result = {
+                "mosques": count,
+                "stage": stage,
+                "returncode": returncode,
+                "seconds": round(seconds, 4),
+                "peak_rss_kb": peak_kb,
+                "files_written": len(changed),
+                "output_bytes": sum(after[path][0] for path in changed),
+            }
+            results.append(result)
+            rss = f"{peak_kb / 1024:.1f} MB" if peak_kb else "n/a"
+            status = "" if returncode == 0 else f"  (exit {returncode})"
+            print(f"  {stage:22} {seconds:9.3f}s  rss {rss:>10}  "
+                  f"{result['files_written']:>6} files  {result['output_bytes']:>12} bytes{status}")
+            if returncode != 0:
+                for line in stderr_tail:
+                    print(f"      {line}")
+    finally:
+        if keep:
+            print(f"  kept fixture: {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print per-stage deltas against a previous results file. Returns the number of regressions."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["mosques"], r["stage"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\n=== vs {baseline_path} ===")
+    for r in results:
+        old = baseline.get((r["mosques"], r["stage"]))
+        if not old:
+            continue
+        flags = []
+        for metric in ("seconds", "peak_rss_kb", "output_bytes"):
+            if old.get(metric) and r.get(metric) is not None:
+                change = (r[metric] - old[metric]) / old[metric]
+                # Sub-50ms timings are mostly interpreter start-up noise
+                if change > REGRESSION_THRESHOLD and not (metric == "seconds" and r[metric] < 0.05):
+                    flags.append(f"{metric} +{change:.0%}")
+        regressions += bool(flags)
+        print(f"  {r['mosques']:>6} {r['stage']:22} {old['seconds']:9.3f}s -> {r['seconds']:9.3f}s"
+              + (f"  REGRESSION: {', '.join(flags)}" if flags else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the static site generator stages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="fixture sizes (number of mosques)")
+    parser.add_argument("--out", default="bench_results.json", help="write results to this JSON file")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the fixture trees for inspection")
+    args = parser.parse_args()
+
+    seeds = load_seeds()
+    print(f"Using {len(seeds)} data.json files as fixture seeds")
+
+    results = []
+    for count in args.sizes:
+        results.extend(bench_size(count, seeds, args.keep))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to: {args.out}")
+
+    failed = [r for r in results if r["returncode"] != 0]
+    for r in failed:
+        print(f"  FAILED: {r['stage']} at {r['mosques']} mosques (exit {r['returncode']})")
+    regressions = compare(results, args.compare) if args.compare else 0
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the submission pipeline's HTTP calls, against a local stub server.
+
+Compares the old way (write the body to a temp JSON file, spawn curl) with the pooled
+keep-alive client in Masjids/http_client.py, plus plain urllib (a new connection per
+request) for reference. The stub answers instantly, so the numbers are pure overhead:
+
+    python scripts/bench_http.py --requests 200 --payload-kb 500
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR.parent / "Masjids"))
+from http_client import Pool
+
+REPLY = json.dumps({"content": [{"type": "text", "text": "{}"}]}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/messages"
+
+
+# --- Clients ---
+
+def curl_client(url, body):
+    """What test_submission.py used to do for every call."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "_body.json")
+
+        def send():
+            with open(path, "w") as f:
+                json.dump(body, f)
+            result = subprocess.run(["curl", "-s", "-X", "POST", url, "-H", "Content-Type: application/json",
+                                     "-d", f"@{path}"], capture_output=True, text=True, timeout=60)
+            os.remove(path)
+            return json.loads(result.stdout)
+        yield send
+
+
+def urllib_client(url, body):
+    def send():
+        req = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return json.loads(resp.read())
+    yield send
+
+
+def pool_client(url, body):
+    pool = Pool()
+    try:
+        yield lambda: pool.post_json(url, body, timeout=60)
+    finally:
+        print(f"    pool stats: {pool.stats}")
+        pool.close()
+
+
+CLIENTS = [("curl subprocess", curl_client), ("urllib", urllib_client), ("pooled keep-alive", pool_client)]
+
+
+def bench(name, factory, url, body, requests):
+    timings = []
+    for send in factory(url, body):
+        send()  # warm-up
+        for _ in range(requests):
+            started = time.perf_counter()
+            send()
+            timings.append((time.perf_counter() - started) * 1000)
+    result = {
+        "client": name,
+        "requests": requests,
+        "mean_ms": round(statistics.mean(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1], 3),
+    }
+    print(f"  {name:20} mean {result['mean_ms']:8.2f} ms  median {result['median_ms']:8.2f} ms  "
+          f"p95 {result['p95_ms']:8.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTTP client overhead against a local stub")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--payload-kb", type=int, default=100, help="request body size (base64 image stand-in)")
+    parser.add_argument("--out", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    server, url = start_stub()
+    body = {"model": "stub", "messages": [{"role": "user", "content": "x" * (args.payload_kb * 1024)}]}
+    print(f"Stub server at {url}, {args.requests} requests of {args.payload_kb} KB")
+
+    results = []
+    for name, factory in CLIENTS:
+        if factory is curl_client and not shutil.which("curl"):
+            print(f"  {name:20} skipped (curl not found)")
+            continue
+        results.append(bench(name, factory, url, body, args.requests))
+    server.shutdown()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
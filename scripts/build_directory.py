@@ -6,45 +6,16 @@ Merges with existing directory.json, excludes Shia and Ahmadiyya mosques.
 
 import json
 import re
-import time
-import urllib.request
-import urllib.parse
 from pathlib import Path
 
+import postcode_cache
+from osm_store import load_elements
+
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_DIR = SCRIPT_DIR.parent
 DIRECTORY_FILE = PROJECT_DIR / "directory.json"
 OUTPUT_FILE = PROJECT_DIR / "directory_new.json"
 
-# --- Overpass API ---
-# Use alternative Overpass endpoint (less congested)
-OVERPASS_URLS = [
-    "https://overpass.kumi.systems/api/interpreter",
-    "https://overpass-api.de/api/interpreter",
-]
-
-# Split UK into smaller regional bounding boxes to avoid timeout
-# Format: (south, west, north, east)
-UK_REGIONS = [
-    ("London", (51.3, -0.5, 51.7, 0.3)),
-    ("SE England", (50.7, -1.5, 51.3, 1.5)),
-    ("SW England", (50.0, -5.8, 51.3, -1.5)),
-    ("East England", (51.7, 0.0, 52.8, 1.8)),
-    ("West Midlands", (52.0, -2.5, 52.8, -1.2)),
-    ("East Midlands", (52.0, -1.2, 53.0, 0.0)),
-    ("NW England", (53.0, -3.2, 53.7, -1.8)),
-    ("Greater Manchester", (53.3, -2.5, 53.7, -1.8)),
-    ("Yorkshire South", (53.2, -1.8, 53.7, -0.5)),
-    ("Yorkshire West", (53.6, -2.2, 54.0, -1.2)),
-    ("Yorkshire North+East", (53.7, -1.2, 54.5, 0.0)),
-    ("NE England", (54.5, -2.5, 55.5, 0.0)),
-    ("Lancashire", (53.6, -3.2, 54.2, -2.2)),
-    ("Wales", (51.3, -5.5, 53.5, -2.5)),
-    ("Scotland South", (54.5, -5.5, 56.5, -2.0)),
-    ("Scotland North", (56.5, -8.0, 61.0, -0.5)),
-    ("N Ireland", (54.0, -8.5, 55.5, -5.0)),
-]
-
 # --- Exclusion filters ---
 # Denomination tags to exclude
 EXCLUDED_DENOMINATIONS = {"shia", "shi'a", "ahmadiyya", "ismaili"}
@@ -147,110 +118,67 @@ def extract_city(tags, lat, lon):
 
 
 def reverse_geocode_batch(mosques_without_city):
-    """Use Postcodes.io to get city for mosques with postcodes but no city."""
-    postcodes = [m["postcode"] for m in mosques_without_city if m["postcode"]]
+    """Use Postcodes.io (via the shared postcode cache) to get city for mosques with postcodes but no city."""
+    postcodes = {m["postcode"] for m in mosques_without_city if m["postcode"]}
     if not postcodes:
         return
+    results = postcode_cache.shared().lookup(postcodes)
 
-    # Deduplicate
-    unique_postcodes = list(set(postcodes))
-    results = {}
-
-    # Batch lookup (100 per request)
-    for i in range(0, len(unique_postcodes), 100):
-        batch = unique_postcodes[i:i+100]
-        data = json.dumps({"postcodes": batch}).encode()
-        req = urllib.request.Request(
-            "https://api.postcodes.io/postcodes",
-            data=data,
-            headers={"Content-Type": "application/json"},
-        )
-        try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                body = json.loads(resp.read())
-                if body.get("result"):
-                    for item in body["result"]:
-                        if item.get("result"):
-                            r = item["result"]
-                            # Use admin_district (e.g. "City of Bradford") or postal_town
-                            city = r.get("admin_district", "") or r.get("parliamentary_constituency", "")
-                            # Clean up "City of X" -> "X"
-                            city = re.sub(r'^City of ', '', city)
-                            results[item["query"]] = city
-        except Exception as e:
-            print(f"  Warning: Postcodes.io batch failed: {e}")
-        time.sleep(0.5)  # Be nice to the API
-
-    # Apply results
     for m in mosques_without_city:
-        if m["postcode"] in results:
-            m["city"] = results[m["postcode"]]
+        record = results.get(m["postcode"])
+        if record:
+            # Use admin_district (e.g. "City of Bradford"), cleaned up "City of X" -> "X"
+            m["city"] = re.sub(r'^City of ', '', record["admin_district"])
 
 
 def reverse_geocode_coords(mosques_without_city):
-    """Use Postcodes.io nearest postcode lookup for mosques without postcode."""
-    for m in mosques_without_city:
-        if m.get("city") or not m.get("_lat"):
+    """Use Postcodes.io nearest postcode lookup for mosques without postcode.
+
+    Lookups go out in concurrent bulk batches (cached ones are skipped, failed batches are
+    retried). Returns {"resolved", "none_nearby", "failed"} lists of the mosques in each outcome.
+    """
+    todo = [m for m in mosques_without_city if not m.get("city") and m.get("_lat")]
+    results = postcode_cache.shared().reverse([(m["_lat"], m["_lon"]) for m in todo])
+    report = {"resolved": [], "none_nearby": [], "failed": []}
+    for m in todo:
+        point = (m["_lat"], m["_lon"])
+        if point not in results:
+            report["failed"].append(m)
             continue
-        try:
-            url = f"https://api.postcodes.io/postcodes?lon={m['_lon']}&lat={m['_lat']}&limit=1"
-            req = urllib.request.Request(url)
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                body = json.loads(resp.read())
-                if body.get("result") and len(body["result"]) > 0:
-                    r = body["result"][0]
-                    if not m["postcode"]:
-                        m["postcode"] = r.get("postcode", "")
-                    city = r.get("admin_district", "")
-                    city = re.sub(r'^City of ', '', city)
-                    m["city"] = city
-        except Exception as e:
-            pass
-        time.sleep(0.3)
+        record = results[point]
+        if not record:
+            report["none_nearby"].append(m)
+            continue
+        if not m["postcode"]:
+            m["postcode"] = record["postcode"]
+        m["city"] = re.sub(r'^City of ', '', record["admin_district"])
+        report["resolved"].append(m)
+    return report
+
+
+def print_geocode_report(report, show=10):
+    """Summarise reverse_geocode_coords() and name the mosques it could not place."""
+    geocoder = postcode_cache.shared()
+    stats = geocoder.stats
+    print(f"  Resolved {len(report['resolved'])}, no postcode within {postcode_cache.REVERSE_RADIUS}m "
+          f"{len(report['none_nearby'])}, failed {len(report['failed'])} "
+          f"({stats['hits']} cached, {stats['requests']} requests, {stats['retries']} retries)")
+    for outcome, label in (("none_nearby", "No postcode nearby"), ("failed", "Lookup failed (rerun to retry)")):
+        if report[outcome]:
+            print(f"  {label}:")
+            for m in report[outcome][:show]:
+                print(f"    - {m['name']} ({m['_lat']:.5f}, {m['_lon']:.5f})")
+            if len(report[outcome]) > show:
+                print(f"    ... and {len(report[outcome]) - show} more")
+    for failure in geocoder.failures:
+        print(f"  Failed {failure['kind']} batch of {len(failure['items'])} after "
+              f"{failure['attempts']} attempt(s): {failure['error']}")
 
 
 def query_overpass():
-    """Fetch all UK mosques from Overpass API in regional batches."""
-    print("Querying OpenStreetMap Overpass API for UK mosques...")
-    all_elements = []
-    seen_ids = set()
-
-    for region_name, (south, west, north, east) in UK_REGIONS:
-        query = f"""
-[out:json][timeout:60];
-(
-  node["amenity"="place_of_worship"]["religion"="muslim"]({south},{west},{north},{east});
-  way["amenity"="place_of_worship"]["religion"="muslim"]({south},{west},{north},{east});
-);
-out center tags;
-"""
-        print(f"  {region_name}...", end=" ", flush=True)
-        success = False
-        for api_url in OVERPASS_URLS:
-            data = urllib.parse.urlencode({"data": query}).encode()
-            req = urllib.request.Request(api_url, data=data)
-            try:
-                with urllib.request.urlopen(req, timeout=90) as resp:
-                    result = json.loads(resp.read())
-                elements = result.get("elements", [])
-                new = 0
-                for el in elements:
-                    eid = el.get("id")
-                    if eid not in seen_ids:
-                        seen_ids.add(eid)
-                        all_elements.append(el)
-                        new += 1
-                print(f"{len(elements)} found ({new} new)")
-                success = True
-                break
-            except Exception as e:
-                continue
-        if not success:
-            print("FAILED (all endpoints)")
-        time.sleep(3)
-
-    print(f"  Total unique: {len(all_elements)}")
-    return all_elements
+    """All UK mosques from the local OSM store (see osm_store.py), refreshed from Overpass if due."""
+    print("Loading UK mosques from OpenStreetMap...")
+    return load_elements()
 
 
 def main():
@@ -341,7 +269,7 @@ def main():
         still_missing = [m for m in new_mosques if not m.get("city")]
         if still_missing:
             print(f"  Coordinate lookup for {len(still_missing)} mosques...")
-            reverse_geocode_coords(still_missing)
+            print_geocode_report(reverse_geocode_coords(still_missing))
 
     # Final stats
     with_city = sum(1 for m in new_mosques if m.get("city"))
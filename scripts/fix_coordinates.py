@@ -2,7 +2,7 @@
 """
 Replace postcode-centroid coordinates with exact OSM building coordinates.
 
-1. Re-queries Overpass API for all UK mosques (just coords + name)
+1. Loads all UK mosques from the local OSM store (delta refresh from Overpass)
 2. Matches OSM results to directory entries by name or postcode
 3. Updates lat/lon with exact building positions
 4. Falls back to postcode centroid if no OSM match found
@@ -10,57 +10,15 @@ Replace postcode-centroid coordinates with exact OSM building coordinates.
 
 import json
 import re
-import time
-import urllib.request
-import urllib.parse
 from pathlib import Path
 
+from osm_store import load_elements
+
 PROJECT_DIR = Path(__file__).parent.parent
 DIRECTORY_FILE = PROJECT_DIR / "directory_clean.json"
 RETRY_FILE = PROJECT_DIR / "scripts" / "retry_osm_data.json"
 OUTPUT_FILE = PROJECT_DIR / "directory_clean.json"
 
-# Same regions as build_directory.py but with smaller boxes for problem areas
-UK_REGIONS = [
-    # London split into 4
-    ("London NW", (51.5, -0.5, 51.7, -0.1)),
-    ("London NE", (51.5, -0.1, 51.7, 0.3)),
-    ("London SW", (51.3, -0.5, 51.5, -0.1)),
-    ("London SE", (51.3, -0.1, 51.5, 0.3)),
-    ("SE England", (50.7, -1.5, 51.3, 1.5)),
-    ("SW England", (50.0, -5.8, 51.3, -1.5)),
-    ("East England", (51.7, 0.0, 52.8, 1.8)),
-    # Birmingham area split
-    ("Birmingham", (52.3, -2.1, 52.6, -1.6)),
-    ("West Mids wider", (52.0, -2.5, 52.3, -1.2)),
-    ("West Mids north", (52.6, -2.5, 52.8, -1.2)),
-    ("East Midlands south", (52.0, -1.2, 52.5, 0.0)),
-    ("East Midlands north", (52.5, -1.2, 53.0, 0.0)),
-    ("NW England", (53.0, -3.2, 53.7, -1.8)),
-    ("Greater Manchester", (53.3, -2.5, 53.7, -1.8)),
-    ("Yorkshire South", (53.2, -1.8, 53.7, -0.5)),
-    ("Yorkshire West", (53.6, -2.2, 54.0, -1.2)),
-    ("Yorkshire North+East", (53.7, -1.2, 54.5, 0.0)),
-    ("NE England south", (54.5, -2.5, 55.0, 0.0)),
-    ("NE England north", (55.0, -2.5, 55.5, 0.0)),
-    ("Lancashire", (53.6, -3.2, 54.2, -2.2)),
-    ("South Wales", (51.3, -4.0, 51.8, -2.5)),
-    ("North Wales", (52.5, -5.5, 53.5, -2.5)),
-    ("Scotland South", (55.5, -5.5, 56.5, -2.0)),
-    ("Scotland North", (56.5, -8.0, 61.0, -0.5)),
-    ("Glasgow+Edinburgh", (55.8, -4.5, 56.1, -3.0)),
-    ("N Ireland", (54.0, -8.5, 55.5, -5.0)),
-    ("York+Hull", (53.7, -1.2, 54.2, 0.0)),
-    ("Hampshire", (50.7, -1.5, 51.3, -0.5)),
-    ("Kent", (51.0, 0.0, 51.5, 1.5)),
-    ("Sussex+Surrey", (50.7, -0.8, 51.3, 0.2)),
-]
-
-OVERPASS_URLS = [
-    "https://overpass.kumi.systems/api/interpreter",
-    "https://overpass-api.de/api/interpreter",
-]
-
 
 def normalize(s):
     """Normalize string for matching."""
@@ -68,47 +26,9 @@ def normalize(s):
 
 
 def query_overpass_all():
-    """Fetch all UK mosques from Overpass API with coordinates."""
-    print("Querying OSM for exact mosque coordinates...")
-    all_elements = []
-    seen_ids = set()
-
-    for region_name, (south, west, north, east) in UK_REGIONS:
-        query = f"""
-[out:json][timeout:60];
-(
-  node["amenity"="place_of_worship"]["religion"="muslim"]({south},{west},{north},{east});
-  way["amenity"="place_of_worship"]["religion"="muslim"]({south},{west},{north},{east});
-);
-out center tags;
-"""
-        print(f"  {region_name}...", end=" ", flush=True)
-        success = False
-        for api_url in OVERPASS_URLS:
-            data = urllib.parse.urlencode({"data": query}).encode()
-            req = urllib.request.Request(api_url, data=data)
-            try:
-                with urllib.request.urlopen(req, timeout=90) as resp:
-                    result = json.loads(resp.read())
-                elements = result.get("elements", [])
-                new = 0
-                for el in elements:
-                    eid = el.get("id")
-                    if eid not in seen_ids:
-                        seen_ids.add(eid)
-                        all_elements.append(el)
-                        new += 1
-                print(f"{len(elements)} found ({new} new)")
-                success = True
-                break
-            except Exception as e:
-                continue
-        if not success:
-            print("FAILED")
-        time.sleep(2)
-
-    print(f"  Total unique: {len(all_elements)}")
-    return all_elements
+    """All UK mosques with coordinates from the local OSM store, refreshed from Overpass if due."""
+    print("Loading OSM mosques for exact coordinates...")
+    return load_elements()
 
 
 def extract_postcode(tags):
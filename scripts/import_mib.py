@@ -11,18 +11,15 @@ Import mosques from Muslims in Britain (muslimsInBritain.org) CSV.
 import csv
 import json
 import re
-import time
-import urllib.request
 from pathlib import Path
 
+import postcode_cache
+
 PROJECT_DIR = Path(__file__).parent.parent
 MIB_CSV = Path(__file__).parent / "MosquesMar26.csv"
 EXISTING_DIR = PROJECT_DIR / "directory.json"
 OUTPUT_FILE = PROJECT_DIR / "directory_new.json"
 
-# Batch size for Postcodes.io (max 100 per request)
-GEOCODE_BATCH = 100
-
 
 def parse_mib_csv(filepath):
     """Parse the MiB GPS CSV format.
@@ -126,46 +123,36 @@ def parse_mib_csv(filepath):
 
 
 def batch_reverse_geocode(mosques):
-    """Add postcodes and cities via Postcodes.io batch reverse geocode."""
+    """Add postcodes and cities via Postcodes.io batch reverse geocode (through the postcode cache)."""
     total = len(mosques)
     print(f"Reverse geocoding {total} mosques...")
 
-    for i in range(0, total, GEOCODE_BATCH):
-        batch = mosques[i : i + GEOCODE_BATCH]
-        geolocations = [
-            {"longitude": m["lon"], "latitude": m["lat"]} for m in batch
-        ]
-
-        payload = json.dumps({"geolocations": geolocations}).encode()
-        req = urllib.request.Request(
-            "https://api.postcodes.io/postcodes",
-            data=payload,
-            headers={"Content-Type": "application/json"},
-        )
-
-        try:
-            resp = urllib.request.urlopen(req)
-            data = json.loads(resp.read())
-
-            for j, result in enumerate(data.get("result", [])):
-                if result and result.get("result"):
-                    best = result["result"][0]
-                    mosques[i + j]["postcode"] = best.get("postcode", "")
-                    mosques[i + j]["city"] = best.get("admin_district", "")
-                else:
-                    mosques[i + j]["postcode"] = ""
-                    mosques[i + j]["city"] = ""
-        except Exception as e:
-            print(f"  Geocode error at batch {i}: {e}")
-            for j in range(len(batch)):
-                mosques[i + j]["postcode"] = ""
-                mosques[i + j]["city"] = ""
-
-        if (i + GEOCODE_BATCH) % 500 == 0 or i + GEOCODE_BATCH >= total:
-            print(f"  {min(i + GEOCODE_BATCH, total)}/{total} geocoded")
-
-        # Rate limit: be nice to the free API
-        time.sleep(0.2)
+    geocoder = postcode_cache.shared()
+    results = geocoder.reverse([(m["lat"], m["lon"]) for m in mosques])
+    failed = []
+    none_nearby = 0
+    for m in mosques:
+        point = (m["lat"], m["lon"])
+        if point not in results:
+            failed.append(m)
+        elif results[point] is None:
+            none_nearby += 1
+        best = results.get(point)
+        m["postcode"] = best["postcode"] if best else ""
+        m["city"] = best["admin_district"] if best else ""
+    resolved = total - len(failed) - none_nearby
+    print(f"  {resolved}/{total} geocoded, no postcode within {postcode_cache.REVERSE_RADIUS}m {none_nearby}, "
+          f"failed {len(failed)} ({geocoder.stats['hits']} cached, {geocoder.stats['requests']} requests, "
+          f"{geocoder.stats['retries']} retries)")
+    if failed:
+        print("  Lookup failed (no postcode/city set, rerun to retry):")
+        for m in failed[:10]:
+            print(f"    - {m['name']} ({m['lat']:.5f}, {m['lon']:.5f})")
+        if len(failed) > 10:
+            print(f"    ... and {len(failed) - 10} more")
+    for failure in geocoder.failures:
+        print(f"  Failed {failure['kind']} batch of {len(failure['items'])} after "
+              f"{failure['attempts']} attempt(s): {failure['error']}")
 
     return mosques
 
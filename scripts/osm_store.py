@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Local store of UK mosque elements from OpenStreetMap, kept current with delta refreshes.
+
+Elements live in overpass_cache/osm_elements.sqlite keyed by (type, id) with their OSM
+version. A refresh asks Overpass only for elements edited since the last one (a newer:
+filter over the UK roots, a few KB); every FULL_REFRESH_DAYS the whole UK is fetched
+again tile by tile, which also drops deleted elements and ones that stopped matching.
+Within REFRESH_INTERVAL of the last refresh the store is used as is, with no network.
+
+    python scripts/osm_store.py              # refresh if due, show what is stored
+    python scripts/osm_store.py --full       # force a full refresh
+    python scripts/osm_store.py --stub       # full then delta refresh against local stub servers
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import overpass_fetch
+from overpass_fetch import UK_ROOTS, Fetcher, fetch_regions, fetch_uk
+
+REFRESH_INTERVAL = 3600         # seconds; a store refreshed this recently is used without asking
+FULL_REFRESH_DAYS = 30
+NEWER_MARGIN = 900              # seconds; Overpass lags the OSM database by a few minutes
+
+# MOSQUE_QUERY with versions in the output ("meta") and room for a newer: filter
+STORE_QUERY = """
+[out:json][timeout:60];
+(
+  node["amenity"="place_of_worship"]["religion"="muslim"]{newer}({bbox});
+  way["amenity"="place_of_worship"]["religion"="muslim"]{newer}({bbox});
+);
+out center meta;
+"""
+
+
+def store_path():
+    return overpass_fetch.CHECKPOINT_DIR / "osm_elements.sqlite"
+
+
+def iso_utc(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ElementStore:
+    """OSM elements by (type, id), newest version wins."""
+
+    def __init__(self, path=None):
+        path = path or store_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS elements (
+                type TEXT NOT NULL, id INTEGER NOT NULL, version INTEGER NOT NULL, data TEXT NOT NULL,
+                PRIMARY KEY (type, id));
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM elements").fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+        self.db.commit()
+
+    def elements(self):
+        return [json.loads(data) for (data,) in self.db.execute("SELECT data FROM elements ORDER BY type, id")]
+
+    def upsert(self, elements):
+        """Store elements newer than what is held. Returns {"added", "updated", "unchanged"}."""
+        versions = {(t, i): v for t, i, v in self.db.execute("SELECT type, id, version FROM elements")}
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        rows = []
+        for el in elements:
+            key = (el["type"], el["id"])
+            version = el.get("version", 0)
+            held = versions.get(key)
+            if held is not None and version <= held:
+                counts["unchanged"] += 1
+                continue
+            counts["added" if held is None else "updated"] += 1
+            rows.append((*key, version, json.dumps(el, ensure_ascii=False)))
+        self.db.executemany("INSERT OR REPLACE INTO elements VALUES (?, ?, ?, ?)", rows)
+        self.db.commit()
+        return counts
+
+    def prune(self, keep):
+        """Delete every element whose (type, id) is not in keep. Returns how many went."""
+        gone = [key for key in self.db.execute("SELECT type, id FROM elements") if key not in keep]
+        self.db.executemany("DELETE FROM elements WHERE type = ? AND id = ?", gone)
+        self.db.commit()
+        return len(gone)
+
+    def close(self):
+        self.db.close()
+
+
+def refresh(store, full=False, fetcher=None):
+    """Bring the store up to date from Overpass: a delta since the last refresh, or the whole
+    UK when full is set, nothing is stored yet, or the last full refresh is FULL_REFRESH_DAYS old.
+
+    Returns {"mode", "added", "updated", "unchanged", "removed", "failed", "seconds"}. If any
+    region fails, what did arrive is kept but the refresh point does not move, so the next
+    refresh asks again.
+    """
+    started = time.perf_counter()
+    since = store.get_meta("since")
+    full = full or since is None or time.time() - store.get_meta("last_full", 0) > FULL_REFRESH_DAYS * 86400
+    if full:
+        elements, report = fetch_uk(STORE_QUERY.replace("{newer}", ""), fetcher=fetcher)
+    else:
+        newer = f'(newer:"{iso_utc(since - NEWER_MARGIN)}")'
+        print(f"  Changes since {iso_utc(since)}...")
+        elements, report = fetch_regions(UK_ROOTS, STORE_QUERY.replace("{newer}", newer),
+                                         fetcher=fetcher, checkpoint=False)
+    stats = {"mode": "full" if full else "delta", **store.upsert(elements), "removed": 0,
+             "failed": sum(entry["status"] == "failed" for entry in report)}
+    if not stats["failed"]:
+        data_time = min(entry["fetched_at"] for entry in report)
+        if full:
+            stats["removed"] = store.prune({(el["type"], el["id"]) for el in elements})
+            store.set_meta("last_full", data_time)
+        store.set_meta("since", data_time)
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    return stats
+
+
+def load_elements(refresh_after=REFRESH_INTERVAL, full=False):
+    """Every stored element, refreshing first if the store is older than refresh_after seconds."""
+    store = ElementStore()
+    try:
+        since = store.get_meta("since")
+        if full or since is None or time.time() - since > refresh_after:
+            stats = refresh(store, full)
+            print(f"  {stats['mode'].title()} refresh in {stats['seconds']}s: {stats['added']} added, "
+                  f"{stats['updated']} updated, {stats['removed']} removed"
+                  + (f", {stats['failed']} region(s) FAILED - rerun to retry" if stats["failed"] else ""))
+        else:
+            print(f"  Using stored elements (refreshed {(time.time() - since) / 60:.0f} min ago)")
+        elements = store.elements()
+        print(f"  {len(elements)} elements in {store_path().name}")
+        return elements
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the local OSM mosque store")
+    parser.add_argument("--full", action="store_true", help="fetch the whole UK again")
+    parser.add_argument("--stub", action="store_true", help="run against local stub servers")
+    parser.add_argument("--edits", type=int, default=25, help="stub elements to edit before the delta")
+    args = parser.parse_args()
+
+    if not args.stub:
+        load_elements(full=args.full)
+        return
+
+    overpass_fetch.CHECKPOINT_DIR = overpass_fetch.SCRIPT_DIR / "overpass_cache" / "stub"
+    elements = overpass_fetch.stub_elements()
+    stubs = [overpass_fetch.start_stub(0.2, 0.1, elements, seed) for seed in (1, 2)]
+    fetcher = Fetcher([url for _, url in stubs])
+    store = ElementStore()
+    try:
+        print(f"Store: {store_path()} ({len(store)} elements)")
+        print(refresh(store, args.full, fetcher), fetcher.stats)
+
+        # Edit some elements and add one, as mappers would, then pull just the changes
+        now = iso_utc(time.time())
+        for el in random.sample(elements, args.edits):
+            el.update(version=el["version"] + 1, timestamp=now)
+            el["tags"]["name"] += " (edited)"
+        elements.append({**elements[0], "id": 10 ** 9 + len(elements), "version": 1, "timestamp": now})
+        store.set_meta("since", time.time() - 60)  # pretend the last refresh was a minute ago
+        fetcher.stats.update(requests=0, bytes=0)
+        print(refresh(store, fetcher=fetcher), fetcher.stats)
+        print(f"{len(store)} elements stored")
+    finally:
+        store.close()
+        for server, _ in stubs:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Concurrent, resumable Overpass fetcher shared by build_directory.py and fix_coordinates.py.
+
+- Regions are fetched a few at a time, spread over the mirrors (at most
+  SLOTS_PER_MIRROR requests in flight per mirror, Overpass's usual per-IP limit).
+- A mirror answering 429/503/504 (or timing out) is backed off, doubling up to
+  MAX_BACKOFF seconds and easing off again as it recovers; other regions move to the
+  other mirror meanwhile.
+- Every region that succeeds is checkpointed to overpass_cache/, so an interrupted
+  crawl resumes where it stopped (checkpoints expire after CHECKPOINT_MAX_AGE).
+- fetch_uk() covers the UK with non-overlapping quadtree tiles instead of hand-drawn
+  boxes: a tile the server times out on is quartered and refetched at once, one that
+  returns more than MAX_TILE_ELEMENTS is quartered for the next run, and four small
+  siblings are merged back. The layout is kept in overpass_cache/tiles.json.
+
+Offline check against a local stub Overpass server (random 429/504s, slow replies):
+
+    python scripts/overpass_fetch.py --stub --latency 1.5 --error-rate 0.2
+    python scripts/overpass_fetch.py --stub --serial      # one region at a time, for comparison
+
+Set OVERPASS_URLS (comma separated) to point the pipeline scripts at other servers.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR.parent / "Masjids"))
+from http_client import Pool, RequestCancelled
+
+OVERPASS_URLS = [u.strip() for u in os.environ.get("OVERPASS_URLS", "").split(",") if u.strip()] or [
+    "https://overpass.kumi.systems/api/interpreter",
+    "https://overpass-api.de/api/interpreter",
+]
+CHECKPOINT_DIR = SCRIPT_DIR / "overpass_cache"
+CHECKPOINT_MAX_AGE = 12 * 3600  # seconds; older region results are fetched again
+
+MAX_WORKERS = 4
+SLOTS_PER_MIRROR = 2
+ATTEMPTS = 6                    # per region, across all mirrors
+REQUEST_TIMEOUT = 90            # seconds (the query itself asks the server for 60)
+BASE_BACKOFF, MAX_BACKOFF = 2, 60
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Tile planner: non-overlapping roots covering GB and Northern Ireland (south, west, north, east)
+UK_ROOTS = [
+    ("South coast", (49.8, -6.5, 51.0, 1.0)),
+    ("England+Wales", (51.0, -5.8, 55.9, 1.8)),
+    ("N Ireland", (54.0, -8.2, 55.9, -5.8)),
+    ("Scotland", (55.9, -8.7, 61.0, 1.8)),
+]
+MAX_TILE_ELEMENTS = 500         # quarter a tile returning more than this (merge back at half)
+MIN_TILE_SIZE = 0.05            # degrees; tiles are never quartered below this
+QUADRANTS = "0123"              # SW, SE, NW, NE
+
+# All UK mosques in a (south, west, north, east) box, with a centre point for ways
+MOSQUE_QUERY = """
+[out:json][timeout:60];
+(
+  node["amenity"="place_of_worship"]["religion"="muslim"]({bbox});
+  way["amenity"="place_of_worship"]["religion"="muslim"]({bbox});
+);
+out center tags;
+"""
+
+
+class OverpassTimeout(Exception):
+    """The server gave up on the query (runtime timeout / out of memory remark)."""
+
+
+class Mirror:
+    """One Overpass server: a slot semaphore plus adaptive backoff."""
+
+    def __init__(self, url, slots=SLOTS_PER_MIRROR):
+        self.url = url
+        self.name = urllib.parse.urlsplit(url).netloc or url
+        self.slots = threading.Semaphore(slots)
+        self.backoff = 0
+        self.ready_at = 0.0
+        self.active = 0
+        self.lock = threading.Lock()
+        self.stats = {"ok": 0, "throttled": 0, "failed": 0}
+
+    def throttled(self, retry_after=None):
+        with self.lock:
+            self.backoff = min(MAX_BACKOFF, max(BASE_BACKOFF, self.backoff * 2))
+            delay = max(self.backoff, retry_after or 0) * random.uniform(1, 1.25)
+            self.ready_at = max(self.ready_at, time.monotonic() + delay)
+            self.stats["throttled"] += 1
+
+    def succeeded(self):
+        with self.lock:
+            self.backoff = self.backoff // 2 if self.backoff > BASE_BACKOFF else 0
+            self.stats["ok"] += 1
+
+
+def region_query(bbox, template=MOSQUE_QUERY):
+    return template.replace("{bbox}", ",".join(str(v) for v in bbox))
+
+
+def checkpoint_path(name, query):
+    slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+    return CHECKPOINT_DIR / f"{slug}-{hashlib.sha1(query.encode()).hexdigest()[:10]}.json"
+
+
+def load_checkpoint(path, max_age=CHECKPOINT_MAX_AGE):
+    """Saved {"region", "bbox", "fetched" (epoch seconds), "elements"}, or None if missing/expired."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - saved.get("fetched", 0) > max_age or "elements" not in saved:
+        return None
+    return saved
+
+
+def save_checkpoint(path, name, bbox, elements):
+    CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"region": name, "bbox": list(bbox), "fetched": time.time(), "elements": elements}, f)
+    os.replace(tmp, path)
+
+
+class Fetcher:
+    """Fetch many regions over the mirrors; see fetch_regions()."""
+
+    def __init__(self, urls=None, pool=None, timeout=REQUEST_TIMEOUT, attempts=ATTEMPTS):
+        self.mirrors = [Mirror(url) for url in (urls or OVERPASS_URLS)]
+        self.pool = pool or Pool(max_idle_per_host=SLOTS_PER_MIRROR)
+        self.timeout = timeout
+        self.attempts = attempts
+        self.cancel = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes": 0}
+
+    def _pick(self, tried):
+        """Mirror that is ready soonest and least busy, preferring one this region has not
+        just failed on."""
+        with self._lock:
+            now = time.monotonic()
+            mirror = min(self.mirrors, key=lambda m: (max(m.ready_at - now, 0), m.active, tried.get(m.url, 0)))
+            mirror.active += 1
+            return mirror
+
+    def fetch(self, query):
+        """Run one query; returns (elements, mirror name, attempts). Raises the last error."""
+        tried = {}
+        error = None
+        for attempt in range(1, self.attempts + 1):
+            mirror = self._pick(tried)
+            tried[mirror.url] = tried.get(mirror.url, 0) + 1
+            try:
+                wait = mirror.ready_at - time.monotonic()
+                if wait > 0 and self.cancel.wait(wait):
+                    raise RequestCancelled()
+                with mirror.slots:
+                    status, headers, body = self.pool.request(
+                        "POST", mirror.url, urllib.parse.urlencode({"data": query}).encode(),
+                        {"Content-Type": "application/x-www-form-urlencoded"},
+                        timeout=self.timeout, cancel=self.cancel)
+            except TimeoutError:
+                mirror.throttled()
+                error = OverpassTimeout(f"{mirror.name}: no reply in {self.timeout}s")
+                continue
+            except OSError as e:
+                mirror.stats["failed"] += 1
+                error = e
+                continue
+            finally:
+                with self._lock:
+                    mirror.active -= 1
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["bytes"] += len(body)
+            if status in RETRY_STATUSES:
+                retry_after = headers.get("Retry-After", "")
+                mirror.throttled(int(retry_after) if retry_after.isdigit() else None)
+                error = OverpassTimeout(f"{mirror.name}: HTTP {status}") if status == 504 else \
+                    OSError(f"{mirror.name}: HTTP {status}")
+                continue
+            try:
+                if status != 200:
+                    raise ValueError(f"HTTP {status}")
+                result = json.loads(body)
+            except ValueError as e:
+                mirror.stats["failed"] += 1
+                error = OSError(f"{mirror.name}: {e}")
+                continue
+            remark = result.get("remark", "")
+            if "timed out" in remark or "out of memory" in remark:
+                # Retrying the same box rarely helps; let the caller split it
+                mirror.succeeded()
+                raise OverpassTimeout(f"{mirror.name}: {remark.strip()}")
+            mirror.succeeded()
+            return result.get("elements", []), mirror.name, attempt
+        raise error
+
+
+def fetch_regions(regions, template=MOSQUE_QUERY, workers=MAX_WORKERS, fetcher=None,
+                  max_age=CHECKPOINT_MAX_AGE, quiet=False, checkpoint=True):
+    """Fetch [(name, (south, west, north, east)), ...] concurrently, resuming from checkpoints
+    (checkpoint=False for one-off queries that are not worth keeping).
+
+    Returns (unique elements, report) where report has one dict per region in input order:
+    {"region", "status": "fetched"|"checkpoint"|"failed", "elements", "seconds", "mirror",
+     "attempts", "error", "timeout", "fetched_at"}; timeout is True when the server gave up on
+    the query, fetched_at is when the data was downloaded (epoch seconds).
+    """
+    fetcher = fetcher or Fetcher()
+
+    def run(name, bbox):
+        query = region_query(bbox, template)
+        path = checkpoint_path(name, query)
+        entry = {"region": name, "status": "checkpoint", "elements": None, "seconds": 0.0,
+                 "mirror": None, "attempts": 0, "error": None, "timeout": False, "fetched_at": None}
+        saved = load_checkpoint(path, max_age) if checkpoint else None
+        if saved:
+            elements, entry["fetched_at"] = saved["elements"], saved["fetched"]
+        else:
+            elements = None
+            started = time.perf_counter()
+            entry["fetched_at"] = time.time()
+            try:
+                elements, entry["mirror"], entry["attempts"] = fetcher.fetch(query)
+                if checkpoint:
+                    save_checkpoint(path, name, bbox, elements)
+                entry["status"] = "fetched"
+            except RequestCancelled:
+                entry.update(status="failed", error="cancelled")
+            except OverpassTimeout as e:
+                entry.update(status="failed", error=str(e), timeout=True)
+            except OSError as e:
+                entry.update(status="failed", error=str(e))
+            entry["seconds"] = time.perf_counter() - started
+        entry["elements"] = elements
+        return entry
+
+    report = [None] * len(regions)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = {pool.submit(run, name, bbox): i for i, (name, bbox) in enumerate(regions)}
+    try:
+        for future in as_completed(futures):
+            report[futures[future]] = entry = future.result()
+            if quiet:
+                continue
+            if entry["timeout"]:
+                print(f"  {entry['region']}: TIMED OUT ({entry['error']})")
+            elif entry["status"] == "failed":
+                print(f"  {entry['region']}: FAILED ({entry['error']})")
+            elif entry["status"] == "checkpoint":
+                print(f"  {entry['region']}: {len(entry['elements'])} found (checkpoint)")
+            else:
+                print(f"  {entry['region']}: {len(entry['elements'])} found "
+                      f"({entry['mirror']}, {entry['seconds']:.1f}s, attempt {entry['attempts']})")
+    except KeyboardInterrupt:
+        # Abort requests in flight; regions already fetched are checkpointed
+        fetcher.cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("\n  Interrupted - rerun to resume from the checkpoints")
+        raise
+    pool.shutdown()
+
+    all_elements = unique_elements(entry["elements"] or [] for entry in report)
+    for entry in report:
+        entry["elements"] = len(entry["elements"] or [])
+    failed = [e["region"] for e in report if e["status"] == "failed" and not e["timeout"]]
+    if not quiet:
+        duplicates = sum(e["elements"] for e in report) - len(all_elements)
+        print(f"  Total unique: {len(all_elements)} ({duplicates} duplicates across regions)")
+        if failed:
+            print(f"  {len(failed)} region(s) failed: {', '.join(failed)} - rerun to retry just those")
+    return all_elements, report
+
+
+def unique_elements(batches):
+    """Concatenate element lists, dropping repeats of the same (type, id)."""
+    out = []
+    seen = set()
+    for elements in batches:
+        for el in elements:
+            key = (el.get("type"), el.get("id"))
+            if key not in seen:
+                seen.add(key)
+                out.append(el)
+    return out
+
+
+# --- Quadtree tile planner ---
+# A tile key is "<root index>:<quadrant digits>", e.g. "1:30" = NE quarter of England+Wales, then its SW quarter
+
+def tile_bbox(key):
+    root, _, path = key.partition(":")
+    south, west, north, east = UK_ROOTS[int(root)][1]
+    for q in map(int, path):
+        mid_lat, mid_lon = round((south + north) / 2, 6), round((west + east) / 2, 6)
+        south, north = (mid_lat, north) if q & 2 else (south, mid_lat)
+        west, east = (mid_lon, east) if q & 1 else (west, mid_lon)
+    return south, west, north, east
+
+
+def tile_name(key):
+    root, _, path = key.partition(":")
+    return f"{UK_ROOTS[int(root)][0]} {path}".strip()
+
+
+def can_split(key):
+    south, west, north, east = tile_bbox(key)
+    return min(north - south, east - west) >= 2 * MIN_TILE_SIZE
+
+
+def layout_path():
+    return CHECKPOINT_DIR / "tiles.json"
+
+
+def load_layout():
+    """{tile key: elements at last fetch (None if not fetched yet)}; the bare roots the first time."""
+    try:
+        with open(layout_path(), encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["roots"] == [list(bbox) for _, bbox in UK_ROOTS]:
+            return saved["tiles"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {f"{i}:": None for i in range(len(UK_ROOTS))}
+
+
+def save_layout(tiles):
+    CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = layout_path().with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"roots": [list(bbox) for _, bbox in UK_ROOTS], "tiles": dict(sorted(tiles.items()))}, f, indent=1)
+    os.replace(tmp, layout_path())
+
+
+def plan_layout(tiles, max_elements=MAX_TILE_ELEMENTS):
+    """Layout for the next run: quarter tiles over max_elements, merge four siblings that
+    together hold no more than half of it (the gap stops tiles flip-flopping)."""
+    planned = {}
+    for key, count in tiles.items():
+        if count is not None and count > max_elements and can_split(key):
+            planned.update({key + q: None for q in QUADRANTS})
+        else:
+            planned[key] = count
+    merged = True
+    while merged:
+        merged = False
+        siblings = {}
+        for key in planned:
+            if not key.endswith(":"):
+                siblings.setdefault(key[:-1], []).append(key)
+        for parent, keys in siblings.items():
+            counts = [planned[k] for k in keys]
+            if len(keys) == 4 and None not in counts and sum(counts) <= max_elements // 2:
+                for k in keys:
+                    del planned[k]
+                planned[parent] = sum(counts)
+                merged = True
+    return planned
+
+
+def fetch_uk(template=MOSQUE_QUERY, workers=MAX_WORKERS, fetcher=None, max_age=CHECKPOINT_MAX_AGE,
+             max_elements=MAX_TILE_ELEMENTS):
+    """Fetch the whole UK tile by tile (see module docstring). Returns (unique elements, report);
+    the report covers the final tiles, not the ones that were quartered on the way."""
+    fetcher = fetcher or Fetcher()
+    tiles = load_layout()
+    pending = sorted(tiles)
+    batches, report = [], []
+    while pending:
+        elements, round_report = fetch_regions([(tile_name(k), tile_bbox(k)) for k in pending], template,
+                                               workers, fetcher, max_age)
+        batches.append(elements)
+        split = []
+        for key, entry in zip(pending, round_report):
+            if entry["timeout"] and can_split(key):
+                del tiles[key]
+                split.extend(key + q for q in QUADRANTS)
+            else:
+                tiles[key] = entry["elements"] if entry["status"] != "failed" else None
+                report.append(entry)
+        if split:
+            print(f"  Quartering {len(split) // 4} tile(s) the server timed out on...")
+            tiles.update({key: None for key in split})
+        pending = split
+    planned = plan_layout(tiles, max_elements)
+    save_layout(planned)
+    all_elements = unique_elements(batches)
+    print(f"  {len(tiles)} tiles fetched, {len(planned)} planned for next run; {len(all_elements)} unique elements")
+    return all_elements, report
+
+
+# --- Offline stub server ---
+
+def stub_elements(count=3000, seed=1):
+    """Deterministic fake mosques scattered over the UK, denser around the big cities."""
+    rng = random.Random(seed)
+    cities = [(51.51, -0.12), (52.48, -1.89), (53.48, -2.24), (53.80, -1.76), (53.38, -1.47),
+              (52.63, -1.13), (51.45, -2.59), (55.86, -4.25), (54.60, -5.93), (51.48, -3.18)]
+    elements = []
+    for i in range(count):
+        if rng.random() < 0.7:
+            lat, lon = rng.choice(cities)
+            lat, lon = lat + rng.gauss(0, 0.08), lon + rng.gauss(0, 0.12)
+        else:
+            lat, lon = rng.uniform(50.0, 58.5), rng.uniform(-6.0, 1.7)
+        el = {"type": "node" if i % 4 else "way", "id": 1000 + i,
+              "version": 1, "timestamp": "2025-06-01T00:00:00Z",
+              "tags": {"amenity": "place_of_worship", "religion": "muslim", "name": f"Stub Masjid {i}"}}
+        if el["type"] == "node":
+            el.update(lat=round(lat, 7), lon=round(lon, 7))
+        else:
+            el["center"] = {"lat": round(lat, 7), "lon": round(lon, 7)}
+        elements.append(el)
+    return elements
+
+
+class StubOverpass(BaseHTTPRequestHandler):
+    """Answers MOSQUE_QUERY-style queries (bbox, optional newer: filter and meta output) from
+    server.elements, with latency and random errors."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        form = urllib.parse.parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+        query = form.get("data", [""])[0]
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            busy = server.in_flight > SLOTS_PER_MIRROR
+        try:
+            if busy or server.rng.random() < server.error_rate:
+                status = 429 if busy or server.rng.random() < 0.5 else 504
+                return self._reply(status, b"busy", "text/plain")
+            time.sleep(server.latency * server.rng.uniform(0.5, 1.5))
+            south, west, north, east = map(float, re.search(
+                r"\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)", query).groups())
+            found = [el for el in server.elements
+                     if south <= el.get("lat", el.get("center", {}).get("lat")) <= north
+                     and west <= el.get("lon", el.get("center", {}).get("lon")) <= east]
+            newer = re.search(r'newer:"([^"]+)"', query)
+            if newer:
+                found = [el for el in found if el["timestamp"] > newer.group(1)]
+            if "meta" not in query:
+                found = [{k: v for k, v in el.items() if k not in ("version", "timestamp")} for el in found]
+            if len(found) > server.max_results:
+                # Real servers answer 200 with a remark when the query runs out of time
+                remark = 'runtime error: Query timed out in "query" at line 4 after 61 seconds.'
+                return self._reply(200, json.dumps({"version": 0.6, "elements": [], "remark": remark}).encode())
+            self._reply(200, json.dumps({"version": 0.6, "elements": found}).encode())
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _reply(self, status, data, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(latency=1.0, error_rate=0.1, elements=None, seed=1, max_results=1000):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOverpass)
+    server.daemon_threads = True
+    server.latency, server.error_rate, server.max_results = latency, error_rate, max_results
+    server.elements = stub_elements(seed=seed) if elements is None else elements
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = server.in_flight = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/interpreter"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch all UK tiles from Overpass (or a local stub)")
+    parser.add_argument("--stub", action="store_true", help="run against two local stub mirrors")
+    parser.add_argument("--latency", type=float, default=1.0, help="stub seconds per query")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="stub share of 429/504 replies")
+    parser.add_argument("--max-results", type=int, default=1000, help="stub times out on bigger queries")
+    parser.add_argument("--serial", action="store_true", help="one tile at a time")
+    parser.add_argument("--fresh", action="store_true", help="ignore checkpoints")
+    args = parser.parse_args()
+
+    global CHECKPOINT_DIR
+    stubs = []
+    urls = None
+    if args.stub:
+        CHECKPOINT_DIR = SCRIPT_DIR / "overpass_cache" / "stub"
+        elements = stub_elements()
+        stubs = [start_stub(args.latency, args.error_rate, elements, seed, args.max_results) for seed in (1, 2)]
+        urls = [url for _, url in stubs]
+        print(f"Stub mirrors: {', '.join(urls)} (latency {args.latency}s, error rate {args.error_rate})")
+
+    fetcher = Fetcher(urls)
+    started = time.perf_counter()
+    elements, report = fetch_uk(workers=1 if args.serial else MAX_WORKERS, fetcher=fetcher,
+                                max_age=0 if args.fresh else CHECKPOINT_MAX_AGE)
+    wall = time.perf_counter() - started
+    counts = {}
+    for entry in report:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    print(f"\n{len(report)} tile queries in {wall:.1f}s: "
+          + ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+          + f"; {fetcher.stats['requests']} requests, {fetcher.stats['bytes'] / 1024:.0f} KB downloaded")
+    for mirror in fetcher.mirrors:
+        print(f"  {mirror.name}: {mirror.stats}")
+    if stubs:
+        print(f"  stub requests: {sum(server.requests for server, _ in stubs)}")
+    for server, _ in stubs:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,14 @@
 #!/usr/bin/env python3
 """Patch original mosque pages: replace emoji icons with mosque silhouette SVG, add poster link."""
-import os, re
+import os, re, sys
 
-ROOT = 'G:/My Drive/Work/Prayer-times'
+# PRAYER_TIMES_ROOT points the script at another tree (e.g. scripts/bench_build.py fixtures)
+ROOT = os.environ.get('PRAYER_TIMES_ROOT', 'G:/My Drive/Work/Prayer-times')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Masjids'))
+from palette import mosque_icon_svg
 ORIGINALS = ['shahjalal', 'quba', 'Almahad', 'Tawakkulia', 'Salahadin',
              'abubakar', 'iyma', 'JamiaMasjid', 'taqwa', 'ibrahim']
 
-# Mosque silhouette SVG template (use {c} for URL-encoded color like %23004d40)
-MOSQUE_ICON = (
-    "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'>"
-    "<rect fill='{c}' width='100' height='100' rx='20'/>"
-    "<path d='M30 55 Q50 20 70 55 Z' fill='white' opacity='0.95'/>"
-    "<rect x='22' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
-    "<polygon points='22,35 25,25 28,35' fill='white' opacity='0.9'/>"
-    "<rect x='72' y='35' width='6' height='40' rx='1' fill='white' opacity='0.9'/>"
-    "<polygon points='72,35 75,25 78,35' fill='white' opacity='0.9'/>"
-    "<rect x='30' y='55' width='40' height='20' fill='white' opacity='0.9'/>"
-    "<path d='M44 75 L44 62 Q50 56 56 62 L56 75 Z' fill='{c}' opacity='0.8'/>"
-    "<circle cx='50' cy='28' r='5' fill='white'/>"
-    "<circle cx='52' cy='27' r='4' fill='{c}'/>"
-    "</svg>"
-)
-
 POSTER_LINK = (
     '            <span style="color: rgba(255,255,255,0.15);">|</span>\n'
     '            <a href="poster.html" target="_blank" style="color: rgba(255,255,255,0.5); '
@@ -52,7 +39,7 @@ for folder in ORIGINALS:
             color = color_match.group(1)
         else:
             color = '%23004d40'  # fallback
-        new_favicon = f'<link rel="icon" href="data:image/svg+xml,{MOSQUE_ICON.format(c=color)}">'
+        new_favicon = f'<link rel="icon" href="data:image/svg+xml,{mosque_icon_svg(color)}">'
         content = content[:m.start()] + new_favicon + content[m.end():]
         changes.append('favicon')
 
@@ -62,7 +49,7 @@ for folder in ORIGINALS:
     if m:
         color_match = re.search(r"fill='(%23[0-9a-fA-F]{6})'", m.group(0))
         color = color_match.group(1) if color_match else '%23004d40'
-        new_apple = f'<link rel="apple-touch-icon" href="data:image/svg+xml,{MOSQUE_ICON.format(c=color)}">'
+        new_apple = f'<link rel="apple-touch-icon" href="data:image/svg+xml,{mosque_icon_svg(color)}">'
         content = content[:m.start()] + new_apple + content[m.end():]
         changes.append('apple-touch-icon')
 
@@ -4,7 +4,8 @@ Does NOT touch variable names (jFajr, jZuhr, jAsr, jIsha)."""
 
 import os, sys
 
-ROOT = 'G:/My Drive/Work/Prayer-times'
+# PRAYER_TIMES_ROOT points the script at another tree (e.g. scripts/bench_build.py fixtures)
+ROOT = os.environ.get('PRAYER_TIMES_ROOT', 'G:/My Drive/Work/Prayer-times')
 ORIGINALS = ['shahjalal', 'quba', 'Almahad', 'Tawakkulia', 'Salahadin',
              'abubakar', 'iyma', 'JamiaMasjid', 'taqwa', 'ibrahim']
 
@@ -5,12 +5,14 @@ Fix 4: Post-Isha highlight — after Isha Jamaah, Sehri (or Fajr) becomes NEXT (
 Fix 5: Jamaat-based cutoff — highlight stays on current prayer until AFTER its Jamaah time.
 
 Handles two patterns:
-  A) Standard (quba, Almahad, Salahadin, abubakar*, iyma, JamiaMasjid, taqwa, ibrahim):
-     Single-line prayers array, same pattern as abubakar template.
+  A) Standard (quba, Almahad, Salahadin, iyma, JamiaMasjid, taqwa, ibrahim):
+     Single-line prayers array, the pattern the abubakar template used to have.
   B) Tawakkulia special case: Uses todayData.iftar (sunset) for Maghrib, has separate maghrib jamaah.
   C) Shahjalal: Multi-line format, two arrays (Ramadan + non-Ramadan).
 
-* abubakar already patched directly — included here for verification only.
+abubakar (the generate.py template) already has both fixes and no longer uses the
+toDate24 eventTime pattern: its countdown works on precomputed minutes (eventMins from
+getSchedule), so it is only checked for the fixed markers below, never patched.
 """
 
 import os
@@ -133,6 +135,25 @@ NEW_WRAP_SHAHJALAL = (
 )
 
 
+# abubakar template: Fix 5 = cards change at jamaah minutes, Fix 4 = post-Isha wrap
+TEMPLATE_FIXED_MARKERS = [
+    'eventMins: mins.jFajr },',
+    'eventMins: mins.jZuhr },',
+    'eventMins: mins.jAsr },',
+    'eventMins: mins.jIsha }',
+    'const isPassed = isWrapped ? (i !== 0) : (i < nextIndex);',
+]
+
+
+def verify_template(path, label):
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    missing = [marker for marker in TEMPLATE_FIXED_MARKERS if marker not in content]
+    for marker in missing:
+        print(f'  WARNING: Fixed marker not found in {label}: {marker}')
+    print(f'{"NOT FIXED" if missing else "OK"}: {label}')
+
+
 def patch_file(path, replacements, wrap_old, wrap_new, label=''):
     with open(path, 'r', encoding='utf-8') as f:
         content = f.read()
@@ -170,11 +191,9 @@ mosques = [
     ('ibrahim/index.html',     STANDARD_REPLACEMENTS, OLD_WRAP_SINGLE, NEW_WRAP_SINGLE,       'ibrahim'),
     ('Tawakkulia/index.html',  TAWAKKULIA_REPLACEMENTS, OLD_WRAP_SINGLE, NEW_WRAP_SINGLE,     'Tawakkulia'),
     ('shahjalal/index.html',   STANDARD_REPLACEMENTS + SHAHJALAL_EXTRA, OLD_WRAP_SHAHJALAL, NEW_WRAP_SHAHJALAL, 'shahjalal'),
-    # abubakar already patched — verify only
-    ('abubakar/index.html',    [], OLD_WRAP_SINGLE, NEW_WRAP_SINGLE,                           'abubakar (verify)'),
 ]
 
-print('Patching 10 original mosque files...\n')
+print('Patching 9 original mosque files...\n')
 for rel_path, replacements, wrap_old, wrap_new, label in mosques:
     full_path = os.path.join(BASE, rel_path)
     if not os.path.exists(full_path):
@@ -182,4 +201,6 @@ for rel_path, replacements, wrap_old, wrap_new, label in mosques:
         continue
     patch_file(full_path, replacements, wrap_old, wrap_new, label)
 
+verify_template(os.path.join(BASE, 'abubakar/index.html'), 'abubakar (verify)')
+
 print('\nDone.')
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Postcode geocoding shared by the directory scripts, backed by a persistent local cache.
+
+Every Postcodes.io answer is kept in postcode_cache.sqlite:
+  postcode -> (lat, lon, admin_district)      forward lookups, and the records bulk
+                                              reverse lookups return
+  rounded (lat, lon) -> nearest postcode      reverse lookups (COORD_PRECISION dp, ~11 m)
+Answers expire after POSITIVE_TTL_DAYS; "no such postcode" / "no postcode nearby" are
+cached too, for NEGATIVE_TTL_DAYS. Only cache misses go to the API, in bulk requests
+of BATCH_SIZE, WORKERS at a time; a batch that is throttled or fails is retried
+with backoff, and whatever still fails is listed in Geocoder.failures.
+
+Fully offline: import the ONS Postcode Directory (ONSPD) CSV once, and set
+POSTCODES_OFFLINE=1 (or pass offline=True) to answer from it without any network:
+
+    python scripts/postcode_cache.py --import-ons ONSPD_FEB_2026_UK.csv \\
+        --la-names "LA_UA names and codes UK as at 04_25.csv"
+    python scripts/postcode_cache.py          # show what the cache holds
+"""
+
+import argparse
+import csv
+import math
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR.parent / "Masjids"))
+from http_client import HTTPError, Pool
+
+API_URL = os.environ.get("POSTCODES_API", "https://api.postcodes.io")
+CACHE_FILE = SCRIPT_DIR / "postcode_cache.sqlite"
+OFFLINE = os.environ.get("POSTCODES_OFFLINE", "") not in ("", "0")
+
+BATCH_SIZE = 100                # Postcodes.io bulk limit
+WORKERS = 4                     # bulk requests in flight at once
+RETRIES = 3                     # per batch, after the first attempt
+RETRY_BACKOFF = 1.0             # seconds, doubling per retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+POSITIVE_TTL_DAYS = 180
+NEGATIVE_TTL_DAYS = 14
+COORD_PRECISION = 4             # decimal places of the reverse-lookup cache key
+REVERSE_RADIUS = 100            # metres, as Postcodes.io's default
+ONS_NO_COORDS = 99.999999       # ONSPD latitude for postcodes without a grid reference
+
+
+def normalize(postcode):
+    """Cache key: uppercase, no spaces."""
+    return (postcode or "").upper().replace(" ", "")
+
+
+def coord_key(lat, lon):
+    return f"{lat:.{COORD_PRECISION}f},{lon:.{COORD_PRECISION}f}"
+
+
+class Geocoder:
+    """Forward and reverse postcode lookups through the local cache."""
+
+    def __init__(self, path=CACHE_FILE, offline=OFFLINE, api_url=API_URL, pool=None):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS postcodes (
+                key TEXT PRIMARY KEY, postcode TEXT, lat REAL, lon REAL, admin_district TEXT,
+                source TEXT NOT NULL, fetched REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS postcodes_lat ON postcodes (lat);
+            CREATE TABLE IF NOT EXISTS nearest (
+                key TEXT PRIMARY KEY, postcode_key TEXT, fetched REAL NOT NULL);
+        """)
+        self.offline = offline
+        self.api_url = api_url.rstrip("/")
+        self.pool = pool or Pool()
+        self.stats = {"hits": 0, "misses": 0, "requests": 0, "retries": 0, "failed": 0}
+        self.failures = []      # {"kind", "items", "error", "attempts"} per batch given up on
+        self._ons = None
+
+    def close(self):
+        self.db.close()
+
+    # --- cache ---
+
+    @staticmethod
+    def _fresh(source, found, fetched):
+        if source == "ons":
+            return True
+        ttl = POSITIVE_TTL_DAYS if found else NEGATIVE_TTL_DAYS
+        return time.time() - fetched < ttl * 86400
+
+    def _cached_postcode(self, key):
+        """(hit, record or None)."""
+        row = self.db.execute("SELECT postcode, lat, lon, admin_district, source, fetched FROM postcodes "
+                              "WHERE key = ?", (key,)).fetchone()
+        if not row or not self._fresh(row[4], row[0] is not None, row[5]):
+            return False, None
+        return True, (None if row[0] is None else
+                      {"postcode": row[0], "lat": row[1], "lon": row[2], "admin_district": row[3] or ""})
+
+    def _store_postcode(self, key, result, now):
+        """Cache a Postcodes.io postcode record (None: not a live postcode). Rows imported from
+        the ONS directory are left alone, so they never go stale."""
+        record = None if result is None else {
+            "postcode": result["postcode"], "lat": result["latitude"], "lon": result["longitude"],
+            "admin_district": result.get("admin_district") or ""}
+        values = (None, None, None, None) if record is None else (
+            record["postcode"], record["lat"], record["lon"], record["admin_district"])
+        self.db.execute("INSERT INTO postcodes VALUES (?, ?, ?, ?, ?, 'api', ?) "
+                        "ON CONFLICT (key) DO UPDATE SET postcode = excluded.postcode, lat = excluded.lat, "
+                        "lon = excluded.lon, admin_district = excluded.admin_district, "
+                        "source = excluded.source, fetched = excluded.fetched WHERE source != 'ons'",
+                        (key or normalize(record["postcode"]), *values, now))
+        return record
+
+    def _post(self, payload):
+        """One bulk request with retries (runs on a worker thread). Returns (results, attempts, error)."""
+        error = None
+        for attempt in range(1, RETRIES + 2):
+            try:
+                reply = self.pool.post_json(f"{self.api_url}/postcodes", payload, timeout=30)
+                return reply.get("result") or [], attempt, None
+            except HTTPError as e:
+                error = e
+                if e.status not in RETRY_STATUSES:
+                    break
+            except ValueError as e:     # not JSON
+                error = e
+                break
+            except OSError as e:        # connection errors and timeouts
+                error = e
+            if attempt <= RETRIES:
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        return None, attempt, error
+
+    def _bulk(self, kind, field, batches):
+        """POST every (items, payload list) batch concurrently; yields (items, results) on the
+        calling thread (so the cache is only written from there) for the batches that succeed."""
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            futures = {pool.submit(self._post, {field: payload}): items for items, payload in batches}
+            for future in as_completed(futures):
+                items = futures[future]
+                results, attempts, error = future.result()
+                self.stats["requests"] += attempts
+                self.stats["retries"] += attempts - 1
+                if results is None:
+                    self.stats["failed"] += len(items)
+                    self.failures.append({"kind": kind, "items": items, "error": str(error), "attempts": attempts})
+                    print(f"  Warning: Postcodes.io {kind} failed for {len(items)} items "
+                          f"after {attempts} attempt(s): {error}")
+                    continue
+                yield items, results
+
+    # --- lookups ---
+
+    def lookup(self, postcodes):
+        """{postcode as given: {"postcode", "lat", "lon", "admin_district"}, or None if it is not a
+        live postcode}. Postcodes that could not be looked up (offline, API errors) are left out."""
+        out = {}
+        missing = {}
+        for query in postcodes:
+            key = normalize(query)
+            if not key:
+                continue
+            hit, record = self._cached_postcode(key)
+            if hit:
+                self.stats["hits"] += 1
+                out[query] = record
+            else:
+                missing.setdefault(key, []).append(query)
+        if self.offline and self._has_ons():
+            # The ONS directory lists every live postcode, so anything else is not one
+            out.update((query, None) for queries in missing.values() for query in queries)
+            self.stats["hits"] += len(missing)
+            return out
+        self.stats["misses"] += len(missing)
+        if self.offline or not missing:
+            return out
+
+        keys = list(missing)
+        batches = [(keys[i:i + BATCH_SIZE],) * 2 for i in range(0, len(keys), BATCH_SIZE)]
+        for batch, results in self._bulk("lookup", "postcodes", batches):
+            now = time.time()
+            for item in results:
+                key = normalize(item.get("query"))
+                record = self._store_postcode(key, item.get("result"), now)
+                for query in missing.get(key, []):
+                    out[query] = record
+            self.db.commit()
+        return out
+
+    def reverse(self, coords):
+        """{(lat, lon): nearest postcode record within REVERSE_RADIUS, or None if there is none}.
+        Coordinates that could not be looked up (offline without ONS data, API errors) are left out."""
+        out = {}
+        missing = {}
+        for lat, lon in coords:
+            key = coord_key(lat, lon)
+            row = self.db.execute("SELECT postcode_key, fetched FROM nearest WHERE key = ?", (key,)).fetchone()
+            hit = False
+            if row and self._fresh("api", row[0] is not None, row[1]):
+                hit, record = (True, None) if row[0] is None else self._cached_postcode(row[0])
+            if not hit and self.offline:
+                record = self._nearest_offline(lat, lon)
+                hit = record is not None or self._has_ons()
+            if hit:
+                self.stats["hits"] += 1
+                out[(lat, lon)] = record
+            else:
+                missing.setdefault(key, []).append((lat, lon))
+        self.stats["misses"] += len(missing)
+        if self.offline or not missing:
+            return out
+
+        keys = list(missing)
+        batches = []
+        for i in range(0, len(keys), BATCH_SIZE):
+            batch = keys[i:i + BATCH_SIZE]
+            batches.append((batch, [{"latitude": missing[key][0][0], "longitude": missing[key][0][1], "limit": 1}
+                                    for key in batch]))
+        for batch, results in self._bulk("reverse lookup", "geolocations", batches):
+            now = time.time()
+            for key, item in zip(batch, results):
+                nearest = (item.get("result") or [None])[0]
+                record = self._store_postcode(None, nearest, now) if nearest else None
+                self.db.execute("INSERT OR REPLACE INTO nearest VALUES (?, ?, ?)",
+                                (key, normalize(record["postcode"]) if record else None, now))
+                for point in missing[key]:
+                    out[point] = record
+            self.db.commit()
+        return out
+
+    # --- offline ONS data ---
+
+    def _has_ons(self):
+        if self._ons is None:
+            self._ons = self.db.execute("SELECT 1 FROM postcodes WHERE source = 'ons' LIMIT 1").fetchone() is not None
+        return self._ons
+
+    def _nearest_offline(self, lat, lon):
+        """Nearest imported ONS postcode within REVERSE_RADIUS, or None."""
+        dlat = REVERSE_RADIUS / 111_320
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+        best, best_dist = None, REVERSE_RADIUS
+        for postcode, plat, plon, district in self.db.execute(
+                "SELECT postcode, lat, lon, admin_district FROM postcodes WHERE source = 'ons' "
+                "AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?", (lat - dlat, lat + dlat, lon - dlon, lon + dlon)):
+            dist = 111_320 * math.hypot(plat - lat, (plon - lon) * math.cos(math.radians(lat)))
+            if dist <= best_dist:
+                best, best_dist = {"postcode": postcode, "lat": plat, "lon": plon, "admin_district": district}, dist
+        return best
+
+    def import_ons(self, onspd_csv, la_names_csv=None):
+        """Load live postcodes from an ONSPD CSV (pcds, lat, long, oslaua, doterm columns); the
+        local authority names file turns oslaua codes into admin_district names."""
+        names = {}
+        if la_names_csv:
+            with open(la_names_csv, encoding="utf-8-sig", newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                code = next(i for i, h in enumerate(header) if h.upper().endswith("CD"))
+                name = next(i for i, h in enumerate(header) if h.upper().endswith("NM"))
+                names = {row[code]: row[name] for row in reader if len(row) > max(code, name)}
+        now = time.time()
+        count = 0
+        with open(onspd_csv, encoding="utf-8-sig", newline="") as f:
+            rows = []
+            for row in csv.DictReader(f):
+                if row.get("doterm") or not row.get("lat"):
+                    continue
+                lat, lon = float(row["lat"]), float(row["long"])
+                if lat == ONS_NO_COORDS:
+                    continue
+                district = names.get(row.get("oslaua", ""), "")
+                rows.append((normalize(row["pcds"]), row["pcds"], lat, lon, district, now))
+                if len(rows) >= 50_000:
+                    count += self._insert_ons(rows)
+                    rows = []
+            count += self._insert_ons(rows)
+        return count
+
+    def _insert_ons(self, rows):
+        self._ons = None
+        self.db.executemany("INSERT OR REPLACE INTO postcodes VALUES (?, ?, ?, ?, ?, 'ons', ?)", rows)
+        self.db.commit()
+        return len(rows)
+
+    def summary(self):
+        counts = dict(self.db.execute("SELECT source, COUNT(*) FROM postcodes GROUP BY source"))
+        negative = self.db.execute("SELECT COUNT(*) FROM postcodes WHERE postcode IS NULL").fetchone()[0]
+        nearest = self.db.execute("SELECT COUNT(*) FROM nearest").fetchone()[0]
+        return {"api": counts.get("api", 0), "ons": counts.get("ons", 0), "negative": negative, "nearest": nearest}
+
+
+_shared = None
+
+
+def shared():
+    """The Geocoder every script in this process uses."""
+    global _shared
+    if _shared is None:
+        _shared = Geocoder()
+    return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Postcode cache maintenance")
+    parser.add_argument("--import-ons", metavar="CSV", help="ONS Postcode Directory CSV to load for offline use")
+    parser.add_argument("--la-names", metavar="CSV", help="ONSPD local authority names file (code, name)")
+    args = parser.parse_args()
+
+    geocoder = Geocoder()
+    if args.import_ons:
+        started = time.perf_counter()
+        count = geocoder.import_ons(args.import_ons, args.la_names)
+        print(f"Imported {count} live postcodes in {time.perf_counter() - started:.1f}s")
+    print(f"{CACHE_FILE.name}: {geocoder.summary()}")
+    geocoder.close()
+
+
+if __name__ == "__main__":
+    main()
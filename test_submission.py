@@ -4,29 +4,69 @@ Reads an image from the submissions folder, sends to Claude + OpenAI Vision,
 validates both extractions, picks the best, and sends Telegram notification.
 """
 import base64
+import io
 import json
 import os
 import sys
 import hashlib
 import subprocess
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Masjids"))
+# Scores extractions: share of days passing format/order/jamaah/drift/date checks
+from timetable_checks import Issue, validate
+from http_client import HTTPError, Pool, RequestCancelled
+
+try:
+    from PIL import Image
+except ImportError:  # perceptual matching is skipped; exact duplicates are still caught
+    Image = None
 
 # Config
 SUBMISSIONS_DIR = r"G:\My Drive\Prayer_submissions\Timetables"
 TELEGRAM_BOT_TOKEN = "8238602157:AAG2fKf3kzOlK8RW51QVI2Oq02sq_aWnvJ8"
 TELEGRAM_CHAT_ID = "1578762040"
 SQL_WEBHOOK = "https://primary-production-64370.up.railway.app/webhook/sql-query"
+# Overridable so the pipeline can be exercised against local stub servers
+CLAUDE_API_URL = os.environ.get("CLAUDE_API_URL", "https://api.anthropic.com/v1/messages")
+OPENAI_API_URL = os.environ.get("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+
+# Extraction: both providers run at once; a result scoring this much is used
+# straight away and the other call is cancelled
+ACCEPT_SCORE = 70
+PROVIDER_TIMEOUTS = {"claude": 120, "openai": 120}  # seconds
+
+# Extraction results by file content, so a re-shared file costs no model calls.
+# Delete an entry's <sha256>.json to force a fresh extraction.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".submission_cache")
+CACHE_INDEX = os.path.join(CACHE_DIR, "index.json")  # sha256 -> perceptual hash
+PHASH_MAX_DISTANCE = 6  # differing bits (of 64) still counted as the same image
+FAILED_ENTRY_TTL = 3600  # seconds a run with a provider timeout/error is reused before retrying
+
+# Keep-alive connections shared by every API call (both extraction threads included)
+HTTP = Pool()
+
+_user_env_keys = {}  # keys found in the Windows user environment; misses are looked up again
 
 def get_api_key(env_name):
-    """Get API key from Windows user environment."""
-    result = subprocess.run(
-        ["powershell", "-Command", f'[System.Environment]::GetEnvironmentVariable("{env_name}", "User")'],
-        capture_output=True, text=True
-    )
-    return result.stdout.strip()
-
-def call_claude(b64_data, mime_type, prompt):
-    """Call Claude Vision API via curl."""
+    """Get API key from the environment, else the Windows user environment (found keys are cached)."""
+    if os.environ.get(env_name):
+        return os.environ[env_name]
+    if env_name not in _user_env_keys:
+        result = subprocess.run(
+            ["powershell", "-Command", f'[System.Environment]::GetEnvironmentVariable("{env_name}", "User")'],
+            capture_output=True, text=True
+        )
+        if not result.stdout.strip():
+            return ""
+        _user_env_keys[env_name] = result.stdout.strip()
+    return _user_env_keys[env_name]
+
+def call_claude(b64_data, mime_type, prompt, timeout=120, cancel=None):
+    """Call Claude Vision API."""
     api_key = get_api_key("ANTHROPIC_API_KEY")
     media_type = "image" if mime_type.startswith("image/") else "document"
 
@@ -41,23 +81,13 @@ def call_claude(b64_data, mime_type, prompt):
             ]
         }]
     }
+    return HTTP.post_json(CLAUDE_API_URL, body, headers={
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+    }, timeout=timeout, cancel=cancel)
 
-    with open("_test_claude.json", "w") as f:
-        json.dump(body, f)
-
-    result = subprocess.run([
-        "curl", "-s", "-X", "POST", "https://api.anthropic.com/v1/messages",
-        "-H", f"x-api-key: {api_key}",
-        "-H", "anthropic-version: 2023-06-01",
-        "-H", "Content-Type: application/json",
-        "-d", "@_test_claude.json"
-    ], capture_output=True, text=True, timeout=120)
-
-    os.remove("_test_claude.json")
-    return json.loads(result.stdout)
-
-def call_openai(b64_data, mime_type, prompt):
-    """Call OpenAI Vision API via curl."""
+def call_openai(b64_data, mime_type, prompt, timeout=120, cancel=None):
+    """Call OpenAI Vision API."""
     api_key = get_api_key("OPENAI_API_KEY")
 
     body = {
@@ -71,19 +101,11 @@ def call_openai(b64_data, mime_type, prompt):
             ]
         }]
     }
+    return HTTP.post_json(OPENAI_API_URL, body, headers={
+        "Authorization": f"Bearer {api_key}",
+    }, timeout=timeout, cancel=cancel)
 
-    with open("_test_openai.json", "w") as f:
-        json.dump(body, f)
-
-    result = subprocess.run([
-        "curl", "-s", "-X", "POST", "https://api.openai.com/v1/chat/completions",
-        "-H", f"Authorization: Bearer {api_key}",
-        "-H", "Content-Type: application/json",
-        "-d", "@_test_openai.json"
-    ], capture_output=True, text=True, timeout=120)
-
-    os.remove("_test_openai.json")
-    return json.loads(result.stdout)
+PROVIDERS = {"claude": call_claude, "openai": call_openai}
 
 def parse_ai_response(response, source):
     """Extract JSON from AI response."""
@@ -99,38 +121,140 @@ def parse_ai_response(response, source):
     except Exception as e:
         return None, str(e)
 
-def validate(data):
-    """Validate timetable data."""
-    if not data:
-        return 0, ["Failed to parse JSON"]
-
-    errors = []
-    if not data.get("name"):
-        errors.append("Missing mosque name")
-
-    tt = data.get("timetable", [])
-    if not isinstance(tt, list):
-        return 0, ["Missing or invalid timetable array"]
-
-    if len(tt) < 28:
-        errors.append(f"Only {len(tt)} days (need 30)")
-    if len(tt) > 30:
-        errors.append(f"{len(tt)} days (expected 30)")
-
-    time_fields = ["sehri", "fajr", "sunrise", "zuhr", "asr", "maghrib", "isha", "jFajr", "jZuhr", "jAsr", "jIsha"]
-    for i, d in enumerate(tt):
-        if d.get("no") != i + 1:
-            errors.append(f"Day {i+1}: wrong no={d.get('no')}")
-        for f in time_fields:
-            val = d.get(f, "")
-            if val and not re.match(r'^\d{1,2}:\d{2}$', str(val)):
-                errors.append(f"Day {i+1}: bad {f}={val}")
-        date = d.get("date")
-        if not isinstance(date, list) or len(date) != 3:
-            errors.append(f"Day {i+1}: invalid date")
-
-    score = max(0, 100 - len(errors) * 3)
-    return score, errors
+def extract_concurrently(b64_data, mime_type, prompt, accept_score=ACCEPT_SCORE):
+    """Call every provider at once and validate each extraction as it arrives.
+
+    Once one scores accept_score or more, the calls still running are cancelled.
+    Returns {source: {"data", "score", "errors", "status", "seconds"}} plus the wall time.
+    """
+    cancel = threading.Event()
+    started = time.perf_counter()
+
+    def extract(source):
+        t0 = time.perf_counter()
+        data, status = None, "ok"
+        try:
+            response = PROVIDERS[source](b64_data, mime_type, prompt, PROVIDER_TIMEOUTS[source], cancel)
+            data, err = parse_ai_response(response, source)
+            if err:
+                status = f"unreadable response: {err}"
+        except RequestCancelled:
+            status = "cancelled"
+        except TimeoutError:
+            status = f"timed out after {PROVIDER_TIMEOUTS[source]}s"
+        except (OSError, ValueError, HTTPError) as e:
+            status = f"failed: {e}"
+        if data is None:
+            score, errors = 0, [Issue("extraction", f"{source} {status}", severity="structure")]
+        else:
+            score, errors = validate(data)
+        return {"data": data, "score": score, "errors": errors, "status": status,
+                "seconds": time.perf_counter() - t0}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(PROVIDERS)) as pool:
+        futures = {pool.submit(extract, source): source for source in PROVIDERS}
+        for future in as_completed(futures):
+            source = futures[future]
+            results[source] = result = future.result()
+            print(f"  {source}: {result['status']} in {result['seconds']:.1f}s, score={result['score']}/100")
+            if result["score"] >= accept_score and not cancel.is_set():
+                cancel.set()
+    return results, time.perf_counter() - started
+
+def content_hashes(data):
+    """SHA-256 of the file bytes, and a 64-bit difference hash of the image (None for PDFs,
+    unreadable images, or without Pillow) that survives re-encoding and resizing."""
+    sha = hashlib.sha256(data).hexdigest()
+    if Image is None:
+        return sha, None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            pixels = img.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return sha, None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = bits << 1 | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return sha, f"{bits:016x}"
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def _read_entry(sha):
+    entry = _read_json(os.path.join(CACHE_DIR, f"{sha}.json"))
+    if entry and entry.get("expires", float("inf")) < time.time():
+        return None
+    return entry
+
+def cache_lookup(sha, phash):
+    """Cached entry for identical bytes, else for the closest image within PHASH_MAX_DISTANCE.
+    Entries past their "expires" time are ignored. Returns (entry, how it matched) or (None, None)."""
+    entry = _read_entry(sha)
+    if entry:
+        return entry, "identical file"
+    if phash:
+        index = _read_json(CACHE_INDEX) or {}
+        target = int(phash, 16)
+        distances = sorted((bin(target ^ int(other, 16)).count("1"), other_sha)
+                           for other_sha, other in index.items() if other)
+        for distance, other_sha in distances:
+            if distance > PHASH_MAX_DISTANCE:
+                break
+            entry = _read_entry(other_sha)
+            if entry:
+                return entry, f"same image, {distance} bits apart"
+    return None, None
+
+def cache_results(entry):
+    """Extraction results from a cache entry. Cached extractions are validated again, so
+    scores and issues follow the current timetable_checks; a failed provider keeps its issue."""
+    results = {}
+    for source, result in entry["results"].items():
+        if result["data"] is None:
+            score, errors = result["score"], [Issue(**e) for e in result["errors"]]
+        else:
+            score, errors = validate(result["data"])
+        results[source] = {**result, "score": score, "errors": errors}
+    return results
+
+def cache_store(sha, phash, filename, results):
+    """Save extraction + validation results. Runs where every provider failed are not kept;
+    ones where any provider did not finish "ok" (or get cancelled) expire after FAILED_ENTRY_TTL."""
+    if all(result["data"] is None for result in results.values()):
+        return
+    complete = all(result["status"] in ("ok", "cancelled") for result in results.values())
+    _write_json(os.path.join(CACHE_DIR, f"{sha}.json"), {
+        "sha256": sha,
+        "phash": phash,
+        "file": filename,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        **({} if complete else {"expires": time.time() + FAILED_ENTRY_TTL}),
+        "results": {source: {**result, "errors": [e.to_dict() for e in result["errors"]]}
+                    for source, result in results.items()},
+    })
+    index = _read_json(CACHE_INDEX) or {}
+    index[sha] = phash
+    _write_json(CACHE_INDEX, index)
+
+def check_status(name, status, data):
+    """Decode a reply body, printing a warning unless the status is 2xx."""
+    text = data.decode("utf-8", "replace")
+    if not 200 <= status < 300:
+        print(f"  Warning: {name} answered HTTP {status}: {text[:300]}")
+    return text
 
 def send_telegram(text, drive_file_id="test"):
     """Send Telegram notification with approve/reject buttons."""
@@ -145,18 +269,15 @@ def send_telegram(text, drive_file_id="test"):
         }
     }
 
-    with open("_test_tg.json", "w") as f:
-        json.dump(body, f, ensure_ascii=False)
-
-    result = subprocess.run([
-        "curl", "-s", "-X", "POST",
-        f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-        "-H", "Content-Type: application/json",
-        "-d", "@_test_tg.json"
-    ], capture_output=True, text=True)
-
-    os.remove("_test_tg.json")
-    return json.loads(result.stdout)
+    # Telegram answers errors with a JSON body too, so return it whatever the status
+    status, _, data = HTTP.request("POST", f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
+                                   json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                                   {"Content-Type": "application/json"}, timeout=30)
+    text = check_status("Telegram", status, data)
+    try:
+        return json.loads(text)
+    except ValueError:
+        return {"ok": False, "status": status, "body": text[:300]}
 
 def store_submission(mosque_name, submitter, file_name, drive_file_id, claude_json, openai_json, final_json, notes):
     """Store in Postgres via sql-query webhook."""
@@ -175,18 +296,9 @@ def store_submission(mosque_name, submitter, file_name, drive_file_id, claude_js
     {esc(json.dumps(claude_json))}::jsonb, {esc(json.dumps(openai_json))}::jsonb,
     {esc(json.dumps(final_json))}::jsonb, {esc(notes)}, 'pending') RETURNING id"""
 
-    body = {"query": sql}
-    with open("_test_sql.json", "w") as f:
-        json.dump(body, f)
-
-    result = subprocess.run([
-        "curl", "-s", "-X", "POST", SQL_WEBHOOK,
-        "-H", "Content-Type: application/json",
-        "-d", "@_test_sql.json"
-    ], capture_output=True, text=True, timeout=30)
-
-    os.remove("_test_sql.json")
-    return result.stdout
+    status, _, data = HTTP.request("POST", SQL_WEBHOOK, json.dumps({"query": sql}).encode("utf-8"),
+                                   {"Content-Type": "application/json"}, timeout=30)
+    return check_status("SQL webhook", status, data)
 
 PROMPT = """Extract the Ramadan timetable from this image into JSON. Return ONLY valid JSON, no markdown, no code blocks, no explanation.
 
@@ -235,18 +347,26 @@ def main():
     mime = mime_map.get(ext, "image/jpeg")
     print(f"MIME: {mime}, Size: {len(data)} bytes")
 
-    # Call both AIs in sequence
-    print("\nCalling Claude Vision...")
-    claude_resp = call_claude(b64, mime, PROMPT)
-    claude_data, claude_err = parse_ai_response(claude_resp, "claude")
-
-    print("Calling OpenAI Vision...")
-    openai_resp = call_openai(b64, mime, PROMPT)
-    openai_data, openai_err = parse_ai_response(openai_resp, "openai")
-
-    # Validate
-    claude_score, claude_errors = validate(claude_data)
-    openai_score, openai_errors = validate(openai_data)
+    sha, phash = content_hashes(data)
+    cached, match = cache_lookup(sha, phash)
+    duplicate = ""
+    if cached:
+        duplicate = f"duplicate of {cached['file']} ({match}, first seen {cached['created']})"
+        print(f"\nCached: {duplicate} - skipping model calls")
+        results = cache_results(cached)
+        timing = "cached"
+    else:
+        # Call both AIs at once (each extraction is validated as it arrives)
+        print("\nCalling Claude and OpenAI Vision...")
+        results, wall = extract_concurrently(b64, mime, PROMPT)
+        cache_store(sha, phash, filename, results)
+    claude, openai = results["claude"], results["openai"]
+    claude_data, claude_score, claude_errors = claude["data"], claude["score"], claude["errors"]
+    openai_data, openai_score, openai_errors = openai["data"], openai["score"], openai["errors"]
+    if not cached:
+        timing = (f"claude {claude['seconds']:.1f}s ({claude['status']}), "
+                  f"openai {openai['seconds']:.1f}s ({openai['status']}), wall {wall:.1f}s")
+        print(f"Extraction: {timing}")
 
     print(f"\nClaude: score={claude_score}/100, errors={len(claude_errors)}")
     if claude_errors:
@@ -281,7 +401,9 @@ def main():
 
     # Store in Postgres
     print("\nStoring in Postgres...")
-    notes = f"Claude: {claude_score}/100, OpenAI: {openai_score}/100, Best: {source}"
+    notes = f"Claude: {claude_score}/100, OpenAI: {openai_score}/100, Best: {source}, Timing: {timing}"
+    if duplicate:
+        notes += f", {duplicate.capitalize()}"
     sql_result = store_submission(mosque_name, submitter, filename, "test_manual", claude_data, openai_data, final, notes)
     print(f"SQL result: {sql_result[:200] if sql_result else 'empty'}")
 
@@ -302,10 +424,12 @@ def main():
     text += f"Validation: {valid_icon} ({day_count} days)\n"
     text += f"Best: {source} (Claude {claude_score}, OpenAI {openai_score})\n\n"
     text += preview
+    if duplicate:
+        text += f"\n\nAlready extracted: {duplicate}"
     if claude_errors:
-        text += f"\n\nClaude issues: {'; '.join(claude_errors[:3])}"
+        text += f"\n\nClaude issues: {'; '.join(map(str, claude_errors[:3]))}"
     if openai_errors:
-        text += f"\nOpenAI issues: {'; '.join(openai_errors[:3])}"
+        text += f"\nOpenAI issues: {'; '.join(map(str, openai_errors[:3]))}"
 
     tg_result = send_telegram(text)
     print(f"Telegram: {json.dumps(tg_result, indent=2)[:300]}")